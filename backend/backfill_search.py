@@ -0,0 +1,69 @@
+"""
+Ghi field "search" (bản không dấu của các field tìm kiếm, xem
+crud.SEARCH_FIELDS) cho events và papers, và "search_keys" (khóa tìm theo
+tiền tố, xem crud.SEARCH_KEY_FIELDS) cho users đã có trước khi bật tìm kiếm.
+
+Chạy một lần từ thư mục backend:
+
+    python backfill_search.py          # chỉ document chưa có "search"
+    python backfill_search.py --all    # tính lại toàn bộ (đổi cách chuẩn hóa)
+
+Text index "search_text" và index "search_keys" được tạo bởi `python -m src.indexes sync` (hoặc tự
+động khi server khởi động).
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from src.crud import SEARCH_FIELDS, SEARCH_KEY_FIELDS
+from src.utils import add_search_fields, search_keys
+
+BATCH_SIZE = 1000
+
+
+def backfill_collection(
+    db, collection_name: str, fields: tuple, all_docs: bool, target: str = "search"
+) -> int:
+    """Ghi "search" (hoặc "search_keys") theo lô bằng bulk_write."""
+    query = {} if all_docs else {target: {"$exists": False}}
+    projection = {field: 1 for field in fields}
+    operations = []
+    updated = 0
+    for doc in db[collection_name].find(query, projection):
+        if target == "search_keys":
+            value = search_keys(doc, fields)
+        else:
+            value = add_search_fields(doc, fields)["search"]
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {target: value}}))
+        if len(operations) >= BATCH_SIZE:
+            updated += db[collection_name].bulk_write(operations).modified_count
+            operations = []
+    if operations:
+        updated += db[collection_name].bulk_write(operations).modified_count
+    return updated
+
+
+def main():
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_DB_URI"))
+    db = client[os.getenv("MONGO_DB_NAME")]
+
+    all_docs = "--all" in sys.argv
+    print("Đang ghi dữ liệu tìm kiếm...")
+    for collection_name, fields in SEARCH_FIELDS.items():
+        updated = backfill_collection(db, collection_name, fields, all_docs)
+        print(f"  {collection_name}: {updated} document")
+    for collection_name, fields in SEARCH_KEY_FIELDS.items():
+        updated = backfill_collection(
+            db, collection_name, fields, all_docs, target="search_keys"
+        )
+        print(f"  {collection_name}: {updated} document")
+    client.close()
+    print("\nHoàn tất!")
+
+
+if __name__ == "__main__":
+    main()
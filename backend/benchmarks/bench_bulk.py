@@ -0,0 +1,108 @@
+"""
+Benchmark xác nhận 500 registrations: 500 lần updateRegistration so với
+một lần bulkUpdateRegistrations.
+
+Chạy từ thư mục backend (cần MongoDB theo cấu hình .env):
+
+    python -m benchmarks.bench_bulk
+
+Dữ liệu giả được tạo trong database riêng `<MONGO_DB_NAME>_bench`. Script
+đếm số lệnh gửi tới MongoDB và thời gian của cả lô.
+"""
+
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.bench_dataloader import CommandCounter
+from src.database import settings
+from src.loaders import create_loaders
+from src.schema import schema
+
+BATCH_SIZE = 500
+
+SINGLE = """
+mutation Confirm($id: String!) {
+  updateRegistration(id: $id, input: { status: "confirmed" }) { id status }
+}
+"""
+
+BULK = """
+mutation ConfirmAll($ids: [String!]!) {
+  bulkUpdateRegistrations(ids: $ids, input: { status: "confirmed" }) {
+    id
+    success
+    item { status }
+  }
+}
+"""
+
+
+async def seed(db):
+    await db["registrations"].drop()
+    now = "2025-01-01T00:00:00Z"
+    await db["registrations"].insert_many(
+        [
+            {
+                "_id": f"r{i:04d}",
+                "event_id": "e001",
+                "user_id": f"u{i:04d}",
+                "registration_date": now,
+                "status": "pending",
+                "payment_status": "paid",
+                "payment_amount": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(1, BATCH_SIZE + 1)
+        ]
+    )
+
+
+async def execute(db, query, variables):
+    context = {"db": db, "user_id": None, "loaders": create_loaders(db)}
+    result = await schema.execute(
+        query, variable_values=variables, context_value=context
+    )
+    assert not result.errors, result.errors
+
+
+async def main():
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.mongo_db_uri, event_listeners=[counter])
+    db_name = f"{settings.mongo_db_name}_bench"
+    db = client[db_name]
+    ids = [f"r{i:04d}" for i in range(1, BATCH_SIZE + 1)]
+    try:
+        await seed(db)
+        counter.reset()
+        start = time.perf_counter()
+        for id in ids:
+            await execute(db, SINGLE, {"id": id})
+        single_ms = (time.perf_counter() - start) * 1000
+        single_commands = sum(counter.counts.values())
+
+        await seed(db)
+        counter.reset()
+        start = time.perf_counter()
+        await execute(db, BULK, {"ids": ids})
+        bulk_ms = (time.perf_counter() - start) * 1000
+        bulk_commands = sum(counter.counts.values())
+
+        print(
+            f"{'updateRegistration x' + str(BATCH_SIZE):<28} "
+            f"commands={single_commands:<5} total={single_ms:.1f}ms"
+        )
+        print(
+            f"{'bulkUpdateRegistrations':<28} "
+            f"commands={bulk_commands:<5} total={bulk_ms:.1f}ms"
+        )
+        print(f"speedup: {single_ms / bulk_ms:.1f}x")
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
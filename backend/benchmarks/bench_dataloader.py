@@ -0,0 +1,147 @@
+"""
+Benchmark N+1 vs DataLoader cho trang 100 registrations.
+
+Chạy từ thư mục backend (cần MongoDB theo cấu hình .env):
+
+    python -m benchmarks.bench_dataloader
+
+Script tạo dữ liệu giả trong database riêng `<MONGO_DB_NAME>_bench`,
+đếm số lệnh `find` gửi tới MongoDB và đo độ trễ của cùng một query
+khi tắt (batch=False, hành vi cũ) và bật DataLoader.
+"""
+
+import asyncio
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from src.database import settings
+from src.loaders import create_loaders
+from src.schema import schema
+
+PAGE_SIZE = 100
+RUNS = 20
+
+QUERY = """
+query Registrations($limit: Int!) {
+  registrations(page: 1, limit: $limit) {
+    registrations {
+      id
+      event { title }
+      user { name }
+    }
+  }
+}
+"""
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.counts = {}
+
+    def started(self, event):
+        self.counts[event.command_name] = self.counts.get(event.command_name, 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.counts = {}
+
+
+async def seed(db):
+    for name in ["users", "events", "registrations"]:
+        await db[name].drop()
+
+    now = "2025-01-01T00:00:00Z"
+    users = [
+        {
+            "_id": f"u{i:03d}",
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "role": "attendee",
+            "organization": "Bench",
+            "phone": "0000000000",
+            "registered_events": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(1, PAGE_SIZE + 1)
+    ]
+    events = [
+        {
+            "_id": f"e{i:03d}",
+            "title": f"Event {i}",
+            "fee": 0,
+            "description": "",
+            "start_date": now,
+            "end_date": now,
+            "location": "",
+            "organizer_id": "u001",
+            "max_participants": 1000,
+            "current_participants": 1,
+            "status": "upcoming",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(1, PAGE_SIZE + 1)
+    ]
+    registrations = [
+        {
+            "_id": f"r{i:03d}",
+            "event_id": f"e{i:03d}",
+            "user_id": f"u{i:03d}",
+            "registration_date": now,
+            "status": "pending",
+            "payment_status": "pending",
+            "payment_amount": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(1, PAGE_SIZE + 1)
+    ]
+    await db["users"].insert_many(users)
+    await db["events"].insert_many(events)
+    await db["registrations"].insert_many(registrations)
+
+
+async def run(db, counter, batch: bool):
+    latencies = []
+    for _ in range(RUNS):
+        counter.reset()
+        context = {"db": db, "user_id": None, "loaders": create_loaders(db, batch)}
+        start = time.perf_counter()
+        result = await schema.execute(
+            QUERY, variable_values={"limit": PAGE_SIZE}, context_value=context
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert not result.errors, result.errors
+    return counter.counts.get("find", 0), latencies
+
+
+async def main():
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.mongo_db_uri, event_listeners=[counter])
+    db_name = f"{settings.mongo_db_name}_bench"
+    db = client[db_name]
+    try:
+        await seed(db)
+        for label, batch in [("before (N+1)", False), ("after (DataLoader)", True)]:
+            finds, latencies = await run(db, counter, batch)
+            print(
+                f"{label:<20} find={finds:<4} "
+                f"median={statistics.median(latencies):.1f}ms "
+                f"p95={sorted(latencies)[int(len(latencies) * 0.95) - 1]:.1f}ms"
+            )
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
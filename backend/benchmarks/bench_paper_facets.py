@@ -0,0 +1,100 @@
+"""
+Benchmark Query.paperFacets trên 300.000 papers.
+
+Chạy từ thư mục backend (cần MongoDB theo cấu hình .env):
+
+    python -m benchmarks.bench_paper_facets
+
+Dữ liệu giả được tạo trong database riêng `<MONGO_DB_NAME>_bench`, index
+được tạo bằng indexes.sync_indexes. Script đo độ trễ của aggregation $facet
+khi cache trống (toàn bộ và lọc theo event) và khi đọc lại từ response cache.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.crud import PAPER_COLLECTION
+from src.database import response_cache, settings
+from src.indexes import sync_indexes
+from src.loaders import create_loaders
+from src.schema import schema
+
+PAPERS = 300_000
+EVENTS = 200
+RUNS = 20
+
+KEYWORDS = [f"keyword {i}" for i in range(500)]
+STATUSES = ["pending", "approved", "rejected"]
+
+QUERY = """
+query Facets($e: String) {
+  paperFacets(eventId: $e) {
+    total
+    keywords { value count }
+    statuses { value count }
+    sessions { value count }
+  }
+}
+"""
+
+
+async def seed(db):
+    rng = random.Random(42)
+    await db[PAPER_COLLECTION].drop()
+    for start in range(0, PAPERS, 10_000):
+        papers = [
+            {
+                "_id": f"p{i:06d}",
+                "title": f"Paper {i}",
+                "keywords": rng.sample(KEYWORDS, 4),
+                "status": rng.choice(STATUSES),
+                "event_id": f"e{i % EVENTS:03d}",
+                "session_id": f"s{rng.randrange(EVENTS * 10):04d}",
+            }
+            for i in range(start, start + 10_000)
+        ]
+        await db[PAPER_COLLECTION].insert_many(papers)
+    await sync_indexes(db)
+
+
+async def measure(db, event_id, clear_cache: bool) -> list:
+    latencies = []
+    for _ in range(RUNS):
+        if clear_cache:
+            await response_cache.invalidate("paper_facets")
+        context = {"db": db, "user_id": None, "loaders": create_loaders(db)}
+        start = time.perf_counter()
+        result = await schema.execute(
+            QUERY, variable_values={"e": event_id}, context_value=context
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert not result.errors, result.errors
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f"{label:<14} p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms")
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.mongo_db_uri)
+    db_name = f"{settings.mongo_db_name}_bench"
+    db = client[db_name]
+    try:
+        await seed(db)
+        print(f"papers={PAPERS} events={EVENTS} runs={RUNS}")
+        report("all (cold)", await measure(db, None, True))
+        report("event (cold)", await measure(db, "e001", True))
+        report("all (cached)", await measure(db, None, False))
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark Query.search trên 100.000 papers (+ 1.000 events).
+
+Chạy từ thư mục backend (cần MongoDB theo cấu hình .env):
+
+    python -m benchmarks.bench_search
+
+Dữ liệu giả được tạo trong database riêng `<MONGO_DB_NAME>_bench`, text index
+được tạo bằng indexes.sync_indexes. Script đo độ trễ p50 / p95 của cả
+resolver GraphQL cho các truy vấn không dấu.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.crud import EVENT_SEARCH_FIELDS, PAPER_SEARCH_FIELDS
+from src.database import settings
+from src.indexes import sync_indexes
+from src.loaders import create_loaders
+from src.schema import schema
+from src.utils import add_search_fields
+
+PAPERS = 100_000
+EVENTS = 1_000
+RUNS = 200
+
+WORDS = (
+    "hội thảo khoa học công nghệ trí tuệ nhân tạo học máy dữ liệu mạng máy tính "
+    "bảo mật thông tin xử lý ảnh y khoa ngôn ngữ tự nhiên điện toán đám mây "
+    "phân tích hệ thống nhúng robot tối ưu đà nẵng hà nội hồ chí minh"
+).split()
+
+QUERIES = ["hoi thao", "tri tue nhan tao", "xu ly anh", "da nang", "bao mat"]
+
+QUERY = """
+query Search($q: String!) {
+  search(query: $q, first: 20) {
+    edges { score node { ... on PaperType { id title } ... on EventType { id title } } }
+  }
+}
+"""
+
+
+def text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+async def seed(db):
+    rng = random.Random(42)
+    for name in ["events", "papers"]:
+        await db[name].drop()
+    events = [
+        add_search_fields(
+            {
+                "_id": f"e{i:05d}",
+                "title": text(rng, 6),
+                "description": text(rng, 40),
+                "location": text(rng, 3),
+            },
+            EVENT_SEARCH_FIELDS,
+        )
+        for i in range(EVENTS)
+    ]
+    await db["events"].insert_many(events)
+    for start in range(0, PAPERS, 10_000):
+        papers = [
+            add_search_fields(
+                {
+                    "_id": f"p{i:06d}",
+                    "title": text(rng, 8),
+                    "abstract": text(rng, 60),
+                    "keywords": [rng.choice(WORDS) for _ in range(4)],
+                    "event_id": f"e{i % EVENTS:05d}",
+                },
+                PAPER_SEARCH_FIELDS,
+            )
+            for i in range(start, start + 10_000)
+        ]
+        await db["papers"].insert_many(papers)
+    await sync_indexes(db)
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.mongo_db_uri)
+    db_name = f"{settings.mongo_db_name}_bench"
+    db = client[db_name]
+    try:
+        await seed(db)
+        latencies = []
+        for i in range(RUNS):
+            context = {"db": db, "user_id": None, "loaders": create_loaders(db)}
+            start = time.perf_counter()
+            result = await schema.execute(
+                QUERY,
+                variable_values={"q": QUERIES[i % len(QUERIES)]},
+                context_value=context,
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert not result.errors, result.errors
+
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"papers={PAPERS} events={EVENTS} runs={RUNS}")
+        print(f"p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms")
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark Query.searchUsers (autocomplete) trên 500.000 users.
+
+Chạy từ thư mục backend (cần MongoDB theo cấu hình .env):
+
+    python -m benchmarks.bench_search_users
+
+Dữ liệu giả được tạo trong database riêng `<MONGO_DB_NAME>_bench`, index
+được tạo bằng indexes.sync_indexes. Script đo độ trễ p50 / p95 của cả
+resolver GraphQL và in số key index đã quét (explain) của một truy vấn.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.crud import USER_COLLECTION, USER_SEARCH_FIELDS
+from src.database import settings
+from src.indexes import sync_indexes
+from src.loaders import create_loaders
+from src.schema import schema
+from src.utils import search_keys
+
+USERS = 500_000
+RUNS = 200
+
+LAST = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng"]
+MIDDLE = ["Văn", "Thị", "Hữu", "Đức", "Minh", "Quang", "Ngọc", "Thanh"]
+FIRST = ["An", "Bình", "Cường", "Dũng", "Giang", "Hà", "Hùng", "Lan", "Long", "Mai"]
+ORGS = ["Đại học Bách khoa", "Đại học Đà Nẵng", "Viện Toán học", "FPT", "VNPT"]
+ROLES = ["researcher", "researcher", "researcher", "attendee", "admin"]
+
+PREFIXES = ["nguyen van", "dung", "dai hoc da", "tran thi l", "u12345", "vien"]
+
+QUERY = """
+query SearchUsers($p: String!, $r: String) {
+  searchUsers(prefix: $p, role: $r, first: 10) { id name email organization }
+}
+"""
+
+
+async def seed(db):
+    rng = random.Random(42)
+    await db[USER_COLLECTION].drop()
+    for start in range(0, USERS, 10_000):
+        users = []
+        for i in range(start, start + 10_000):
+            user = {
+                "_id": f"u{i:06d}",
+                "name": " ".join(
+                    [rng.choice(LAST), rng.choice(MIDDLE), rng.choice(FIRST)]
+                ),
+                "email": f"u{i:06d}@example.com",
+                "organization": rng.choice(ORGS),
+                "role": rng.choice(ROLES),
+            }
+            user["search_keys"] = search_keys(user, USER_SEARCH_FIELDS)
+            users.append(user)
+        await db[USER_COLLECTION].insert_many(users)
+    await sync_indexes(db)
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.mongo_db_uri)
+    db_name = f"{settings.mongo_db_name}_bench"
+    db = client[db_name]
+    try:
+        await seed(db)
+        latencies = []
+        for i in range(RUNS):
+            context = {"db": db, "user_id": None, "loaders": create_loaders(db)}
+            start = time.perf_counter()
+            result = await schema.execute(
+                QUERY,
+                variable_values={
+                    "p": PREFIXES[i % len(PREFIXES)],
+                    "r": "researcher" if i % 2 else None,
+                },
+                context_value=context,
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert not result.errors, result.errors
+
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        explain = await db.command(
+            "explain",
+            {
+                "find": USER_COLLECTION,
+                "filter": {"search_keys": {"$regex": "^nguyen van"}},
+                "limit": 10,
+            },
+            verbosity="executionStats",
+        )
+        stats = explain["executionStats"]
+        print(f"users={USERS} runs={RUNS}")
+        print(
+            f"explain 'nguyen van': keys={stats['totalKeysExamined']} "
+            f"docs={stats['totalDocsExamined']}"
+        )
+        print(f"p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms")
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
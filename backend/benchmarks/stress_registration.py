@@ -0,0 +1,160 @@
+"""
+Stress test giữ chỗ: 1.000 đăng ký đồng thời vào một sự kiện có ít chỗ.
+
+Chạy từ thư mục backend (cần MongoDB theo cấu hình .env):
+
+    python -m benchmarks.stress_registration
+
+Dữ liệu giả được tạo trong database riêng `<MONGO_DB_NAME>_bench`. Script
+kết thúc với mã lỗi 1 nếu số đăng ký hoặc current_participants vượt quá
+max_participants (oversell), hoặc hàng chờ bị trùng / thiếu số thứ tự.
+
+Lượt thứ hai giả lập cấp ID lỗi (mỗi ID_FAIL_EVERY lần gọi một lần) và kiểm
+tra không có chỗ nào bị giữ bởi đăng ký thất bại.
+"""
+
+import asyncio
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src import crud
+from src.database import settings
+from src.models import CreateRegistrationInput
+
+CONCURRENCY = 1000
+CAPACITY = 100
+ID_FAIL_EVERY = 3
+
+
+async def seed(db):
+    for name in ["users", "events", "registrations", "counters"]:
+        await db[name].drop()
+    now = "2025-01-01T00:00:00Z"
+    await db["events"].insert_one(
+        {
+            "_id": "e001",
+            "title": "Stress",
+            "fee": 0,
+            "description": "",
+            "start_date": now,
+            "end_date": now,
+            "location": "",
+            "organizer_id": "u0001",
+            "max_participants": CAPACITY,
+            "current_participants": 0,
+            "status": "upcoming",
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    await db["users"].insert_many(
+        [
+            {"_id": f"u{i:04d}", "registered_events": []}
+            for i in range(1, CONCURRENCY + 1)
+        ]
+    )
+
+
+async def register(db, user_id):
+    registration = await crud.create_registration(
+        db,
+        CreateRegistrationInput(
+            event_id="e001", payment_status="pending", payment_amount=0
+        ),
+        user_id=user_id,
+    )
+    return registration["status"]
+
+
+async def register_or_fail(db, user_id):
+    try:
+        return await register(db, user_id)
+    except RuntimeError:
+        return "failed"
+
+
+async def check_id_failures(db) -> bool:
+    """Cấp ID lỗi không được làm tăng current_participants."""
+    await seed(db)
+    crud.id_allocator.reset()
+    next_id = crud.id_allocator.next_id
+    calls = 0
+
+    async def flaky_next_id(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls % ID_FAIL_EVERY == 0:
+            raise RuntimeError("id allocation failed")
+        return await next_id(*args, **kwargs)
+
+    crud.id_allocator.next_id = flaky_next_id
+    try:
+        results = await asyncio.gather(
+            *[register_or_fail(db, f"u{i:04d}") for i in range(1, CONCURRENCY + 1)]
+        )
+    finally:
+        del crud.id_allocator.next_id
+        crud.id_allocator.reset()
+
+    admitted = results.count("pending")
+    event = await db["events"].find_one({"_id": "e001"})
+    registrations = await db["registrations"].count_documents({"status": "pending"})
+    print(
+        f"id failures={results.count('failed')} admitted={admitted} "
+        f"current_participants={event['current_participants']} "
+        f"registrations={registrations}"
+    )
+    return event["current_participants"] == admitted == registrations
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.mongo_db_uri, maxPoolSize=200)
+    db_name = f"{settings.mongo_db_name}_bench"
+    db = client[db_name]
+    try:
+        await seed(db)
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[register(db, f"u{i:04d}") for i in range(1, CONCURRENCY + 1)]
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+
+        admitted = results.count("pending")
+        waitlisted = results.count(crud.WAITLISTED)
+        event = await db["events"].find_one({"_id": "e001"})
+        registrations = await db["registrations"].count_documents({"status": "pending"})
+        users_with_event = await db["users"].count_documents(
+            {"registered_events": "e001"}
+        )
+        seqs = await db["registrations"].distinct(
+            "waitlist_seq", {"status": crud.WAITLISTED}
+        )
+
+        print(f"requests={CONCURRENCY} capacity={CAPACITY} total={elapsed:.1f}ms")
+        print(f"admitted={admitted} waitlisted={waitlisted}")
+        print(
+            f"current_participants={event['current_participants']} "
+            f"registrations={registrations} users={users_with_event}"
+        )
+        ok = (
+            admitted == CAPACITY
+            and event["current_participants"] == CAPACITY
+            and registrations == CAPACITY
+            and users_with_event == CAPACITY
+            and sorted(seqs) == list(range(1, CONCURRENCY - CAPACITY + 1))
+        )
+        print("OK: no oversell" if ok else "FAIL: oversell / mismatch")
+
+        leak_free = await check_id_failures(db)
+        print("OK: no leaked seats" if leak_free else "FAIL: leaked seats")
+        if not (ok and leak_free):
+            sys.exit(1)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
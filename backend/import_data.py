@@ -1,8 +1,19 @@
+import asyncio
 import json
 import os
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from src.crud import (
+    DATE_FIELDS,
+    SEARCH_FIELDS,
+    SEARCH_KEY_FIELDS,
+    rebuild_event_daily_stats,
+    rebuild_rating_stats,
+)
+from src.utils import add_search_fields, parse_datetime_fields, search_keys
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_DB_URI")
@@ -26,10 +37,38 @@ with open("dbQLSK.json", "r", encoding="utf-8") as f:
 # Import từng collection
 for collection_name, documents in data.items():
     if documents:
+        # Ngày giờ của events / sessions được lưu dạng BSON date
+        for doc in documents:
+            parse_datetime_fields(doc, DATE_FIELDS.get(collection_name, ()))
+            # Bản không dấu cho tìm kiếm toàn văn (events / papers)
+            if collection_name in SEARCH_FIELDS:
+                add_search_fields(doc, SEARCH_FIELDS[collection_name])
+            # Khóa tìm theo tiền tố (users)
+            if collection_name in SEARCH_KEY_FIELDS:
+                doc["search_keys"] = search_keys(
+                    doc, SEARCH_KEY_FIELDS[collection_name]
+                )
         print(f"Importing {len(documents)} tài liệu vào collection '{collection_name}'...")
         db[collection_name].insert_many(documents)
     else:
         print(f"Skipping empty collection '{collection_name}'")
 
-print("\nHoàn tất import dữ liệu!")
-client.close()
\ No newline at end of file
+client.close()
+
+
+async def rebuild_stats():
+    # rating_stats / event_daily_stats vừa bị xóa cùng các collection cũ:
+    # tính lại từ feedbacks / registrations vừa import (hàm crud dùng Motor)
+    motor_client = AsyncIOMotorClient(MONGO_URI)
+    try:
+        motor_db = motor_client[DB_NAME]
+        await rebuild_rating_stats(motor_db)
+        await rebuild_event_daily_stats(motor_db)
+    finally:
+        motor_client.close()
+
+
+print("Đang tính lại các bảng thống kê...")
+asyncio.run(rebuild_stats())
+
+print("\nHoàn tất import dữ liệu!")
\ No newline at end of file
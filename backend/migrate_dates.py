@@ -0,0 +1,93 @@
+"""
+Chuyển các field ngày giờ của events (start_date, end_date) và sessions
+(start_time, end_time) từ chuỗi ISO sang BSON date, trong database và trong
+các file backup.
+
+Chạy một lần từ thư mục backend:
+
+    python migrate_dates.py              # database + backups/*.json
+    python migrate_dates.py --db-only    # chỉ database
+
+Script chạy lại nhiều lần vẫn an toàn: chỉ document / giá trị còn là chuỗi
+mới bị chuyển đổi.
+"""
+
+import glob
+import os
+import sys
+
+from bson import json_util
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from src.crud import DATE_FIELDS
+from src.utils import parse_datetime
+
+BACKUP_DIR = "backups"
+BATCH_SIZE = 1000
+
+
+def migrate_collection(db, collection_name: str, fields: tuple) -> int:
+    """Chuyển các field còn là chuỗi, ghi theo lô bằng bulk_write."""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    operations = []
+    migrated = 0
+    for doc in db[collection_name].find(query, projection):
+        update = {
+            field: parse_datetime(doc[field])
+            for field in fields
+            if isinstance(doc.get(field), str)
+        }
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(operations) >= BATCH_SIZE:
+            migrated += db[collection_name].bulk_write(operations).modified_count
+            operations = []
+    if operations:
+        migrated += db[collection_name].bulk_write(operations).modified_count
+    return migrated
+
+
+def migrate_backup(filepath: str) -> int:
+    """Chuyển field ngày giờ trong một file backup (ghi lại dạng {"$date": ...})."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        backup_data = json_util.loads(f.read())
+
+    migrated = 0
+    for collection_name, fields in DATE_FIELDS.items():
+        for doc in backup_data.get(collection_name) or []:
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    doc[field] = parse_datetime(doc[field])
+                    migrated += 1
+
+    if migrated:
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(backup_data, indent=2))
+    return migrated
+
+
+def main():
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_DB_URI"))
+    db = client[os.getenv("MONGO_DB_NAME")]
+
+    print("Đang chuyển dữ liệu trong database...")
+    for collection_name, fields in DATE_FIELDS.items():
+        migrated = migrate_collection(db, collection_name, fields)
+        print(f"  {collection_name}: {migrated} document")
+    client.close()
+
+    if "--db-only" in sys.argv:
+        return
+
+    print("Đang chuyển các file backup...")
+    for filepath in sorted(glob.glob(os.path.join(BACKUP_DIR, "*.json"))):
+        migrated = migrate_backup(filepath)
+        print(f"  {os.path.basename(filepath)}: {migrated} giá trị")
+
+    print("\nHoàn tất chuyển đổi ngày giờ!")
+
+
+if __name__ == "__main__":
+    main()
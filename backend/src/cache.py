@@ -0,0 +1,187 @@
+# src/cache.py
+
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Set
+
+
+class TTLCache:
+    """
+    Cache trong bộ nhớ (một process) có thời gian sống (TTL) và giới hạn
+    số phần tử. Khi đầy, phần tử ít được dùng gần đây nhất bị loại (LRU).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# -----------------------
+# Response cache cho các resolver đọc công khai
+# -----------------------
+# Mỗi entry gắn một tập tag (vd "events", "event:e001"). Mutation xóa đúng
+# các tag bị ảnh hưởng thay vì chờ TTL. CacheBackend là interface để sau này
+# thay bằng cache dùng chung (Redis, ...) mà không phải sửa resolver.
+
+MISSING = object()
+
+
+def _approx_size(value: Any) -> int:
+    """Ước lượng số byte bộ nhớ của value (đệ quy qua dict / list)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(v) for v in value)
+    return size
+
+
+class CacheBackend(ABC):
+    """Interface chung cho response cache."""
+
+    @abstractmethod
+    async def get(self, key: Hashable) -> Any:
+        """Trả về giá trị đã cache hoặc MISSING."""
+
+    @abstractmethod
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[str] = (),
+        version: int | None = None,
+    ) -> None:
+        """
+        Lưu value, gắn với các tag dùng để invalidate.
+        version: giá trị của `self.version` lúc bắt đầu đọc dữ liệu; nếu đã có
+        invalidate xảy ra trong lúc đọc thì bỏ qua để không cache dữ liệu cũ.
+        """
+
+    @abstractmethod
+    async def invalidate(self, *tags: str) -> None:
+        """Xóa mọi entry mang ít nhất một trong các tag."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Xóa toàn bộ cache (vd sau khi restore thay toàn bộ dữ liệu)."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Số liệu hit / miss / bộ nhớ."""
+
+
+class InMemoryCache(CacheBackend):
+    """Response cache trong process: TTL + loại bỏ LRU + invalidate theo tag."""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (hết hạn lúc, value, tags, kích thước ước lượng)
+        self._data: "OrderedDict[Hashable, tuple[float, Any, frozenset, int]]" = (
+            OrderedDict()
+        )
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._memory = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        # Tăng sau mỗi lần invalidate (xem CacheBackend.set)
+        self.version = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags, size = self._data.pop(key)
+        self._memory -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self._misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self._hits += 1
+        return entry[1]
+
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[str] = (),
+        version: int | None = None,
+    ) -> None:
+        if version is not None and version != self.version:
+            return
+        if key in self._data:
+            self._remove(key)
+        tags = frozenset(tags)
+        size = _approx_size(value)
+        self._data[key] = (time.monotonic() + self.ttl, value, tags, size)
+        self._memory += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+            self._evictions += 1
+
+    async def invalidate(self, *tags: str) -> None:
+        self.version += 1
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self._invalidations += 1
+
+    async def clear(self) -> None:
+        self.version += 1
+        self._invalidations += len(self._data)
+        self._data.clear()
+        self._tags.clear()
+        self._memory = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._data),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+            "memory_bytes": self._memory,
+        }
@@ -1,4 +1,4 @@
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
 from .models import (
     CreateUserInput,
     UpdateUserInput,
@@ -13,14 +13,217 @@ from .models import (
     CreatePaperInput,
     UpdatePaperInput,
 )
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Awaitable, Callable
 import strawberry
 import asyncio
+import re
+import uuid
+from pymongo import (
+    ASCENDING,
+    DESCENDING,
+    TEXT,
+    IndexModel,
+    InsertOne,
+    ReturnDocument,
+    UpdateOne,
+)
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from .utils import *
+from .cache import TTLCache
+from .ids import IdAllocator
+from .write_buffer import WriteBuffer
 import datetime
 
 
+# --- Đếm tổng số record cho phân trang ---
+# count_mode:
+# - "exact": count_documents (có filter thì dùng cache TTL ngắn)
+# - "estimated": estimated_document_count khi không có filter (đọc metadata)
+# - "auto": như "estimated" khi không có filter, như "exact" khi có filter
+# - "none": không đếm, trả về None
+COUNT_CACHE_TTL = 5  # giây
+BULK_MAX_ITEMS = 1000
+
+# Số ID mỗi process xin trước từ collection counters (xem ids.py)
+ID_BLOCK_SIZE = 20
+id_allocator = IdAllocator(block_size=ID_BLOCK_SIZE)
+_count_cache = TTLCache(maxsize=1024, ttl=COUNT_CACHE_TTL)
+
+
+async def _count(
+    collection, filter_query: Dict[str, Any], count_mode: str = "exact"
+) -> int | None:
+    """Đếm số document khớp filter theo count_mode (xem ghi chú ở trên)."""
+    if count_mode == "none":
+        return None
+
+    if not filter_query:
+        if count_mode == "exact":
+            return await collection.count_documents({})
+        return await collection.estimated_document_count()
+
+    # Filter nóng (vd registrations theo event_id) được đếm lại tối đa
+    # mỗi COUNT_CACHE_TTL giây. estimated_document_count không áp dụng được
+    # cho filter nên "estimated" cũng đi đường này.
+    key = (collection.name, repr(sorted(filter_query.items())))
+    total = _count_cache.get(key)
+    if total is None:
+        total = await collection.count_documents(filter_query)
+        _count_cache.set(key, total)
+    return total
+
+
+async def _find_after(
+    collection,
+    filter_query: Dict[str, Any],
+    first: int,
+    after: tuple[str, str] | None = None,
+    projection: Dict[str, Any] | None = None,
+    sort_field: str = "created_at",
+) -> List[Dict[str, Any]]:
+    """
+    Phân trang keyset (cursor) theo cặp (sort_field, _id) giảm dần.
+    - after: khóa (giá trị sort_field, _id) của phần tử cuối trang trước.
+    - Lấy first + 1 phần tử để phía gọi biết còn trang sau hay không.
+    Không dùng .skip() nên trang sâu vẫn nhanh như trang đầu (cần index
+    tương ứng) và không bị trùng / sót khi dữ liệu thay đổi giữa các request.
+    """
+    query = dict(filter_query)
+    if after is not None:
+        value, last_id = after
+        query["$or"] = [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": last_id}},
+        ]
+
+    if projection is not None:
+        # Cần sort_field để dựng cursor cho từng phần tử
+        projection = {**projection, sort_field: 1}
+
+    cursor = (
+        collection.find(query, projection)
+        .sort([(sort_field, -1), ("_id", -1)])
+        .limit(first + 1)
+    )
+    return await cursor.to_list(length=first + 1)
+
+
+# --- Index ---
+# Mỗi collection khai báo index ngay dưới hằng số tên collection, gom lại
+# trong INDEXES ở cuối file; indexes.sync_indexes đối chiếu với MongoDB lúc
+# khởi động. Index cho _find_after: sort_field giảm dần rồi _id giảm dần.
+KEYSET_KEYS = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+# --- Thao tác hàng loạt ---
+# Mỗi lô là đúng một lệnh bulk_write (ordered=False) cho mỗi collection, thay
+# vì một round trip update_one + find_one cho từng phần tử. Kết quả trả về
+# theo từng phần tử dạng (id, document | None, lỗi | None).
+BulkResult = List[tuple[str, Dict[str, Any] | None, str | None]]
+
+
+async def _bulk_write(collection, operations: list) -> Dict[int, str]:
+    """Chạy bulk_write không theo thứ tự; trả về lỗi theo vị trí operation."""
+    if not operations:
+        return {}
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        return {err["index"]: err["errmsg"] for err in e.details["writeErrors"]}
+    return {}
+
+
+def _check_bulk_size(items: list) -> None:
+    if len(items) > BULK_MAX_ITEMS:
+        raise ValueError(f"Mỗi lô tối đa {BULK_MAX_ITEMS} phần tử.")
+
+
+async def _bulk_update_by_ids(
+    collection,
+    ids: List[str],
+    update_data: Dict[str, Any],
+    on_updated: Callable[[List[Dict], List[Dict]], Awaitable[None]] | None = None,
+) -> BulkResult:
+    """
+    Áp dụng cùng một $set cho nhiều document: một lần đọc $in để biết id nào
+    tồn tại, một lệnh bulk_write, rồi cập nhật bản đã đọc trong bộ nhớ thay
+    cho việc đọc lại từng document.
+    on_updated(trước, sau): gọi với các document đã cập nhật thành công.
+    """
+    ids = list(dict.fromkeys(ids))
+    _check_bulk_size(ids)
+    docs = await collection.find({"_id": {"$in": ids}}).to_list(length=len(ids))
+    found = {doc["_id"]: doc for doc in docs}
+    existing = [i for i in ids if i in found]
+    errors = {}
+    if update_data:
+        update_data = {**update_data, "updated_at": get_iso_now()}
+        operations = [UpdateOne({"_id": i}, {"$set": update_data}) for i in existing]
+        errors = await _bulk_write(collection, operations)
+
+    failed = {existing[index]: message for index, message in errors.items()}
+    if on_updated is not None and update_data:
+        before = [found[i] for i in existing if i not in failed]
+        await on_updated(before, [{**doc, **update_data} for doc in before])
+    results: BulkResult = []
+    for i in ids:
+        if i not in found:
+            results.append((i, None, "Không tìm thấy"))
+        elif i in failed:
+            results.append((i, None, failed[i]))
+        else:
+            results.append((i, {**found[i], **update_data}, None))
+    return results
+
+
+# --- Cập nhật một document ---
+# find_one_and_update trả về bản sau khi cập nhật trong cùng một round trip
+# (không đọc lại, không lẫn thay đổi của request khác chen vào giữa).
+# expected_updated_at: client gửi lại updated_at đã đọc, update chỉ áp dụng
+# khi document chưa bị ai sửa từ lúc đó (optimistic concurrency).
+CONFLICT_MESSAGE = "Dữ liệu đã bị người khác thay đổi, vui lòng tải lại rồi thử lại."
+
+
+async def _update_by_id(
+    collection,
+    doc_id: str,
+    update_data: Dict[str, Any],
+    expected_updated_at: str | None = None,
+    return_document: ReturnDocument = ReturnDocument.AFTER,
+) -> Dict[str, Any] | None:
+    """
+    $set một document; None nếu không tồn tại, ValueError nếu xung đột.
+    return_document=BEFORE: trả về bản trước khi cập nhật (để tính chênh lệch).
+    """
+    query = {"_id": doc_id}
+    if expected_updated_at is not None:
+        query["updated_at"] = expected_updated_at
+    updated = await collection.find_one_and_update(
+        query, {"$set": update_data}, return_document=return_document
+    )
+    if updated is None and expected_updated_at is not None:
+        # Chỉ khi không khớp mới đọc thêm để phân biệt xung đột / không tồn tại
+        if await collection.find_one({"_id": doc_id}, {"_id": 1}):
+            raise ValueError(CONFLICT_MESSAGE)
+    return updated
+
+
 USER_COLLECTION = "users"
+# Field tìm theo tiền tố (bản chuẩn hóa lưu trong "search_keys")
+USER_SEARCH_FIELDS = ("name", "email", "organization")
+USER_INDEXES = [
+    IndexModel([("email", ASCENDING)], name="email"),  # login_user
+    IndexModel(KEYSET_KEYS, name="created_at_id"),
+    # jobs: $pull event đã xóa khỏi registered_events
+    IndexModel([("registered_events", ASCENDING)], name="registered_events"),
+    # search_users: regex neo đầu chuỗi quét một khoảng của index (multikey)
+    IndexModel([("search_keys", ASCENDING)], name="search_keys"),
+    IndexModel(
+        [("role", ASCENDING), ("search_keys", ASCENDING)], name="role_search_keys"
+    ),
+    # reconcile: user thay đổi kể từ lần đối soát trước
+    IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+]
 
 
 async def login_user(
@@ -37,16 +240,53 @@ async def login_user(
 
 
 async def get_users(
-    db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 10
-) -> tuple[List[Dict[str, Any]], int]:
-    users_cursor = db[USER_COLLECTION].find().skip(skip).limit(limit)
+    db: AsyncIOMotorDatabase,
+    skip: int = 0,
+    limit: int = 10,
+    projection: Dict[str, Any] | None = None,
+    count_mode: str = "exact",
+) -> tuple[List[Dict[str, Any]], int | None]:
+    users_cursor = db[USER_COLLECTION].find({}, projection).skip(skip).limit(limit)
     users_task = users_cursor.to_list(length=limit)
-    count_task = db[USER_COLLECTION].count_documents({})
+    count_task = _count(db[USER_COLLECTION], {}, count_mode)
 
     users, total_count = await asyncio.gather(users_task, count_task)
     return users, total_count
 
 
+async def search_users(
+    db: AsyncIOMotorDatabase,
+    prefix: str,
+    role: str | None = None,
+    first: int = 10,
+    projection: Dict[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Tìm user có tên / email / đơn vị bắt đầu bằng `prefix` (không phân biệt
+    dấu, hoa thường, khớp cả từ giữa tên). Dùng cho ô chọn diễn giả / tác giả.
+    """
+    terms = " ".join(normalize_search(prefix).split())
+    if not terms:
+        return []
+    # Regex "^..." phân biệt hoa thường (khóa đã chuẩn hóa) nên MongoDB chỉ
+    # quét khoảng [terms, terms + 1) của index thay vì cả collection
+    query: Dict[str, Any] = {"search_keys": {"$regex": f"^{re.escape(terms)}"}}
+    if role is not None:
+        query["role"] = role
+    cursor = db[USER_COLLECTION].find(query, projection).limit(first)
+    return await cursor.to_list(length=first)
+
+
+async def get_users_after(
+    db: AsyncIOMotorDatabase,
+    first: int = 10,
+    after: tuple[str, str] | None = None,
+    projection: Dict[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    """Lấy danh sách user theo cursor (created_at, _id)."""
+    return await _find_after(db[USER_COLLECTION], {}, first, after, projection)
+
+
 async def get_user_by_id(
     db: AsyncIOMotorDatabase, user_id: str
 ) -> Dict[str, Any] | None:
@@ -54,23 +294,25 @@ async def get_user_by_id(
     return user
 
 
+async def get_users_by_ids(
+    db: AsyncIOMotorDatabase, user_ids: List[str]
+) -> List[Dict[str, Any]]:
+    """Lấy nhiều user cùng lúc bằng một truy vấn $in (dùng cho DataLoader)."""
+    cursor = db[USER_COLLECTION].find({"_id": {"$in": user_ids}})
+    return await cursor.to_list(length=None)
+
+
 async def create_user(
     db: AsyncIOMotorDatabase, user_in: CreateUserInput
 ) -> Dict[str, Any]:
 
-    # Get the last user ID and increment
-    last_user = await db[USER_COLLECTION].find_one(sort=[("_id", -1)])
-    if last_user:
-        last_id = last_user["_id"]
-        num = int(last_id[1:]) + 1
-        new_id = f"u{num:03d}"
-    else:
-        new_id = "u001"
+    new_id = await id_allocator.next_id(db, USER_COLLECTION, "u")
 
     user_data = user_in.__dict__
     user_data["_id"] = new_id
     user_data["password"] = hash_password(user_data["password"])
     user_data["registered_events"] = []
+    user_data["search_keys"] = search_keys(user_data, USER_SEARCH_FIELDS)
     now = datetime.datetime.now(datetime.timezone.utc)
     now_str = get_iso_now()
     user_data["created_at"] = now_str
@@ -80,7 +322,10 @@ async def create_user(
 
 
 async def update_user(
-    db: AsyncIOMotorDatabase, user_id: str, user_in: UpdateUserInput
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    user_in: UpdateUserInput,
+    expected_updated_at: str | None = None,
 ) -> Dict[str, Any] | None:
     update_data = strawberry.asdict(user_in)
     update_data = {k: v for k, v in update_data.items() if v is not strawberry.UNSET}
@@ -97,15 +342,21 @@ async def update_user(
     if not update_data:
         return await get_user_by_id(db, user_id)
 
-    # 3. Cập nhật DB
-    result = await db[USER_COLLECTION].update_one(
-        {"_id": user_id}, {"$set": update_data}
-    )
+    # 3. Khóa tìm kiếm gộp từ nhiều field: đọc các field không đổi để tính lại
+    if any(field in update_data for field in USER_SEARCH_FIELDS):
+        current = await db[USER_COLLECTION].find_one(
+            {"_id": user_id}, {field: 1 for field in USER_SEARCH_FIELDS}
+        )
+        if current is None:
+            return None
+        merged = {**current, **update_data}
+        update_data["search_keys"] = search_keys(merged, USER_SEARCH_FIELDS)
 
-    # 4. Trả về
-    if result.matched_count:
-        return await get_user_by_id(db, user_id)
-    return None
+    # 4. Cập nhật DB và trả về bản mới
+    update_data["updated_at"] = get_iso_now()
+    return await _update_by_id(
+        db[USER_COLLECTION], user_id, update_data, expected_updated_at
+    )
 
 
 async def delete_user(db: AsyncIOMotorDatabase, user_id: str) -> bool:
@@ -116,45 +367,149 @@ async def delete_user(db: AsyncIOMotorDatabase, user_id: str) -> bool:
 # --- 🚀 CRUD cho Event ---
 
 EVENT_COLLECTION = "events"
+# Lưu dạng BSON date (xem utils.parse_datetime)
+EVENT_DATE_FIELDS = ("start_date", "end_date")
+# Field được tìm kiếm (bản không dấu lưu trong "search", xem search())
+EVENT_SEARCH_FIELDS = ("title", "description", "location")
+EVENT_INDEXES = [
+    IndexModel([("status", ASCENDING), *KEYSET_KEYS], name="status_created_at_id"),
+    IndexModel(KEYSET_KEYS, name="created_at_id"),
+    IndexModel([("start_date", ASCENDING)], name="start_date"),  # lọc khoảng
+    # reconcile: event thay đổi kể từ lần đối soát trước
+    IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    IndexModel(
+        [(f"search.{field}", TEXT) for field in EVENT_SEARCH_FIELDS],
+        name="search_text",
+        weights={"search.title": 10, "search.location": 3, "search.description": 1},
+        default_language="none",
+    ),
+]
+
+
+def _date_period(date: str) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Khoảng [start, end) ứng với `date` (UTC): "2025" cả năm, "2025-12" cả
+    tháng, "2025-12-01" (hoặc chuỗi ISO đầy đủ) một ngày kể từ thời điểm đó.
+    """
+    match = re.fullmatch(r"(\d{4})(?:-(\d{2}))?", date.strip())
+    if match is None:
+        day = parse_datetime(date)
+        return day, day + datetime.timedelta(days=1)
+    year, month = int(match.group(1)), match.group(2)
+    try:
+        if month is None:
+            start = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+            return start, start.replace(year=year + 1)
+        start = datetime.datetime(year, int(month), 1, tzinfo=datetime.timezone.utc)
+    except ValueError as e:
+        raise ValueError(f"Ngày không hợp lệ: {date}") from e
+    if start.month == 12:
+        return start, start.replace(year=year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def _date_range(
+    date: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> Dict[str, Any] | None:
+    """
+    Điều kiện khoảng thời gian [from, to) cho một field BSON date (dùng index):
+    - date="2025" / "2025-12" / "2025-12-01": cả năm / tháng / ngày đó (UTC)
+    - date_from / date_to: chuỗi ISO bất kỳ; có thể kết hợp với date
+    """
+    lower = parse_datetime(date_from) if date_from else None
+    upper = parse_datetime(date_to) if date_to else None
+    if date:
+        start, end = _date_period(date)
+        lower = max(lower, start) if lower else start
+        upper = min(upper, end) if upper else end
 
+    condition = {}
+    if lower is not None:
+        condition["$gte"] = lower
+    if upper is not None:
+        condition["$lt"] = upper
+    return condition or None
 
-async def get_events(
-    db: AsyncIOMotorDatabase,
-    skip: int = 0,
-    limit: int = 10,
+
+def _events_query(
     status: str | None = None,
     date: str | None = None,
-) -> tuple[List[Dict[str, Any]], int]:
-    """Lấy danh sách các sự kiện (phân trang) có hỗ trợ lọc theo status và date."""
-
-    # 1. Xây dựng bộ lọc (Query Builder)
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> dict:
+    """Bộ lọc dùng chung cho get_events / get_events_after."""
     query = {}
 
     # Nếu có status, thêm vào điều kiện tìm kiếm
     if status:
         query["status"] = status
 
-    # Nếu có date, tìm các start_date bắt đầu bằng chuỗi ngày đó
-    # Ví dụ: date="2025-12-01" sẽ tìm thấy "2025-12-01T09:00:00"
-    if date:
-        query["start_date"] = {"$regex": f"^{date}"}
+    # Lọc theo start_date: date = một ngày, date_from / date_to = khoảng
+    start_date = _date_range(date, date_from, date_to)
+    if start_date:
+        query["start_date"] = start_date
+
+    return query
+
+
+async def get_events(
+    db: AsyncIOMotorDatabase,
+    skip: int = 0,
+    limit: int = 10,
+    status: str | None = None,
+    date: str | None = None,
+    projection: Dict[str, Any] | None = None,
+    count_mode: str = "exact",
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> tuple[List[Dict[str, Any]], int | None]:
+    """
+    Lấy danh sách các sự kiện (phân trang) có hỗ trợ lọc theo status và
+    start_date (một ngày hoặc khoảng date_from / date_to).
+    `projection` giới hạn các field được đọc từ MongoDB (None = toàn bộ).
+    `count_mode` quyết định cách đếm tổng (xem _count).
+    """
+
+    # 1. Xây dựng bộ lọc (Query Builder)
+    query = _events_query(status, date, date_from, date_to)
 
     # 2. Thực hiện truy vấn
     # Lưu ý: Truyền `query` vào find()
     # Thêm .sort("created_at", -1) để sắp xếp mới nhất lên đầu
     events_cursor = (
-        db[EVENT_COLLECTION].find(query).sort("created_at", -1).skip(skip).limit(limit)
+        db[EVENT_COLLECTION]
+        .find(query, projection)
+        .sort("created_at", -1)
+        .skip(skip)
+        .limit(limit)
     )
 
     events_task = events_cursor.to_list(length=limit)
 
     # 3. Đếm tổng số record khớp với bộ lọc (QUAN TRỌNG: Phải truyền query vào đây)
-    count_task = db[EVENT_COLLECTION].count_documents(query)
+    count_task = _count(db[EVENT_COLLECTION], query, count_mode)
 
     events, total_count = await asyncio.gather(events_task, count_task)
     return events, total_count
 
 
+async def get_events_after(
+    db: AsyncIOMotorDatabase,
+    first: int = 10,
+    after: tuple[str, str] | None = None,
+    status: str | None = None,
+    date: str | None = None,
+    projection: Dict[str, Any] | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> List[Dict[str, Any]]:
+    """Lấy danh sách sự kiện theo cursor (created_at, _id), mới nhất trước."""
+    query = _events_query(status, date, date_from, date_to)
+    return await _find_after(db[EVENT_COLLECTION], query, first, after, projection)
+
+
 async def get_event_by_id(
     db: AsyncIOMotorDatabase, event_id: str
 ) -> Dict[str, Any] | None:
@@ -163,21 +518,25 @@ async def get_event_by_id(
     return event
 
 
+async def get_events_by_ids(
+    db: AsyncIOMotorDatabase, event_ids: List[str]
+) -> List[Dict[str, Any]]:
+    """Lấy nhiều sự kiện cùng lúc bằng một truy vấn $in (dùng cho DataLoader)."""
+    cursor = db[EVENT_COLLECTION].find({"_id": {"$in": event_ids}})
+    return await cursor.to_list(length=None)
+
+
 async def create_event(
     db: AsyncIOMotorDatabase, event_in: CreateEventInput, user_id: str
 ) -> Dict[str, Any]:
     """Tạo một sự kiện mới."""
-    last_event = await db[EVENT_COLLECTION].find_one(sort=[("_id", -1)])
-    if last_event:
-        last_id = last_event["_id"]
-        num = int(last_id[1:]) + 1
-        new_id = f"e{num:03d}"
-    else:
-        new_id = "e001"
+    new_id = await id_allocator.next_id(db, EVENT_COLLECTION, "e")
 
     event_data = event_in.__dict__
     event_data["_id"] = new_id
     event_data["organizer_id"] = user_id
+    parse_datetime_fields(event_data, EVENT_DATE_FIELDS)
+    add_search_fields(event_data, EVENT_SEARCH_FIELDS)
 
     now_str = get_iso_now()
     event_data["created_at"] = now_str
@@ -188,7 +547,10 @@ async def create_event(
 
 
 async def update_event(
-    db: AsyncIOMotorDatabase, event_id: str, event_in: UpdateEventInput
+    db: AsyncIOMotorDatabase,
+    event_id: str,
+    event_in: UpdateEventInput,
+    expected_updated_at: str | None = None,
 ) -> Dict[str, Any] | None:
     """Cập nhật một sự kiện."""
     update_data = strawberry.asdict(event_in)
@@ -197,17 +559,15 @@ async def update_event(
     if not update_data:
         return await get_event_by_id(db, event_id)
 
+    parse_datetime_fields(update_data, EVENT_DATE_FIELDS)
+    update_data.update(search_field_updates(update_data, EVENT_SEARCH_FIELDS))
     # Tự động cập nhật 'updated_at'
     update_data["updated_at"] = get_iso_now()
 
-    result = await db[EVENT_COLLECTION].update_one(
-        {"_id": event_id}, {"$set": update_data}
+    return await _update_by_id(
+        db[EVENT_COLLECTION], event_id, update_data, expected_updated_at
     )
 
-    if result.matched_count:
-        return await get_event_by_id(db, event_id)
-    return None
-
 
 async def delete_event(db: AsyncIOMotorDatabase, event_id: str) -> bool:
     """Xóa một sự kiện."""
@@ -218,6 +578,27 @@ async def delete_event(db: AsyncIOMotorDatabase, event_id: str) -> bool:
 # --- 📅 CRUD cho Session ---
 
 SESSION_COLLECTION = "sessions"
+SESSION_DATE_FIELDS = ("start_time", "end_time")
+SESSION_INDEXES = [
+    IndexModel([("event_id", ASCENDING), *KEYSET_KEYS], name="event_created_at_id"),
+    IndexModel(KEYSET_KEYS, name="created_at_id"),
+    IndexModel([("start_time", ASCENDING)], name="start_time"),  # lọc khoảng
+]
+
+
+def _sessions_query(
+    event_id: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> dict:
+    """Bộ lọc dùng chung cho get_sessions / get_sessions_after."""
+    query = {}
+    if event_id:
+        query["event_id"] = event_id
+    start_time = _date_range(date_from=date_from, date_to=date_to)
+    if start_time:
+        query["start_time"] = start_time
+    return query
 
 
 async def get_sessions(
@@ -225,26 +606,49 @@ async def get_sessions(
     skip: int = 0,
     limit: int = 10,
     event_id: str | None = None,  # <--- 1. Thêm tham số này (Optional[str])
-) -> tuple[List[Dict[str, Any]], int]:
-    """Lấy danh sách các phiên (phân trang), có thể lọc theo event_id."""
+    projection: Dict[str, Any] | None = None,
+    count_mode: str = "exact",
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> tuple[List[Dict[str, Any]], int | None]:
+    """
+    Lấy danh sách các phiên (phân trang), có thể lọc theo event_id và khoảng
+    start_time [date_from, date_to).
+    """
 
     # 2. Tạo bộ lọc (filter query)
-    filter_query = {}
-    if event_id:
-        filter_query["event_id"] = event_id
+    filter_query = _sessions_query(event_id, date_from, date_to)
 
     # 3. Truyền bộ lọc vào find()
-    sessions_cursor = db[SESSION_COLLECTION].find(filter_query).skip(skip).limit(limit)
+    sessions_cursor = (
+        db[SESSION_COLLECTION].find(filter_query, projection).skip(skip).limit(limit)
+    )
     sessions_task = sessions_cursor.to_list(length=limit)
 
     # 4. QUAN TRỌNG: Truyền bộ lọc vào count_documents()
     # để đếm đúng số lượng record sau khi lọc
-    count_task = db[SESSION_COLLECTION].count_documents(filter_query)
+    count_task = _count(db[SESSION_COLLECTION], filter_query, count_mode)
 
     sessions, total_count = await asyncio.gather(sessions_task, count_task)
     return sessions, total_count
 
 
+async def get_sessions_after(
+    db: AsyncIOMotorDatabase,
+    first: int = 10,
+    after: tuple[str, str] | None = None,
+    event_id: str | None = None,
+    projection: Dict[str, Any] | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> List[Dict[str, Any]]:
+    """Lấy danh sách phiên theo cursor (created_at, _id)."""
+    filter_query = _sessions_query(event_id, date_from, date_to)
+    return await _find_after(
+        db[SESSION_COLLECTION], filter_query, first, after, projection
+    )
+
+
 async def get_session_by_id(
     db: AsyncIOMotorDatabase, session_id: str
 ) -> Dict[str, Any] | None:
@@ -276,20 +680,33 @@ async def get_papers_by_session(
     return papers
 
 
+async def get_papers_by_sessions(
+    db: AsyncIOMotorDatabase,
+    session_ids: List[str],
+    status: str | None = "approved",
+) -> List[Dict[str, Any]]:
+    """
+    Phiên bản gom nhóm của get_papers_by_session: lấy bài báo của nhiều phiên
+    trong một truy vấn $in. Việc chia lại theo session_id do DataLoader đảm nhận.
+    """
+    query = {"session_id": {"$in": session_ids}}
+
+    if status:
+        query["status"] = status
+
+    cursor = db[PAPER_COLLECTION].find(query)
+    return await cursor.to_list(length=None)
+
+
 async def create_session(
     db: AsyncIOMotorDatabase, session_in: CreateSessionInput
 ) -> Dict[str, Any]:
     """Tạo một phiên mới."""
-    last_session = await db[SESSION_COLLECTION].find_one(sort=[("_id", -1)])
-    if last_session:
-        last_id = last_session["_id"]
-        num = int(last_id[1:]) + 1
-        new_id = f"s{num:03d}"
-    else:
-        new_id = "s001"
+    new_id = await id_allocator.next_id(db, SESSION_COLLECTION, "s")
 
     session_data = session_in.__dict__
     session_data["_id"] = new_id
+    parse_datetime_fields(session_data, SESSION_DATE_FIELDS)
 
     now_str = get_iso_now()
     session_data["created_at"] = now_str
@@ -300,7 +717,10 @@ async def create_session(
 
 
 async def update_session(
-    db: AsyncIOMotorDatabase, session_id: str, session_in: UpdateSessionInput
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    session_in: UpdateSessionInput,
+    expected_updated_at: str | None = None,
 ) -> Dict[str, Any] | None:
     """Cập nhật một phiên."""
     update_data = strawberry.asdict(session_in)
@@ -309,16 +729,13 @@ async def update_session(
     if not update_data:
         return await get_session_by_id(db, session_id)
 
+    parse_datetime_fields(update_data, SESSION_DATE_FIELDS)
     update_data["updated_at"] = get_iso_now()
 
-    result = await db[SESSION_COLLECTION].update_one(
-        {"_id": session_id}, {"$set": update_data}
+    return await _update_by_id(
+        db[SESSION_COLLECTION], session_id, update_data, expected_updated_at
     )
 
-    if result.matched_count:
-        return await get_session_by_id(db, session_id)
-    return None
-
 
 async def delete_session(db: AsyncIOMotorDatabase, session_id: str) -> bool:
     """Xóa một phiên."""
@@ -326,9 +743,62 @@ async def delete_session(db: AsyncIOMotorDatabase, session_id: str) -> bool:
     return result.deleted_count > 0
 
 
+async def bulk_create_sessions(
+    db: AsyncIOMotorDatabase, sessions_in: List[CreateSessionInput]
+) -> BulkResult:
+    """Tạo nhiều phiên bằng một lệnh bulk_write."""
+    _check_bulk_size(sessions_in)
+    new_ids = await id_allocator.next_ids(db, SESSION_COLLECTION, "s", len(sessions_in))
+
+    now_str = get_iso_now()
+    docs = []
+    invalid = {}  # phần tử có input không hợp lệ thì không được ghi
+    for new_id, session_in in zip(new_ids, sessions_in):
+        session_data = dict(session_in.__dict__)
+        session_data["_id"] = new_id
+        try:
+            parse_datetime_fields(session_data, SESSION_DATE_FIELDS)
+        except ValueError as e:
+            invalid[new_id] = str(e)
+            continue
+        session_data["created_at"] = now_str
+        session_data["updated_at"] = now_str
+        docs.append(session_data)
+
+    errors = await _bulk_write(db[SESSION_COLLECTION], [InsertOne(d) for d in docs])
+    failed = {docs[index]["_id"]: message for index, message in errors.items()}
+    failed.update(invalid)
+    created = {doc["_id"]: doc for doc in docs}
+    results: BulkResult = []
+    for new_id in new_ids:
+        if new_id in failed:
+            results.append((new_id, None, failed[new_id]))
+        else:
+            results.append((new_id, created[new_id], None))
+    return results
+
+
 # --- 🎟️ CRUD cho Registration ---
 
 REGISTRATION_COLLECTION = "registrations"
+REGISTRATION_INDEXES = [
+    IndexModel([("event_id", ASCENDING), ("user_id", ASCENDING)], name="event_user"),
+    IndexModel([("user_id", ASCENDING), *KEYSET_KEYS], name="user_created_at_id"),
+    IndexModel([("event_id", ASCENDING), *KEYSET_KEYS], name="event_created_at_id"),
+    IndexModel(KEYSET_KEYS, name="created_at_id"),
+    # Hàng chờ FIFO: promote_waitlist và vị trí trong hàng chờ
+    IndexModel(
+        [("event_id", ASCENDING), ("status", ASCENDING), ("waitlist_seq", ASCENDING)],
+        name="event_status_waitlist_seq",
+    ),
+    # reconcile: distinct event_id / user_id theo updated_at chỉ đọc index
+    IndexModel(
+        [("updated_at", ASCENDING), ("event_id", ASCENDING), ("user_id", ASCENDING)],
+        name="updated_at_event_user",
+    ),
+]
+WAITLISTED = "waitlisted"
+PAID = "paid"  # payment_status tính vào doanh thu
 
 
 # src/crud.py
@@ -342,7 +812,9 @@ async def get_registrations(
     limit: int = 10,
     event_id: str = None,  # <--- Thêm tham số này
     user_id: str = None,  # <--- Thêm tham số này
-) -> tuple[List[Dict[str, Any]], int]:
+    projection: Dict[str, Any] | None = None,
+    count_mode: str = "exact",
+) -> tuple[List[Dict[str, Any]], int | None]:
 
     # 1. Tạo bộ lọc query
     filter_query = {}
@@ -353,17 +825,39 @@ async def get_registrations(
 
     # 2. Truyền filter_query vào find() và count_documents()
     registrations_cursor = (
-        db[REGISTRATION_COLLECTION].find(filter_query).skip(skip).limit(limit)
+        db[REGISTRATION_COLLECTION]
+        .find(filter_query, projection)
+        .skip(skip)
+        .limit(limit)
     )
     registrations_task = registrations_cursor.to_list(length=limit)
-    count_task = db[REGISTRATION_COLLECTION].count_documents(
-        filter_query
+    count_task = _count(
+        db[REGISTRATION_COLLECTION], filter_query, count_mode
     )  # <--- Nhớ thêm filter vào đây để đếm đúng
 
     registrations, total_count = await asyncio.gather(registrations_task, count_task)
     return registrations, total_count
 
 
+async def get_registrations_after(
+    db: AsyncIOMotorDatabase,
+    first: int = 10,
+    after: tuple[str, str] | None = None,
+    event_id: str | None = None,
+    user_id: str | None = None,
+    projection: Dict[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    """Lấy danh sách đăng ký theo cursor (created_at, _id)."""
+    filter_query = {}
+    if event_id:
+        filter_query["event_id"] = event_id
+    if user_id:
+        filter_query["user_id"] = user_id
+    return await _find_after(
+        db[REGISTRATION_COLLECTION], filter_query, first, after, projection
+    )
+
+
 async def get_registration_by_id(
     db: AsyncIOMotorDatabase, registration_id: str
 ) -> Dict[str, Any] | None:
@@ -372,22 +866,48 @@ async def get_registration_by_id(
     return registration
 
 
+async def get_confirmed_registration(
+    db: AsyncIOMotorDatabase, user_id: str, event_id: str
+) -> Dict[str, Any] | None:
+    """Đăng ký đã xác nhận của user cho sự kiện (dùng index event_user)."""
+    return await db[REGISTRATION_COLLECTION].find_one(
+        {"event_id": event_id, "user_id": user_id, "status": "confirmed"},
+        {"_id": 1},
+    )
+
+
+async def get_registered_event_ids(db: AsyncIOMotorDatabase, user_id: str) -> List[str]:
+    """Các sự kiện user có đăng ký (dùng index user_created_at_id)."""
+    return await db[REGISTRATION_COLLECTION].distinct("event_id", {"user_id": user_id})
+
+
 async def create_registration(
     db: AsyncIOMotorDatabase,
     registration_in: CreateRegistrationInput,
     user_id: str,  # Lấy từ context
 ) -> Dict[str, Any]:
-    """Tạo một đăng ký mới và cập nhật User + Event."""
-
-    # 1. Tạo ID cho Registration
-    last_reg = await db[REGISTRATION_COLLECTION].find_one(sort=[("_id", -1)])
-    if last_reg:
-        last_id = last_reg["_id"]
-        num = int(last_id[1:]) + 1
-        new_id = f"r{num:03d}"
-    else:
-        new_id = "r001"
+    """
+    Tạo một đăng ký mới và cập nhật User + Event.
 
+    Chỗ ngồi được quyết định bằng một find_one_and_update có điều kiện
+    current_participants < max_participants, nên nhiều request đồng thời
+    không thể vượt quá sức chứa. Các lệnh ghi còn lại chạy song song; nếu một
+    lệnh lỗi, các lệnh đã thành công được hoàn tác (kể cả chỗ ngồi).
+    Sự kiện đã đủ chỗ thì đăng ký vào hàng chờ (status "waitlisted").
+    """
+    event_id = registration_in.event_id
+
+    # 1. Cấp ID trước rồi mới giữ chỗ (nguyên tử): cấp ID lỗi thì chưa có
+    # chỗ nào bị giữ, không cần hoàn tác
+    new_id = await id_allocator.next_id(db, REGISTRATION_COLLECTION, "r")
+    seat = await db[EVENT_COLLECTION].find_one_and_update(
+        {
+            "_id": event_id,
+            "$expr": {"$lt": ["$current_participants", "$max_participants"]},
+        },
+        {"$inc": {"current_participants": 1}},
+        projection={"_id": 1},
+    )
     registration_data = registration_in.__dict__
     registration_data["_id"] = new_id
 
@@ -400,28 +920,88 @@ async def create_registration(
     registration_data["created_at"] = now_str
     registration_data["updated_at"] = now_str
 
-    # 2. Insert vào Registration Collection
-    await db[REGISTRATION_COLLECTION].insert_one(registration_data)
-
-    # 3. Cập nhật Event: Tăng số lượng người tham gia
-    await db[EVENT_COLLECTION].update_one(
-        {"_id": registration_data["event_id"]}, {"$inc": {"current_participants": 1}}
-    )
-
-    # --- [MỚI] 4. Cập nhật User: Thêm event_id vào danh sách registered_events ---
-    # Dùng $addToSet để đảm bảo event_id chỉ xuất hiện 1 lần trong mảng
-    await db[USER_COLLECTION].update_one(
-        {"_id": user_id},
-        {"$addToSet": {"registered_events": registration_data["event_id"]}},
+    if seat is None:
+        # Hết chỗ: lấy số thứ tự hàng chờ từ bộ đếm trên chính event
+        # (cũng là cách kiểm tra event có tồn tại hay không)
+        event = await db[EVENT_COLLECTION].find_one_and_update(
+            {"_id": event_id},
+            {"$inc": {"waitlist_counter": 1}},
+            projection={"waitlist_counter": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if event is None:
+            raise ValueError("Sự kiện không tồn tại.")
+        registration_data["status"] = WAITLISTED
+        registration_data["waitlist_seq"] = event["waitlist_counter"]
+        await db[REGISTRATION_COLLECTION].insert_one(registration_data)
+        await update_event_daily_stats(db, added=[registration_data])
+        return registration_data
+
+    # 2. Insert Registration và thêm event_id vào registered_events của User
+    # ($addToSet: event_id chỉ xuất hiện 1 lần trong mảng) cùng lúc
+    inserted, user_updated = await asyncio.gather(
+        db[REGISTRATION_COLLECTION].insert_one(registration_data),
+        db[USER_COLLECTION].update_one(
+            {"_id": user_id}, {"$addToSet": {"registered_events": event_id}}
+        ),
+        return_exceptions=True,
     )
+    errors = [r for r in (inserted, user_updated) if isinstance(r, Exception)]
+    if errors:
+        await _undo_registration(db, registration_data, inserted, user_updated)
+        raise errors[0]
 
+    await update_event_daily_stats(db, added=[registration_data])
     return registration_data
 
 
+async def _undo_registration(
+    db: AsyncIOMotorDatabase,
+    registration_data: Dict[str, Any],
+    inserted: Any,
+    user_updated: Any,
+) -> None:
+    """Hoàn tác (best-effort) các bước đã thành công của create_registration."""
+    undo = [
+        db[EVENT_COLLECTION].update_one(
+            {"_id": registration_data["event_id"]},
+            {"$inc": {"current_participants": -1}},
+        )
+    ]
+    if not isinstance(inserted, Exception):
+        undo.append(
+            db[REGISTRATION_COLLECTION].delete_one({"_id": registration_data["_id"]})
+        )
+    # Chỉ rút event_id nếu chính lệnh này đã thêm vào (không có sẵn từ trước)
+    if not isinstance(user_updated, Exception) and user_updated.modified_count:
+        undo.append(
+            db[USER_COLLECTION].update_one(
+                {"_id": registration_data["user_id"]},
+                {"$pull": {"registered_events": registration_data["event_id"]}},
+            )
+        )
+    await asyncio.gather(*undo, return_exceptions=True)
+
+
+def _status_change_error(current: str | None, new: str) -> str | None:
+    """
+    Chỉ create_registration / promote_waitlist (có giữ chỗ) được đổi trạng
+    thái vào / ra khỏi hàng chờ; cập nhật thường mà làm vậy sẽ vượt sức chứa
+    hoặc giữ chỗ không ai dùng. Trạng thái rời hàng chờ chỉ bằng promote, nên
+    đọc trạng thái hiện tại trước khi ghi không bị race.
+    """
+    if new == WAITLISTED:
+        return "Không thể chuyển đăng ký vào hàng chờ bằng cập nhật trạng thái."
+    if current == WAITLISTED:
+        return "Đăng ký đang ở hàng chờ chỉ được chuyển lên khi sự kiện có chỗ trống."
+    return None
+
+
 async def update_registration(
     db: AsyncIOMotorDatabase,
     registration_id: str,
     registration_in: UpdateRegistrationInput,
+    expected_updated_at: str | None = None,
 ) -> Dict[str, Any] | None:
     """Cập nhật một đăng ký (thường là status)."""
     update_data = strawberry.asdict(registration_in)
@@ -430,46 +1010,447 @@ async def update_registration(
     if not update_data:
         return await get_registration_by_id(db, registration_id)
 
+    if "status" in update_data:
+        current = await db[REGISTRATION_COLLECTION].find_one(
+            {"_id": registration_id}, {"status": 1}
+        )
+        if current is None:
+            return None
+        error = _status_change_error(current.get("status"), update_data["status"])
+        if error:
+            raise ValueError(error)
+
     update_data["updated_at"] = get_iso_now()
 
-    result = await db[REGISTRATION_COLLECTION].update_one(
-        {"_id": registration_id}, {"$set": update_data}
+    if not any(field in update_data for field in DAILY_STATS_FIELDS):
+        return await _update_by_id(
+            db[REGISTRATION_COLLECTION],
+            registration_id,
+            update_data,
+            expected_updated_at,
+        )
+
+    # Đổi trạng thái / thanh toán: cần bản cũ để trừ khỏi event_daily_stats
+    before = await _update_by_id(
+        db[REGISTRATION_COLLECTION],
+        registration_id,
+        update_data,
+        expected_updated_at,
+        return_document=ReturnDocument.BEFORE,
     )
+    if before is None:
+        return None
+    after = {**before, **update_data}
+    await update_event_daily_stats(db, added=[after], removed=[before])
+    return after
 
-    if result.matched_count:
-        return await get_registration_by_id(db, registration_id)
-    return None
 
+async def _hand_over_seat(db: AsyncIOMotorDatabase, event_id: str) -> str | None:
+    """
+    Chuyển chỗ vừa trống cho người đầu hàng chờ (waitlist_seq nhỏ nhất) bằng
+    một find_one_and_update: current_participants giữ nguyên nên không request
+    create_registration nào chen vào chỗ đó được. Trả về ID đăng ký được
+    chuyển lên, hoặc None nếu hàng chờ trống.
+    """
+    waiting = await db[REGISTRATION_COLLECTION].find_one_and_update(
+        {"event_id": event_id, "status": WAITLISTED},
+        {
+            "$set": {"status": "pending", "updated_at": get_iso_now()},
+            "$unset": {"waitlist_seq": ""},
+        },
+        projection={"user_id": 1, **DAILY_STATS_PROJECTION},
+        sort=[("waitlist_seq", ASCENDING)],
+    )
+    if waiting is None:
+        return None
+    await asyncio.gather(
+        db[USER_COLLECTION].update_one(
+            {"_id": waiting["user_id"]}, {"$addToSet": {"registered_events": event_id}}
+        ),
+        update_event_daily_stats(
+            db, added=[{**waiting, "status": "pending"}], removed=[waiting]
+        ),
+    )
+    return waiting["_id"]
 
-async def delete_registration(db: AsyncIOMotorDatabase, registration_id: str) -> bool:
-    """Xóa một đăng ký và cập nhật lại User + Event."""
 
-    # 1. Tìm Registration trước khi xóa để lấy thông tin
-    reg = await get_registration_by_id(db, registration_id)
+async def delete_registration(
+    db: AsyncIOMotorDatabase, registration_id: str
+) -> Dict[str, Any] | None:
+    """
+    Xóa một đăng ký và cập nhật lại User + Event.
+    Trả về document đã xóa (để invalidate cache của sự kiện) hoặc None.
+    Chỗ được giải phóng được chuyển ngay cho người đầu hàng chờ (FIFO); chỉ
+    khi hàng chờ trống mới giảm current_participants.
+    """
+
+    # 1. Xóa Registration (find_one_and_delete: hai request xóa cùng lúc
+    # không thể cùng trả chỗ hai lần)
+    reg = await db[REGISTRATION_COLLECTION].find_one_and_delete(
+        {"_id": registration_id}
+    )
 
-    if reg:
+    # Đăng ký trong hàng chờ chưa chiếm chỗ và chưa nằm trong registered_events
+    if reg and reg.get("status") != WAITLISTED:
         event_id = reg["event_id"]
         user_id = reg["user_id"]
 
-        # 2. Cập nhật Event: Giảm số lượng người tham gia
-        await db[EVENT_COLLECTION].update_one(
-            {"_id": event_id}, {"$inc": {"current_participants": -1}}
+        # 2. Xóa event_id khỏi registered_events; chỗ ngồi chuyển cho hàng
+        # chờ, không còn ai chờ thì mới giảm số người tham gia
+        _, promoted = await asyncio.gather(
+            db[USER_COLLECTION].update_one(
+                {"_id": user_id}, {"$pull": {"registered_events": event_id}}
+            ),
+            _hand_over_seat(db, event_id),
         )
+        if promoted is None:
+            await db[EVENT_COLLECTION].update_one(
+                {"_id": event_id}, {"$inc": {"current_participants": -1}}
+            )
+    if reg:
+        await update_event_daily_stats(db, removed=[reg])
+    return reg
+
+
+async def get_waitlist_position(
+    db: AsyncIOMotorDatabase, event_id: str, waitlist_seq: int
+) -> int:
+    """Vị trí (từ 1) trong hàng chờ: đếm trên index, không đọc document."""
+    ahead = await db[REGISTRATION_COLLECTION].count_documents(
+        {
+            "event_id": event_id,
+            "status": WAITLISTED,
+            "waitlist_seq": {"$lt": waitlist_seq},
+        }
+    )
+    return ahead + 1
 
-        # --- [MỚI] 3. Cập nhật User: Xóa event_id khỏi registered_events ---
-        # Dùng $pull để rút event_id ra khỏi mảng
-        await db[USER_COLLECTION].update_one(
-            {"_id": user_id}, {"$pull": {"registered_events": event_id}}
+
+async def promote_waitlist(
+    db: AsyncIOMotorDatabase, event_id: str, max_rounds: int = 5
+) -> List[str]:
+    """
+    Đưa người đầu hàng chờ (FIFO theo waitlist_seq) vào các chỗ còn trống.
+    Mỗi vòng: giữ k chỗ bằng một lệnh có điều kiện, chuyển k đăng ký sang
+    "pending" và cập nhật registered_events bằng bulk_write; chỗ nào không
+    dùng được (đăng ký vừa bị hủy) thì trả lại và thử vòng tiếp theo.
+    Trả về danh sách ID đăng ký được chuyển lên.
+    """
+    promoted: List[str] = []
+    for _ in range(max_rounds):
+        event = await db[EVENT_COLLECTION].find_one(
+            {"_id": event_id}, {"current_participants": 1, "max_participants": 1}
+        )
+        if event is None:
+            break
+        free = event["max_participants"] - event["current_participants"]
+        if free <= 0:
+            break
+        candidates = (
+            await db[REGISTRATION_COLLECTION]
+            .find(
+                {"event_id": event_id, "status": WAITLISTED},
+                {"user_id": 1},
+            )
+            .sort("waitlist_seq", ASCENDING)
+            .limit(free)
+            .to_list(length=free)
         )
+        if not candidates:
+            break
+
+        count = len(candidates)
+        seats = await db[EVENT_COLLECTION].find_one_and_update(
+            {
+                "_id": event_id,
+                "$expr": {
+                    "$lte": [
+                        {"$add": ["$current_participants", count]},
+                        "$max_participants",
+                    ]
+                },
+            },
+            {"$inc": {"current_participants": count}},
+            projection={"_id": 1},
+        )
+        if seats is None:
+            continue  # có người vừa giữ chỗ, đọc lại và thử lại
+
+        now_str = get_iso_now()
+        # Đánh dấu bằng token của lần gọi này: đăng ký được _hand_over_seat
+        # chuyển lên cùng lúc cũng là "pending" nhưng không được tính ở đây
+        token = uuid.uuid4().hex
+        result = await db[REGISTRATION_COLLECTION].bulk_write(
+            [
+                UpdateOne(
+                    {"_id": c["_id"], "status": WAITLISTED},
+                    {
+                        "$set": {
+                            "status": "pending",
+                            "updated_at": now_str,
+                            "promotion_id": token,
+                        },
+                        "$unset": {"waitlist_seq": ""},
+                    },
+                )
+                for c in candidates
+            ],
+            ordered=False,
+        )
+        # Đọc lại những đăng ký thực sự được chuyển (có thể bị hủy giữa chừng)
+        mine = {"_id": {"$in": [c["_id"] for c in candidates]}, "promotion_id": token}
+        moved = await (
+            db[REGISTRATION_COLLECTION]
+            .find(mine, {"user_id": 1, **DAILY_STATS_PROJECTION})
+            .to_list(length=count)
+        )
+        if moved:
+            await db[REGISTRATION_COLLECTION].update_many(
+                mine, {"$unset": {"promotion_id": ""}}
+            )
+            await update_event_daily_stats(
+                db,
+                added=moved,
+                removed=[{**r, "status": WAITLISTED} for r in moved],
+            )
+            await db[USER_COLLECTION].bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": r["user_id"]},
+                        {"$addToSet": {"registered_events": event_id}},
+                    )
+                    for r in moved
+                ],
+                ordered=False,
+            )
+            promoted.extend(r["_id"] for r in moved)
+        unused = count - result.modified_count
+        if unused:
+            await db[EVENT_COLLECTION].update_one(
+                {"_id": event_id}, {"$inc": {"current_participants": -unused}}
+            )
+        if unused == 0:
+            break
+    return promoted
+
+
+async def bulk_update_registrations(
+    db: AsyncIOMotorDatabase,
+    registration_ids: List[str],
+    registration_in: UpdateRegistrationInput,
+) -> BulkResult:
+    """Cập nhật cùng một input (thường là status) cho nhiều đăng ký."""
+    update_data = strawberry.asdict(registration_in)
+    update_data = {k: v for k, v in update_data.items() if v is not strawberry.UNSET}
 
-    # 4. Xóa Registration
-    result = await db[REGISTRATION_COLLECTION].delete_one({"_id": registration_id})
-    return result.deleted_count > 0
+    async def on_updated(before: List[Dict], after: List[Dict]) -> None:
+        if any(field in update_data for field in DAILY_STATS_FIELDS):
+            await update_event_daily_stats(db, added=after, removed=before)
+
+    ids = list(dict.fromkeys(registration_ids))
+    _check_bulk_size(ids)
+    # Đăng ký không được đổi trạng thái (xem _status_change_error) bị loại
+    # trước khi ghi và trả về lỗi riêng
+    blocked: Dict[str, str] = {}
+    if "status" in update_data:
+        current = await (
+            db[REGISTRATION_COLLECTION]
+            .find({"_id": {"$in": ids}}, {"status": 1})
+            .to_list(length=len(ids))
+        )
+        for doc in current:
+            error = _status_change_error(doc.get("status"), update_data["status"])
+            if error:
+                blocked[doc["_id"]] = error
+
+    results = await _bulk_update_by_ids(
+        db[REGISTRATION_COLLECTION],
+        [i for i in ids if i not in blocked],
+        update_data,
+        on_updated,
+    )
+    by_id = {result[0]: result for result in results}
+    return [by_id.get(i) or (i, None, blocked[i]) for i in ids]
+
+
+# --- 📈 Thống kê đăng ký theo ngày ---
+# Mỗi sự kiện có một document cho mỗi ngày có đăng ký (theo registration_date):
+#   {"_id": "e001:2025-10-15", "event_id": "e001", "date": "2025-10-15",
+#    "count": 12, "status": {"confirmed": 9, "pending": 3},
+#    "payment": {"paid": {"count": 9, "amount": 900000}, ...}}
+# Các hàm ghi registration cập nhật bằng $inc (upsert) theo trạng thái hiện
+# tại của đăng ký, nên eventAnalytics chỉ đọc vài chục document theo index
+# event_date thay vì aggregate cả collection registrations.
+# rebuild_event_daily_stats tính lại toàn bộ từ registrations ($group + $merge).
+
+EVENT_DAILY_STATS_COLLECTION = "event_daily_stats"
+EVENT_DAILY_STATS_INDEXES = [
+    IndexModel([("event_id", ASCENDING), ("date", ASCENDING)], name="event_date"),
+]
+# Field của registration ảnh hưởng tới thống kê
+DAILY_STATS_FIELDS = ("status", "payment_status", "payment_amount")
+DAILY_STATS_PROJECTION = {
+    field: 1
+    for field in ("event_id", "registration_date", "created_at", *DAILY_STATS_FIELDS)
+}
+
+
+def _registration_day(registration: Dict[str, Any]) -> str:
+    """Ngày đăng ký "YYYY-MM-DD" (chuỗi ISO UTC)."""
+    return str(registration.get("registration_date") or registration["created_at"])[:10]
+
+
+async def update_event_daily_stats(
+    db: AsyncIOMotorDatabase,
+    added: List[Dict[str, Any]] = (),
+    removed: List[Dict[str, Any]] = (),
+) -> None:
+    """Cộng `added`, trừ `removed` vào event_daily_stats bằng một bulk_write."""
+    incs: Dict[str, Dict[str, int]] = {}
+    on_insert: Dict[str, Dict[str, Any]] = {}
+    for sign, registrations in ((1, added), (-1, removed)):
+        for registration in registrations:
+            day = _registration_day(registration)
+            stats_id = f"{registration['event_id']}:{day}"
+            payment = f"payment.{registration.get('payment_status')}"
+            inc = incs.setdefault(stats_id, {})
+            for field, value in (
+                ("count", sign),
+                (f"status.{registration.get('status')}", sign),
+                (f"{payment}.count", sign),
+                (f"{payment}.amount", sign * (registration.get("payment_amount") or 0)),
+            ):
+                inc[field] = inc.get(field, 0) + value
+            on_insert[stats_id] = {"event_id": registration["event_id"], "date": day}
+    # Bỏ các field có trừ / cộng triệt tiêu nhau (vd chỉ đổi payment_amount)
+    incs = {
+        stats_id: {field: value for field, value in inc.items() if value}
+        for stats_id, inc in incs.items()
+    }
+    operations = [
+        UpdateOne(
+            {"_id": stats_id},
+            {"$inc": inc, "$setOnInsert": on_insert[stats_id]},
+            upsert=True,
+        )
+        for stats_id, inc in incs.items()
+        if inc
+    ]
+    if operations:
+        await db[EVENT_DAILY_STATS_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def get_event_daily_stats(
+    db: AsyncIOMotorDatabase,
+    event_id: str,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Thống kê theo ngày của sự kiện trong khoảng [date_from, date_to).
+    date_to có giờ khác 00:00 thì tính cả ngày đó (thống kê theo ngày).
+    """
+    query: Dict[str, Any] = {"event_id": event_id}
+    date_range: Dict[str, str] = {}
+    if date_from is not None:
+        date_range["$gte"] = parse_datetime(date_from).date().isoformat()
+    if date_to is not None:
+        end = parse_datetime(date_to)
+        op = "$lt" if end.time() == datetime.time() else "$lte"
+        date_range[op] = end.date().isoformat()
+    if date_range:
+        query["date"] = date_range
+    cursor = db[EVENT_DAILY_STATS_COLLECTION].find(query).sort("date", ASCENDING)
+    return await cursor.to_list(length=None)
+
+
+def _key_string(expression: str) -> Dict[str, Any]:
+    return {"$ifNull": [{"$toString": expression}, "None"]}
+
+
+def _rebuild_daily_pipeline(
+    field: str, target: str, value: Any, stamp: str | None
+) -> List[dict]:
+    """
+    Gom registrations theo (event, ngày, field) rồi theo (event, ngày) thành
+    object `target` {giá trị field: value}. Có stamp: thay cả document (lượt
+    đầu); không có: chỉ ghi thêm field `target` vào document đã có.
+    """
+    day = {"$substrCP": [{"$ifNull": ["$registration_date", "$created_at"]}, 0, 10]}
+    project: Dict[str, Any] = {
+        "_id": {"$concat": ["$_id.event_id", ":", "$_id.date"]},
+        target: {"$arrayToObject": "$values"},
+    }
+    if stamp is not None:
+        project.update(
+            event_id="$_id.event_id",
+            date="$_id.date",
+            count=1,
+            rebuilt_at={"$literal": stamp},
+        )
+    return [
+        {"$match": {"event_id": {"$type": "string"}}},
+        {
+            "$group": {
+                "_id": {"event_id": "$event_id", "date": day, "value": f"${field}"},
+                "n": {"$sum": 1},
+                "amount": {"$sum": {"$ifNull": ["$payment_amount", 0]}},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"event_id": "$_id.event_id", "date": "$_id.date"},
+                "count": {"$sum": "$n"},
+                # Giống key "status.None" của update_event_daily_stats
+                "values": {"$push": {"k": _key_string("$_id.value"), "v": value}},
+            }
+        },
+        {"$project": project},
+        {
+            "$merge": {
+                "into": EVENT_DAILY_STATS_COLLECTION,
+                "whenMatched": "replace" if stamp is not None else "merge",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+async def rebuild_event_daily_stats(db: AsyncIOMotorDatabase) -> int:
+    """
+    Tính lại (backfill) event_daily_stats từ registrations (chạy lúc ít tải:
+    $inc xảy ra trong lúc rebuild có thể bị ghi đè). Trả về số document
+    thống kê bị xóa vì ngày đó không còn đăng ký nào.
+    """
+    stamp = get_iso_now()
+    passes = [
+        ("status", "status", "$n", stamp),
+        ("payment_status", "payment", {"count": "$n", "amount": "$amount"}, None),
+    ]
+    for field, target, value, pass_stamp in passes:
+        pipeline = _rebuild_daily_pipeline(field, target, value, pass_stamp)
+        await db[REGISTRATION_COLLECTION].aggregate(pipeline).to_list(length=None)
+    result = await db[EVENT_DAILY_STATS_COLLECTION].delete_many(
+        {"rebuilt_at": {"$ne": stamp}}
+    )
+    return result.deleted_count
 
 
 # --- ⭐ CRUD cho Feedback ---
 
 FEEDBACK_COLLECTION = "feedbacks"
+FEEDBACK_INDEXES = [
+    # Mỗi user chỉ đánh giá một phiên một lần (create_feedback bắt lỗi trùng
+    # khóa thay vì đọc trước). Feedback không gắn phiên thì không bị giới hạn.
+    IndexModel(
+        [("user_id", ASCENDING), ("session_id", ASCENDING)],
+        name="user_session_unique",
+        unique=True,
+        partialFilterExpression={"session_id": {"$type": "string"}},
+    ),
+    IndexModel([("event_id", ASCENDING), *KEYSET_KEYS], name="event_created_at_id"),
+    IndexModel(KEYSET_KEYS, name="created_at_id"),
+]
 
 
 async def get_feedbacks(
@@ -477,7 +1458,9 @@ async def get_feedbacks(
     skip: int = 0,
     limit: int = 10,
     event_id: str | None = None,
-) -> tuple[List[Dict[str, Any]], int]:
+    projection: Dict[str, Any] | None = None,
+    count_mode: str = "exact",
+) -> tuple[List[Dict[str, Any]], int | None]:
     """Lấy danh sách feedback (phân trang), có thể lọc theo event_id."""
 
     filter_query = {}
@@ -485,16 +1468,30 @@ async def get_feedbacks(
         filter_query["event_id"] = event_id
 
     feedbacks_cursor = (
-        db[FEEDBACK_COLLECTION].find(filter_query).skip(skip).limit(limit)
+        db[FEEDBACK_COLLECTION].find(filter_query, projection).skip(skip).limit(limit)
     )
     feedbacks_task = feedbacks_cursor.to_list(length=limit)
 
-    count_task = db[FEEDBACK_COLLECTION].count_documents(filter_query)
+    count_task = _count(db[FEEDBACK_COLLECTION], filter_query, count_mode)
 
     feedbacks, total_count = await asyncio.gather(feedbacks_task, count_task)
     return feedbacks, total_count
 
 
+async def get_feedbacks_after(
+    db: AsyncIOMotorDatabase,
+    first: int = 10,
+    after: tuple[str, str] | None = None,
+    event_id: str | None = None,
+    projection: Dict[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    """Lấy danh sách feedback theo cursor (created_at, _id)."""
+    filter_query = {"event_id": event_id} if event_id else {}
+    return await _find_after(
+        db[FEEDBACK_COLLECTION], filter_query, first, after, projection
+    )
+
+
 async def get_feedback_by_id(
     db: AsyncIOMotorDatabase, feedback_id: str
 ) -> Dict[str, Any] | None:
@@ -507,15 +1504,13 @@ async def create_feedback(
     db: AsyncIOMotorDatabase,
     feedback_in: CreateFeedbackInput,
     user_id: str,  # Lấy từ context
+    write_buffer: WriteBuffer | None = None,
 ) -> Dict[str, Any]:
-    """Tạo một feedback mới."""
-    last_feedback = await db[FEEDBACK_COLLECTION].find_one(sort=[("_id", -1)])
-    if last_feedback:
-        last_id = last_feedback["_id"]
-        num = int(last_id[1:]) + 1
-        new_id = f"f{num:03d}"
-    else:
-        new_id = "f001"
+    """
+    Tạo một feedback mới. Có write_buffer thì document được ghi sau theo lô
+    (đánh giá trùng khi đó chỉ bị unique index loại lúc flush).
+    """
+    new_id = await id_allocator.next_id(db, FEEDBACK_COLLECTION, "f")
 
     feedback_data = feedback_in.__dict__
     feedback_data["_id"] = new_id
@@ -525,10 +1520,27 @@ async def create_feedback(
     feedback_data["created_at"] = get_iso_now()
     # Model Feedback không có 'updated_at'
 
-    await db[FEEDBACK_COLLECTION].insert_one(feedback_data)
+    if write_buffer is not None:
+        # rating_stats chỉ được cộng sau flush, cho các feedback đã ghi được
+        await write_buffer.put(
+            db[FEEDBACK_COLLECTION], feedback_data, on_written=_feedbacks_written
+        )
+        return feedback_data
+    try:
+        await db[FEEDBACK_COLLECTION].insert_one(feedback_data)
+    except DuplicateKeyError as e:
+        raise ValueError("Bạn đã đánh giá phiên này rồi, không thể gửi thêm.") from e
+    await update_rating_stats(db, added=[feedback_data])
     return feedback_data
 
 
+async def _feedbacks_written(
+    collection: AsyncIOMotorCollection, feedbacks: List[Dict[str, Any]]
+) -> None:
+    """Hook của write buffer: cộng các feedback đã insert vào rating_stats."""
+    await update_rating_stats(collection.database, added=feedbacks)
+
+
 async def update_feedback(
     db: AsyncIOMotorDatabase, feedback_id: str, feedback_in: UpdateFeedbackInput
 ) -> Dict[str, Any] | None:
@@ -538,42 +1550,295 @@ async def update_feedback(
 
     if not update_data:
         return await get_feedback_by_id(db, feedback_id)
+    # rating là field bắt buộc (rating_stats cộng / trừ theo điểm)
+    if "rating" in update_data and update_data["rating"] is None:
+        raise ValueError("Điểm đánh giá không được để trống.")
 
     # Model Pydantic 'Feedback' không có trường 'updated_at',
     # vì vậy chúng ta không cập nhật nó.
 
-    result = await db[FEEDBACK_COLLECTION].update_one(
+    if "rating" not in update_data:
+        return await _update_by_id(db[FEEDBACK_COLLECTION], feedback_id, update_data)
+
+    # Đổi điểm: cần điểm cũ để trừ khỏi rating_stats (bản trước khi cập nhật)
+    before = await db[FEEDBACK_COLLECTION].find_one_and_update(
         {"_id": feedback_id}, {"$set": update_data}
     )
-
-    if result.matched_count:
-        return await get_feedback_by_id(db, feedback_id)
-    return None
+    if before is None:
+        return None
+    after = {**before, **update_data}
+    if after["rating"] != before["rating"]:
+        await update_rating_stats(db, added=[after], removed=[before])
+    return after
 
 
 async def delete_feedback(db: AsyncIOMotorDatabase, feedback_id: str) -> bool:
     """Xóa một feedback."""
-    result = await db[FEEDBACK_COLLECTION].delete_one({"_id": feedback_id})
-    return result.deleted_count > 0
+    deleted = await db[FEEDBACK_COLLECTION].find_one_and_delete({"_id": feedback_id})
+    if deleted is None:
+        return False
+    await update_rating_stats(db, removed=[deleted])
+    return True
+
+
+# --- ⭐ Thống kê điểm đánh giá ---
+# Mỗi phiên / sự kiện có một document trong rating_stats:
+#   {"_id": "event:e001" | "session:s001", "event_id": "e001",
+#    "session_id": None | "s001", "count": 12, "sum": 51,
+#    "histogram": {"4": 3, "5": 9}}
+# create / update / delete_feedback cập nhật bằng $inc (upsert) nên đọc thống
+# kê chỉ là một lần tìm theo _id, không phụ thuộc số feedback.
+# rebuild_rating_stats tính lại toàn bộ từ feedbacks ($group + $merge).
+
+RATING_STATS_COLLECTION = "rating_stats"
+RATING_STATS_INDEXES = [
+    IndexModel([("event_id", ASCENDING)], name="event_id"),  # jobs xóa sự kiện
+]
+
+
+def rating_stats_id(kind: str, target_id: str) -> str:
+    return f"{kind}:{target_id}"
+
+
+def _rating_targets(feedback: Dict[str, Any]) -> List[tuple[str, str | None]]:
+    """Các document rating_stats mà một feedback được tính vào."""
+    targets = [(rating_stats_id("event", feedback["event_id"]), None)]
+    if feedback.get("session_id"):
+        session_id = feedback["session_id"]
+        targets.append((rating_stats_id("session", session_id), session_id))
+    return targets
+
+
+async def update_rating_stats(
+    db: AsyncIOMotorDatabase,
+    added: List[Dict[str, Any]] = (),
+    removed: List[Dict[str, Any]] = (),
+) -> None:
+    """Cộng `added`, trừ `removed` vào rating_stats bằng một lệnh bulk_write."""
+    incs: Dict[str, Dict[str, int]] = {}
+    on_insert: Dict[str, Dict[str, Any]] = {}
+    for sign, feedbacks in ((1, added), (-1, removed)):
+        for feedback in feedbacks:
+            rating = feedback["rating"]
+            for stats_id, session_id in _rating_targets(feedback):
+                inc = incs.setdefault(stats_id, {})
+                for field, value in (
+                    ("count", sign),
+                    ("sum", sign * rating),
+                    (f"histogram.{rating}", sign),
+                ):
+                    inc[field] = inc.get(field, 0) + value
+                on_insert[stats_id] = {
+                    "event_id": feedback["event_id"],
+                    "session_id": session_id,
+                }
+    if not incs:
+        return
+    await db[RATING_STATS_COLLECTION].bulk_write(
+        [
+            UpdateOne(
+                {"_id": stats_id},
+                {"$inc": inc, "$setOnInsert": on_insert[stats_id]},
+                upsert=True,
+            )
+            for stats_id, inc in incs.items()
+        ],
+        ordered=False,
+    )
+
+
+async def get_rating_stats_by_ids(
+    db: AsyncIOMotorDatabase, stats_ids: List[str]
+) -> List[Dict[str, Any]]:
+    """Lấy nhiều document thống kê bằng một truy vấn $in (dùng cho DataLoader)."""
+    cursor = db[RATING_STATS_COLLECTION].find({"_id": {"$in": stats_ids}})
+    return await cursor.to_list(length=None)
+
+
+def _rebuild_rating_pipeline(kind: str, field: str, stamp: str) -> List[dict]:
+    """Gom feedbacks theo `field` (event_id / session_id) thành rating_stats."""
+    return [
+        {"$match": {field: {"$type": "string"}}},
+        {
+            "$group": {
+                "_id": {"target": f"${field}", "rating": "$rating"},
+                "event_id": {"$first": "$event_id"},
+                "n": {"$sum": 1},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"$concat": [f"{kind}:", "$_id.target"]},
+                "target": {"$first": "$_id.target"},
+                "event_id": {"$first": "$event_id"},
+                "count": {"$sum": "$n"},
+                "sum": {"$sum": {"$multiply": ["$_id.rating", "$n"]}},
+                "histogram": {"$push": {"k": {"$toString": "$_id.rating"}, "v": "$n"}},
+            }
+        },
+        {
+            "$project": {
+                "event_id": 1,
+                "session_id": "$target" if kind == "session" else {"$literal": None},
+                "count": 1,
+                "sum": 1,
+                "histogram": {"$arrayToObject": "$histogram"},
+                "rebuilt_at": {"$literal": stamp},
+            }
+        },
+        {
+            "$merge": {
+                "into": RATING_STATS_COLLECTION,
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+async def rebuild_rating_stats(db: AsyncIOMotorDatabase) -> int:
+    """
+    Tính lại rating_stats từ feedbacks (chạy lúc ít tải: $inc xảy ra trong
+    lúc rebuild có thể bị ghi đè). Trả về số document thống kê bị xóa vì
+    không còn feedback nào.
+    """
+    stamp = get_iso_now()
+    for kind, field in (("event", "event_id"), ("session", "session_id")):
+        pipeline = _rebuild_rating_pipeline(kind, field, stamp)
+        await db[FEEDBACK_COLLECTION].aggregate(pipeline).to_list(length=None)
+    result = await db[RATING_STATS_COLLECTION].delete_many(
+        {"rebuilt_at": {"$ne": stamp}}
+    )
+    return result.deleted_count
+
+
+async def dedupe_feedbacks(db: AsyncIOMotorDatabase, dry_run: bool = False) -> int:
+    """
+    Xóa feedback trùng (user_id, session_id) trước khi tạo index
+    user_session_unique: giữ bản gửi sớm nhất, trừ các bản bị xóa khỏi
+    rating_stats. Trả về số feedback đã xóa (dry_run: chỉ đếm, không xóa).
+    """
+    pipeline = [
+        {"$match": {"session_id": {"$type": "string"}}},
+        {"$sort": {"created_at": ASCENDING, "_id": ASCENDING}},
+        {
+            "$group": {
+                "_id": {"user_id": "$user_id", "session_id": "$session_id"},
+                "ids": {"$push": "$_id"},
+            }
+        },
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    cursor = db[FEEDBACK_COLLECTION].aggregate(pipeline, allowDiskUse=True)
+    groups = await cursor.to_list(length=None)
+    duplicate_ids = [i for group in groups for i in group["ids"][1:]]
+    if dry_run or not duplicate_ids:
+        return len(duplicate_ids)
+    cursor = db[FEEDBACK_COLLECTION].find({"_id": {"$in": duplicate_ids}})
+    duplicates = await cursor.to_list(length=None)
+    await db[FEEDBACK_COLLECTION].delete_many({"_id": {"$in": duplicate_ids}})
+    await update_rating_stats(db, removed=duplicates)
+    return len(duplicates)
 
 
 # --- 📄 CRUD cho Paper ---
 
 PAPER_COLLECTION = "papers"
+PAPER_SEARCH_FIELDS = ("title", "abstract", "keywords")
+PAPER_INDEXES = [
+    # get_papers_by_session(s)
+    IndexModel(
+        [("session_id", ASCENDING), ("status", ASCENDING)], name="session_status"
+    ),
+    IndexModel([("event_id", ASCENDING), ("status", ASCENDING)], name="event_status"),
+    IndexModel(KEYSET_KEYS, name="created_at_id"),
+    # jobs: $pull user đã xóa khỏi author_ids
+    IndexModel([("author_ids", ASCENDING)], name="author_ids"),
+    IndexModel(
+        [(f"search.{field}", TEXT) for field in PAPER_SEARCH_FIELDS],
+        name="search_text",
+        weights={"search.title": 10, "search.keywords": 5, "search.abstract": 1},
+        default_language="none",
+    ),
+]
 
 
 async def get_papers(
-    db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 10
-) -> tuple[List[Dict[str, Any]], int]:
+    db: AsyncIOMotorDatabase,
+    skip: int = 0,
+    limit: int = 10,
+    projection: Dict[str, Any] | None = None,
+    count_mode: str = "exact",
+) -> tuple[List[Dict[str, Any]], int | None]:
     """Lấy danh sách bài báo (phân trang)."""
-    papers_cursor = db[PAPER_COLLECTION].find().skip(skip).limit(limit)
+    papers_cursor = db[PAPER_COLLECTION].find({}, projection).skip(skip).limit(limit)
     papers_task = papers_cursor.to_list(length=limit)
-    count_task = db[PAPER_COLLECTION].count_documents({})
+    count_task = _count(db[PAPER_COLLECTION], {}, count_mode)
 
     papers, total_count = await asyncio.gather(papers_task, count_task)
     return papers, total_count
 
 
+async def get_papers_after(
+    db: AsyncIOMotorDatabase,
+    first: int = 10,
+    after: tuple[str, str] | None = None,
+    projection: Dict[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    """Lấy danh sách bài báo theo cursor (created_at, _id)."""
+    return await _find_after(db[PAPER_COLLECTION], {}, first, after, projection)
+
+
+def _facet_counts(field: str, limit: int | None = None) -> List[Dict[str, Any]]:
+    """Nhánh $facet: đếm theo giá trị của field, nhiều nhất trước."""
+    stages: List[Dict[str, Any]] = [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+    ]
+    if limit is not None:
+        stages.append({"$limit": limit})
+    return stages
+
+
+async def get_paper_facets(
+    db: AsyncIOMotorDatabase,
+    event_id: str | None = None,
+    status: str | None = None,
+    keyword_limit: int = 50,
+) -> Dict[str, Any]:
+    """
+    Số bài báo theo từ khóa / trạng thái / phiên / sự kiện trong một lần
+    aggregate ($facet). $match đầu dùng index event_status; $project chỉ giữ
+    các field cần đếm để giảm bộ nhớ của $facet.
+    """
+    query: Dict[str, Any] = {}
+    if event_id is not None:
+        query["event_id"] = event_id
+    if status is not None:
+        query["status"] = status
+    pipeline = [
+        {"$match": query},
+        {"$project": {"keywords": 1, "status": 1, "session_id": 1, "event_id": 1}},
+        {
+            "$facet": {
+                "total": [{"$count": "count"}],
+                "keywords": [
+                    {"$unwind": "$keywords"},
+                    *_facet_counts("keywords", keyword_limit),
+                ],
+                "statuses": _facet_counts("status"),
+                "sessions": _facet_counts("session_id"),
+                "events": _facet_counts("event_id"),
+            }
+        },
+    ]
+    cursor = db[PAPER_COLLECTION].aggregate(pipeline, allowDiskUse=True)
+    result = (await cursor.to_list(length=1))[0]
+    total = result.pop("total")
+    result["total"] = total[0]["count"] if total else 0
+    return result
+
+
 async def get_paper_by_id(
     db: AsyncIOMotorDatabase, paper_id: str
 ) -> Dict[str, Any] | None:
@@ -586,13 +1851,7 @@ async def create_paper(
     db: AsyncIOMotorDatabase, paper_in: CreatePaperInput
 ) -> Dict[str, Any]:
     """Tạo (nộp) một bài báo mới."""
-    last_paper = await db[PAPER_COLLECTION].find_one(sort=[("_id", -1)])
-    if last_paper:
-        last_id = last_paper["_id"]
-        num = int(last_id[1:]) + 1
-        new_id = f"p{num:03d}"
-    else:
-        new_id = "p001"
+    new_id = await id_allocator.next_id(db, PAPER_COLLECTION, "p")
 
     paper_data = paper_in.__dict__
     paper_data["_id"] = new_id
@@ -605,13 +1864,17 @@ async def create_paper(
     paper_data["submission_date"] = now_str
     paper_data["created_at"] = now_str
     paper_data["updated_at"] = now_str
+    add_search_fields(paper_data, PAPER_SEARCH_FIELDS)
 
     await db[PAPER_COLLECTION].insert_one(paper_data)
     return paper_data
 
 
 async def update_paper(
-    db: AsyncIOMotorDatabase, paper_id: str, paper_in: UpdatePaperInput
+    db: AsyncIOMotorDatabase,
+    paper_id: str,
+    paper_in: UpdatePaperInput,
+    expected_updated_at: str | None = None,
 ) -> Dict[str, Any] | None:
     """Cập nhật một bài báo (bởi user hoặc admin)."""
     update_data = strawberry.asdict(paper_in)
@@ -620,18 +1883,121 @@ async def update_paper(
     if not update_data:
         return await get_paper_by_id(db, paper_id)
 
+    update_data.update(search_field_updates(update_data, PAPER_SEARCH_FIELDS))
     update_data["updated_at"] = get_iso_now()
 
-    result = await db[PAPER_COLLECTION].update_one(
-        {"_id": paper_id}, {"$set": update_data}
+    return await _update_by_id(
+        db[PAPER_COLLECTION], paper_id, update_data, expected_updated_at
     )
 
-    if result.matched_count:
-        return await get_paper_by_id(db, paper_id)
-    return None
-
 
 async def delete_paper(db: AsyncIOMotorDatabase, paper_id: str) -> bool:
     """Xóa một bài báo."""
     result = await db[PAPER_COLLECTION].delete_one({"_id": paper_id})
     return result.deleted_count > 0
+
+
+async def bulk_assign_papers_to_session(
+    db: AsyncIOMotorDatabase, paper_ids: List[str], session_id: str
+) -> BulkResult:
+    """Gán nhiều bài báo vào một phiên (event_id đi theo phiên)."""
+    session = await get_session_by_id(db, session_id)
+    if not session:
+        raise ValueError("Phiên không tồn tại.")
+    return await _bulk_update_by_ids(
+        db[PAPER_COLLECTION],
+        paper_ids,
+        {"session_id": session_id, "event_id": session["event_id"]},
+    )
+
+
+# --- 🔎 Tìm kiếm toàn văn ---
+# Mỗi event / paper lưu bản không dấu của các field tìm kiếm trong "search"
+# (utils.normalize_search, cập nhật trong create / update) và có text index
+# "search_text" có trọng số trên đó. search() chạy $text song song trên từng
+# collection rồi trộn theo điểm. Cursor là (điểm, "loại:_id"), sắp giảm dần.
+
+SEARCH_COLLECTIONS = {"event": EVENT_COLLECTION, "paper": PAPER_COLLECTION}
+
+
+def _search_after(kind: str, after: tuple[float, str] | None) -> List[dict]:
+    """Điều kiện keyset sau cursor cho collection `kind`."""
+    if after is None:
+        return []
+    score, key = after
+    own_key = f"{kind}:"
+    if key.startswith(own_key):
+        same_score = {"_score": score, "_id": {"$lt": key[len(own_key) :]}}
+    elif own_key < key:
+        same_score = {"_score": score}  # mọi key của kind đều đứng sau cursor
+    else:
+        same_score = None
+    conditions = [{"_score": {"$lt": score}}]
+    if same_score is not None:
+        conditions.append(same_score)
+    return [{"$match": {"$or": conditions}}]
+
+
+async def search(
+    db: AsyncIOMotorDatabase,
+    query: str,
+    kinds: List[str],
+    first: int,
+    after: tuple[float, str] | None = None,
+) -> List[tuple[str, float, Dict[str, Any]]]:
+    """
+    Tìm event / paper khớp `query` (không phân biệt dấu). Trả về tối đa
+    first + 1 kết quả (loại, điểm, document) theo điểm giảm dần.
+    """
+    terms = normalize_search(query).strip()
+    if not terms:
+        return []
+
+    async def search_one(kind: str) -> List[tuple[str, float, Dict[str, Any]]]:
+        pipeline = [
+            {"$match": {"$text": {"$search": terms}}},
+            {"$set": {"_score": {"$meta": "textScore"}}},
+            *_search_after(kind, after),
+            {"$sort": {"_score": -1, "_id": -1}},
+            {"$limit": first + 1},
+            {"$project": {"search": 0}},
+        ]
+        collection = db[SEARCH_COLLECTIONS[kind]]
+        docs = await collection.aggregate(pipeline).to_list(length=first + 1)
+        return [(kind, doc.pop("_score"), doc) for doc in docs]
+
+    groups = await asyncio.gather(*[search_one(kind) for kind in kinds])
+    results = [item for group in groups for item in group]
+    results.sort(key=lambda r: (r[1], f"{r[0]}:{r[2]['_id']}"), reverse=True)
+    return results[: first + 1]
+
+
+# --- Registry index (xem indexes.py) ---
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    USER_COLLECTION: USER_INDEXES,
+    EVENT_COLLECTION: EVENT_INDEXES,
+    SESSION_COLLECTION: SESSION_INDEXES,
+    REGISTRATION_COLLECTION: REGISTRATION_INDEXES,
+    FEEDBACK_COLLECTION: FEEDBACK_INDEXES,
+    RATING_STATS_COLLECTION: RATING_STATS_INDEXES,
+    EVENT_DAILY_STATS_COLLECTION: EVENT_DAILY_STATS_INDEXES,
+    PAPER_COLLECTION: PAPER_INDEXES,
+}
+
+# Field lưu dạng BSON date theo collection (dùng cho import / migrate)
+DATE_FIELDS: Dict[str, tuple] = {
+    EVENT_COLLECTION: EVENT_DATE_FIELDS,
+    SESSION_COLLECTION: SESSION_DATE_FIELDS,
+}
+
+# Field tìm kiếm theo collection (dùng cho import / restore / backfill)
+SEARCH_FIELDS: Dict[str, tuple] = {
+    EVENT_COLLECTION: EVENT_SEARCH_FIELDS,
+    PAPER_COLLECTION: PAPER_SEARCH_FIELDS,
+}
+
+# Field tạo "search_keys" (tìm theo tiền tố) theo collection
+SEARCH_KEY_FIELDS: Dict[str, tuple] = {
+    USER_COLLECTION: USER_SEARCH_FIELDS,
+}
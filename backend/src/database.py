@@ -3,23 +3,140 @@ from typing import Optional
 from fastapi import Header
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pydantic_settings import BaseSettings
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+from .loaders import create_loaders
+from .cache import InMemoryCache
+from .pool_metrics import PoolMetrics
+from .write_buffer import WriteBuffer
 
 
 class Settings(BaseSettings):
     mongo_db_uri: str
     mongo_db_name: str
-    
+    # Bật để validate mọi document bằng Pydantic trước khi trả về (debug)
+    strict_validation: bool = False
+    # Số document GraphQL đã parse/validate được giữ trong LRU
+    graphql_document_cache_size: int = 256
+    # Số persisted query (APQ) tối đa giữ trong bộ nhớ
+    persisted_query_cache_size: int = 1000
+    # Giới hạn độ sâu và chi phí tĩnh của mỗi operation GraphQL
+    graphql_max_depth: int = 10
+    graphql_max_cost: int = 5000
+    # Số phần tử giả định cho field danh sách không có limit / first
+    graphql_default_list_size: int = 10
+    # Response cache cho events / event / sessions / SessionType.papers
+    response_cache_ttl: float = 30.0
+    response_cache_maxsize: int = 1000
+    # Ghi feedback qua write-behind buffer (gom insert_many) thay vì insert_one
+    write_buffer_enabled: bool = False
+    write_buffer_maxsize: int = 10000
+    write_buffer_batch_size: int = 500
+    write_buffer_flush_interval: float = 0.5
+    # Đối soát current_participants / registered_events (0 = tắt): chạy tăng
+    # dần mỗi reconcile_interval_minutes phút, toàn bộ lúc reconcile_full_hour giờ
+    reconcile_interval_minutes: int = 15
+    reconcile_full_hour: int = 3
+    # Connection pool của Motor (mặc định như PyMongo; None = chờ không giới hạn)
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    # Nén dữ liệu với server, vd "zstd,snappy,zlib" (rỗng = tắt)
+    mongo_compressors: str = ""
+    # Read preference của các resolver Query, vd "secondaryPreferred" (mutation
+    # luôn dùng primary); độ trễ tối đa của secondary tính bằng giây (-1 = bỏ qua)
+    mongo_read_preference: str = "primary"
+    mongo_max_staleness_seconds: int = -1
+
     class Config:
         env_file = ".env"
 
 
 settings = Settings()
 
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(name: str, max_staleness: int = -1):
+    """Chuyển tên read preference (như trong connection string) thành object."""
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"Read preference không hợp lệ: {name}")
+    if name == "primary":
+        return Primary()
+    return READ_PREFERENCES[name](max_staleness=max_staleness)
+
+
+def client_options() -> dict:
+    """Tham số pool / nén cho AsyncIOMotorClient từ Settings."""
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+    }
+    if settings.mongo_wait_queue_timeout_ms is not None:
+        options["waitQueueTimeoutMS"] = settings.mongo_wait_queue_timeout_ms
+    if settings.mongo_compressors:
+        options["compressors"] = settings.mongo_compressors
+    return options
+
+
+# Số liệu pool (CMAP) cho /api/metrics
+pool_metrics = PoolMetrics()
+
 # Khởi tạo client 1 lần
-client = AsyncIOMotorClient(settings.mongo_db_uri)
+client = AsyncIOMotorClient(
+    settings.mongo_db_uri, event_listeners=[pool_metrics], **client_options()
+)
 db: AsyncIOMotorDatabase = client[settings.mongo_db_name]
+# DB cho resolver chỉ đọc; cùng object với db khi read preference là primary
+read_db: AsyncIOMotorDatabase = (
+    db
+    if settings.mongo_read_preference == "primary"
+    else client.get_database(
+        settings.mongo_db_name,
+        read_preference=read_preference(
+            settings.mongo_read_preference, settings.mongo_max_staleness_seconds
+        ),
+    )
+)
+
+# Response cache dùng chung cho cả process (invalidate bởi các mutation)
+response_cache = InMemoryCache(
+    maxsize=settings.response_cache_maxsize, ttl=settings.response_cache_ttl
+)
+
+# None khi tắt: crud ghi trực tiếp như cũ
+write_buffer = (
+    WriteBuffer(
+        maxsize=settings.write_buffer_maxsize,
+        batch_size=settings.write_buffer_batch_size,
+        flush_interval=settings.write_buffer_flush_interval,
+    )
+    if settings.write_buffer_enabled
+    else None
+)
 
 
 # Hàm này sẽ được dùng bởi Strawberry để "tiêm" (inject) db vào resolvers
+# Mỗi request nhận một bộ DataLoader mới để gom truy vấn quan hệ (tránh N+1)
+# Loader đọc qua read_db (phần lưu vào response cache vẫn đọc từ primary);
+# mutation được extensions.PrimaryForMutations trả về primary để đọc lại ngay
+# dữ liệu vừa ghi
 async def get_context(user_id: Optional[str] = Header(None, alias="X-User-ID")):
-    return {"db": db, "user_id": user_id}
+    return {
+        "db": db,
+        "read_db": read_db,
+        "user_id": user_id,
+        "loaders": create_loaders(read_db, cache=response_cache, cache_db=db),
+        "write_buffer": write_buffer,
+    }
@@ -0,0 +1,324 @@
+# src/extensions.py
+
+import dataclasses
+import hashlib
+from typing import Any, Dict, Iterator, Optional
+
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    FragmentDefinitionNode,
+    VariableNode,
+)
+from graphql.execution import ExecutionResult as GraphQLExecutionResult
+from strawberry.extensions import (
+    ParserCache,
+    QueryDepthLimiter,
+    SchemaExtension,
+    ValidationCache,
+)
+from strawberry.fastapi import GraphQLRouter
+from strawberry.types import ExecutionResult
+from strawberry.types.graphql import OperationType
+
+from .cache import TTLCache
+from .database import response_cache, settings
+from .loaders import create_loaders
+
+# -----------------------
+# Cache parse / validate
+# -----------------------
+# Frontend gửi đi gửi lại cùng một số ít operation, nên document đã parse và
+# kết quả validate được giữ trong LRU thay vì xử lý lại từ đầu mỗi request.
+# ValidationCache dùng chính object document từ ParserCache làm key, nên hai
+# cache luôn trúng cùng nhau.
+
+parser_cache = ParserCache(maxsize=settings.graphql_document_cache_size)
+validation_cache = ValidationCache(maxsize=settings.graphql_document_cache_size)
+
+
+# -----------------------
+# Automatic Persisted Queries (APQ)
+# -----------------------
+# Client gửi extensions.persistedQuery.sha256Hash thay cho toàn bộ query.
+# Nếu server chưa biết hash đó, trả lỗi PERSISTED_QUERY_NOT_FOUND để client
+# gửi lại kèm full query (lần sau chỉ cần hash).
+
+# Không hết hạn, chỉ bị loại theo LRU khi đầy
+persisted_queries = TTLCache(
+    maxsize=settings.persisted_query_cache_size, ttl=float("inf")
+)
+persisted_query_stats = {"hits": 0, "misses": 0, "registered": 0}
+
+
+def query_hash(query: str) -> str:
+    """sha256 (hex) của query, giống cách client APQ tính."""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def _persisted_query_error(message: str, code: str) -> ExecutionResult:
+    return ExecutionResult(
+        data=None, errors=[GraphQLError(message, extensions={"code": code})]
+    )
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter có hỗ trợ Automatic Persisted Queries."""
+
+    async def execute_single(self, request_data, **kwargs) -> ExecutionResult:
+        persisted = (request_data.extensions or {}).get("persistedQuery")
+        if not isinstance(persisted, dict) or "sha256Hash" not in persisted:
+            return await super().execute_single(request_data=request_data, **kwargs)
+
+        sha256_hash = persisted["sha256Hash"]
+        if request_data.query is None:
+            query = persisted_queries.get(sha256_hash)
+            if query is None:
+                persisted_query_stats["misses"] += 1
+                return _persisted_query_error(
+                    "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+                )
+            persisted_query_stats["hits"] += 1
+            request_data = dataclasses.replace(request_data, query=query)
+        else:
+            if query_hash(request_data.query) != sha256_hash:
+                return _persisted_query_error(
+                    "provided sha does not match query", "BAD_USER_INPUT"
+                )
+            persisted_queries.set(sha256_hash, request_data.query)
+            persisted_query_stats["registered"] += 1
+
+        return await super().execute_single(request_data=request_data, **kwargs)
+
+
+# -----------------------
+# Giới hạn độ sâu và chi phí truy vấn
+# -----------------------
+# Các quan hệ lồng nhau (users { events }, papers { authors { events } })
+# có thể nhân số lượt đọc MongoDB lên hàng nghìn trong một request. Chi phí
+# tĩnh được tính trước khi thực thi: mỗi field có selection set tốn 1 cho mỗi
+# object cha, field danh sách nhân số object con theo `limit` / `first`
+# (hoặc GRAPHQL_DEFAULT_LIST_SIZE nếu không có).
+
+query_depth_limiter = QueryDepthLimiter(max_depth=settings.graphql_max_depth)
+
+
+def _argument_size(field: FieldNode, variables: Dict[str, Any]) -> Optional[int]:
+    """
+    Giá trị của tham số limit / first (literal hoặc biến), nếu có. Giá trị
+    nhỏ hơn 1 được tính là 1 như get_pagination, để field có limit âm không
+    làm chi phí âm và bù trừ cho field khác.
+    """
+    for argument in field.arguments or ():
+        if argument.name.value not in ("limit", "first"):
+            continue
+        value = argument.value
+        if isinstance(value, IntValueNode):
+            return max(int(value.value), 1)
+        if isinstance(value, VariableNode):
+            size = variables.get(value.name.value)
+            return max(size, 1) if isinstance(size, int) else None
+    return None
+
+
+def _selection_cost(
+    schema,
+    parent_type,
+    selection_set,
+    fragments: Dict[str, FragmentDefinitionNode],
+    variables: Dict[str, Any],
+    multiplier: int,
+    page_size: Optional[int] = None,
+) -> int:
+    cost = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                fragment_type = schema.get_type(fragment.type_condition.name.value)
+                cost += _selection_cost(
+                    schema,
+                    fragment_type,
+                    fragment.selection_set,
+                    fragments,
+                    variables,
+                    multiplier,
+                    page_size,
+                )
+            continue
+
+        if isinstance(selection, InlineFragmentNode):
+            fragment_type = parent_type
+            if selection.type_condition is not None:
+                fragment_type = schema.get_type(selection.type_condition.name.value)
+            cost += _selection_cost(
+                schema,
+                fragment_type,
+                selection.selection_set,
+                fragments,
+                variables,
+                multiplier,
+                page_size,
+            )
+            continue
+
+        # Field introspection (__typename, __schema, ...) không tính phí
+        name = selection.name.value
+        fields = getattr(parent_type, "fields", None) or {}
+        if name.startswith("__") or name not in fields:
+            continue
+
+        field_type = fields[name].type
+        is_list = False
+        while isinstance(field_type, (GraphQLNonNull, GraphQLList)):
+            is_list = is_list or isinstance(field_type, GraphQLList)
+            field_type = field_type.of_type
+
+        if selection.selection_set is None:
+            continue
+
+        size = _argument_size(selection, variables)
+        child_multiplier = multiplier
+        child_page_size = size
+        if is_list:
+            # Danh sách trong kiểu Page / Connection dùng limit của field cha
+            count = size or page_size or settings.graphql_default_list_size
+            child_multiplier = multiplier * count
+            child_page_size = None
+
+        cost += child_multiplier + _selection_cost(
+            schema,
+            field_type,
+            selection.selection_set,
+            fragments,
+            variables,
+            child_multiplier,
+            child_page_size,
+        )
+    return cost
+
+
+def operation_cost(execution_context) -> int:
+    """Chi phí tĩnh của operation sẽ được thực thi trong execution_context."""
+    document = execution_context.graphql_document
+    fragments = {
+        d.name.value: d
+        for d in document.definitions
+        if isinstance(d, FragmentDefinitionNode)
+    }
+    operations = [
+        d for d in document.definitions if isinstance(d, OperationDefinitionNode)
+    ]
+    operation_name = execution_context.operation_name
+    operation = next(
+        (
+            o
+            for o in operations
+            if operation_name is None or (o.name and o.name.value == operation_name)
+        ),
+        None,
+    )
+    if operation is None:
+        return 0
+
+    # Giá trị mặc định của biến cũng được dùng nếu client không truyền
+    variables = {}
+    for definition in operation.variable_definitions or ():
+        if isinstance(definition.default_value, IntValueNode):
+            variables[definition.variable.name.value] = int(
+                definition.default_value.value
+            )
+    variables.update(execution_context.variables or {})
+
+    schema = execution_context.schema._schema
+    root_type = schema.get_root_type(operation.operation)
+    return _selection_cost(
+        schema, root_type, operation.selection_set, fragments, variables, 1
+    )
+
+
+class QueryCostLimiter(SchemaExtension):
+    """
+    Từ chối operation có chi phí tĩnh vượt GRAPHQL_MAX_COST trước khi chạy
+    resolver nào, và báo chi phí trong `extensions.cost` của response.
+    """
+
+    def __init__(self, *, execution_context=None):
+        self.execution_context = execution_context
+        self.cost: Optional[int] = None
+
+    def on_execute(self) -> Iterator[None]:
+        self.cost = operation_cost(self.execution_context)
+        if self.cost > settings.graphql_max_cost:
+            self.execution_context.result = GraphQLExecutionResult(
+                data=None,
+                errors=[
+                    GraphQLError(
+                        f"Truy vấn quá phức tạp: chi phí {self.cost} vượt giới hạn "
+                        f"{settings.graphql_max_cost}.",
+                        extensions={"code": "QUERY_TOO_COMPLEX"},
+                    )
+                ],
+            )
+        yield
+
+    def get_results(self) -> Dict[str, Any]:
+        if self.cost is None:
+            return {}
+        return {
+            "cost": {
+                "requestedQueryCost": self.cost,
+                "maximumAvailable": settings.graphql_max_cost,
+            }
+        }
+
+
+# -----------------------
+# Định tuyến đọc: Query theo read preference, Mutation trên primary
+# -----------------------
+# Context mặc định cho resolver đọc (read_db, loaders) dùng
+# MONGO_READ_PREFERENCE. Mutation trả về object vừa ghi và các field quan hệ
+# của nó, nên cả operation được chuyển về primary để không đọc phải bản cũ
+# từ secondary đang trễ.
+
+
+class PrimaryForMutations(SchemaExtension):
+    def __init__(self, *, execution_context=None):
+        self.execution_context = execution_context
+
+    def on_execute(self) -> Iterator[None]:
+        context = self.execution_context.context
+        if (
+            self.execution_context.operation_type == OperationType.MUTATION
+            and isinstance(context, dict)
+            and context.get("read_db") is not None
+            and context["read_db"] is not context["db"]
+        ):
+            context["read_db"] = context["db"]
+            context["loaders"] = create_loaders(context["db"], cache=response_cache)
+        yield
+
+
+def graphql_cache_stats() -> Dict[str, Any]:
+    """Số liệu hit/miss của các cache GraphQL (dùng cho /api/metrics)."""
+    parse_info = parser_cache.cached_parse_document.cache_info()
+    validate_info = validation_cache.cached_validate_document.cache_info()
+    return {
+        "parse": {
+            "hits": parse_info.hits,
+            "misses": parse_info.misses,
+            "size": parse_info.currsize,
+        },
+        "validation": {
+            "hits": validate_info.hits,
+            "misses": validate_info.misses,
+            "size": validate_info.currsize,
+        },
+        "persisted_queries": {**persisted_query_stats, "size": len(persisted_queries)},
+    }
@@ -0,0 +1,109 @@
+# src/ids.py
+
+import asyncio
+from typing import Dict, List, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+# -----------------------
+# Cấp phát ID dạng "<tiền tố><số>" (u001, e042, ...)
+# -----------------------
+# Mỗi collection có một document trong `counters`: {"_id": <collection>,
+# "seq": <số lớn nhất đã cấp>}. Một process xin cả một khối số bằng một lệnh
+# find_one_and_update + $inc (nguyên tử trên MongoDB), sau đó cấp dần trong bộ
+# nhớ. Nhờ vậy đa số lần insert không cần thêm round trip nào, và các process
+# chạy song song không bao giờ nhận trùng số.
+#
+# Lần đầu dùng một counter trong process, seq được nâng ($max) lên bằng số lớn
+# nhất đang có trong collection (so sánh theo số, không theo chuỗi, nên
+# "u1000" > "u999"), để dữ liệu import sẵn không bị cấp trùng.
+
+COUNTER_COLLECTION = "counters"
+
+
+class IdAllocator:
+    """Cấp phát ID theo khối từ collection `counters`."""
+
+    def __init__(self, block_size: int = 20):
+        self.block_size = block_size
+        # (database, collection) -> [số kế tiếp, số cuối của khối hiện tại]
+        self._blocks: Dict[Tuple[str, str], List[int]] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._seeded: Set[Tuple[str, str]] = set()
+
+    async def _seed(self, db: AsyncIOMotorDatabase, collection: str) -> None:
+        """Đồng bộ counter với số lớn nhất đang có trong collection."""
+        pipeline = [
+            {
+                "$project": {
+                    "num": {
+                        "$convert": {
+                            "input": {"$substrCP": ["$_id", 1, 32]},
+                            "to": "long",
+                            "onError": 0,
+                            "onNull": 0,
+                        }
+                    }
+                }
+            },
+            {"$group": {"_id": None, "max": {"$max": "$num"}}},
+        ]
+        rows = await db[collection].aggregate(pipeline).to_list(length=1)
+        current_max = int(rows[0]["max"]) if rows else 0
+        await db[COUNTER_COLLECTION].update_one(
+            {"_id": collection}, {"$max": {"seq": current_max}}, upsert=True
+        )
+        self._seeded.add((db.name, collection))
+
+    async def _reserve(
+        self, db: AsyncIOMotorDatabase, collection: str, count: int
+    ) -> int:
+        """Xin `count` số liên tiếp từ MongoDB, trả về số cuối cùng."""
+        if (db.name, collection) not in self._seeded:
+            await self._seed(db, collection)
+        counter = await self._increment(db, collection, count)
+        if counter is None:
+            # Collection counters đã bị xóa (import_data, restore backup)
+            await self._seed(db, collection)
+            counter = await self._increment(db, collection, count)
+        return counter["seq"]
+
+    async def _increment(self, db: AsyncIOMotorDatabase, collection: str, count: int):
+        return await db[COUNTER_COLLECTION].find_one_and_update(
+            {"_id": collection},
+            {"$inc": {"seq": count}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def next_ids(
+        self, db: AsyncIOMotorDatabase, collection: str, prefix: str, count: int
+    ) -> List[str]:
+        """Cấp `count` ID mới cho collection, giữ định dạng f"{prefix}{num:03d}"."""
+        key = (db.name, collection)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            numbers: List[int] = []
+            block = self._blocks.get(key)
+            while len(numbers) < count:
+                if block is None or block[0] > block[1]:
+                    # Lô lớn (bulk) xin đúng số còn thiếu nếu vượt quá khối
+                    size = max(self.block_size, count - len(numbers))
+                    end = await self._reserve(db, collection, size)
+                    block = [end - size + 1, end]
+                    self._blocks[key] = block
+                take = min(count - len(numbers), block[1] - block[0] + 1)
+                numbers.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return [f"{prefix}{num:03d}" for num in numbers]
+
+    async def next_id(
+        self, db: AsyncIOMotorDatabase, collection: str, prefix: str
+    ) -> str:
+        """Cấp một ID mới cho collection."""
+        return (await self.next_ids(db, collection, prefix, 1))[0]
+
+    def reset(self) -> None:
+        """Bỏ các khối đã xin trước (gọi sau khi dữ liệu bị thay thế toàn bộ)."""
+        self._blocks.clear()
+        self._seeded.clear()
@@ -0,0 +1,196 @@
+# src/indexes.py
+
+import asyncio
+import sys
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from .crud import FEEDBACK_COLLECTION, INDEXES, dedupe_feedbacks
+
+# -----------------------
+# Đồng bộ index khai báo trong crud.INDEXES với MongoDB
+# -----------------------
+# - Index thiếu: được tạo (MongoDB build index không khóa collection).
+# - Index có trong DB nhưng không khai báo: chỉ báo cáo, không tự xóa.
+# - Index trùng tên nhưng khác key / tùy chọn: báo cáo, cần xử lý thủ công.
+# - Index unique có dữ liệu trùng sẵn: lúc khởi động chỉ báo cáo số bản
+#   trùng (không tự xóa dữ liệu); lệnh sync chạy bước dọn (_BEFORE_CREATE)
+#   rồi mới tạo index.
+#
+# Chạy tay từ thư mục backend:
+#
+#     python -m src.indexes check   # so sánh registry với DB, không thay đổi gì
+#     python -m src.indexes sync    # dọn dữ liệu trùng, tạo các index còn thiếu
+#
+# check thoát với mã lỗi khi thiếu index unique, sync khi có index tạo lỗi.
+
+
+# Các tùy chọn index được so sánh ngoài key
+_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+# Dọn dữ liệu trùng trước khi tạo index unique (nếu không việc tạo sẽ lỗi và
+# dữ liệu trùng tiếp tục được ghi): fn(db, dry_run) -> số document trùng
+_BEFORE_CREATE = {(FEEDBACK_COLLECTION, "user_session_unique"): dedupe_feedbacks}
+
+
+def _keys(model: IndexModel) -> List[tuple]:
+    return list(model.document["key"].items())
+
+
+def _matches(model: IndexModel, info: Dict[str, Any]) -> bool:
+    """Index hiện có (index_information) có đúng key và tùy chọn khai báo."""
+    keys = _keys(model)
+    if any(direction == TEXT for _, direction in keys):
+        # Text index được lưu với key _fts / _ftsx: so sánh field qua weights
+        weights = model.document.get("weights", {})
+        expected = {f: weights.get(f, 1) for f, d in keys if d == TEXT}
+        language = model.document.get("default_language", "english")
+        if info.get("weights") != expected:
+            return False
+        if info.get("default_language", "english") != language:
+            return False
+    elif [tuple(k) for k in info["key"]] != [(f, int(d)) for f, d in keys]:
+        return False
+    return all(model.document.get(o) == info.get(o) for o in _OPTIONS)
+
+
+async def diff_indexes(
+    db: AsyncIOMotorDatabase, indexes: Dict[str, List[IndexModel]] = INDEXES
+) -> Dict[str, Dict[str, Any]]:
+    """So sánh registry với index hiện có, theo từng collection."""
+    report = {}
+    for collection, models in indexes.items():
+        existing = await db[collection].index_information()
+        expected = {model.document["name"]: model for model in models}
+        report[collection] = {
+            "present": [n for n in expected if n in existing],
+            "missing": [expected[n] for n in expected if n not in existing],
+            "mismatched": [
+                n
+                for n, model in expected.items()
+                if n in existing and not _matches(model, existing[n])
+            ],
+            "unexpected": [n for n in existing if n != "_id_" and n not in expected],
+        }
+    return report
+
+
+async def sync_indexes(
+    db: AsyncIOMotorDatabase,
+    indexes: Dict[str, List[IndexModel]] = INDEXES,
+    dedupe: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Tạo các index còn thiếu; index lạ / lệch khai báo chỉ được báo cáo.
+    dedupe: xóa dữ liệu trùng trước khi tạo index unique. Không bật thì index
+    gặp dữ liệu trùng được bỏ qua và báo trong "failed".
+    """
+    report = await diff_indexes(db, indexes)
+    for collection, entry in report.items():
+        entry["created"] = []
+        entry["deduplicated"] = {}
+        entry["failed"] = {}
+        # Tạo từng index một: một index lỗi (vd unique gặp dữ liệu trùng)
+        # không chặn các index còn lại
+        for model in entry.pop("missing"):
+            name = model.document["name"]
+            prepare = _BEFORE_CREATE.get((collection, name))
+            try:
+                if prepare is not None:
+                    duplicates = await prepare(db, dry_run=not dedupe)
+                    if duplicates and not dedupe:
+                        entry["failed"][name] = (
+                            f"{duplicates} document trùng, chạy "
+                            "'python -m src.indexes sync' để dọn"
+                        )
+                        continue
+                    if duplicates:
+                        entry["deduplicated"][name] = duplicates
+                await db[collection].create_indexes([model])
+                entry["created"].append(name)
+            except OperationFailure as e:
+                entry["failed"][name] = str(e)
+    return report
+
+
+async def sync_indexes_in_background(db: AsyncIOMotorDatabase) -> None:
+    """
+    Dùng trong startup hook: lỗi chỉ được log, không chặn server khởi động.
+    Không xóa dữ liệu trùng, chỉ báo cáo (xem sync_indexes).
+    """
+    try:
+        report = await sync_indexes(db)
+    except Exception as e:
+        print(f"❌ [Indexes] Sync failed: {e}")
+        return
+    for collection, entry in report.items():
+        if entry["created"]:
+            print(f"🗂️ [Indexes] {collection}: created {entry['created']}")
+        if entry["unexpected"]:
+            print(f"⚠️ [Indexes] {collection}: unexpected {entry['unexpected']}")
+        if entry["mismatched"]:
+            print(f"⚠️ [Indexes] {collection}: mismatched {entry['mismatched']}")
+        for name, error in entry["failed"].items():
+            print(f"❌ [Indexes] {collection}: {name} failed: {error}")
+
+
+def _print_report(report: Dict[str, Dict[str, Any]]) -> None:
+    for collection, entry in report.items():
+        print(f"{collection}:")
+        for name in entry["present"]:
+            flag = "mismatched" if name in entry["mismatched"] else "ok"
+            print(f"  {flag:<11} {name}")
+        for model in entry.get("missing", []):
+            print(f"  {'missing':<11} {model.document['name']} {_keys(model)}")
+        for name, removed in entry.get("deduplicated", {}).items():
+            print(f"  {'deduped':<11} {name}: removed {removed} duplicates")
+        for name in entry.get("created", []):
+            print(f"  {'created':<11} {name}")
+        for name, error in entry.get("failed", {}).items():
+            print(f"  {'failed':<11} {name}: {error}")
+        for name in entry["unexpected"]:
+            print(f"  {'unexpected':<11} {name}")
+
+
+def _missing_unique(report: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Index unique chưa có: ràng buộc không được MongoDB bảo đảm."""
+    return [
+        f"{collection}.{model.document['name']}"
+        for collection, entry in report.items()
+        for model in entry.get("missing", [])
+        if model.document.get("unique")
+    ]
+
+
+def _failed(report: Dict[str, Dict[str, Any]]) -> List[str]:
+    return [
+        f"{collection}.{name}"
+        for collection, entry in report.items()
+        for name in entry.get("failed", {})
+    ]
+
+
+async def main(command: str) -> None:
+    from .database import db
+
+    if command == "check":
+        report = await diff_indexes(db)
+        _print_report(report)
+        missing = _missing_unique(report)
+        if missing:
+            raise SystemExit(f"❌ Thiếu index unique: {', '.join(missing)}")
+    elif command == "sync":
+        report = await sync_indexes(db, dedupe=True)
+        _print_report(report)
+        failed = _failed(report)
+        if failed:
+            raise SystemExit(f"❌ Tạo index thất bại: {', '.join(failed)}")
+    else:
+        raise SystemExit("Usage: python -m src.indexes [check|sync]")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "check"))
@@ -0,0 +1,253 @@
+# src/jobs.py
+
+import asyncio
+import datetime
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from . import crud
+from .utils import get_iso_now
+
+# -----------------------
+# Job nền: xóa dây chuyền khi xóa event / user
+# -----------------------
+# Mutation chỉ xóa document chính; dữ liệu phụ thuộc được dọn bởi một job
+# lưu trong collection `jobs`:
+#
+#   {"_id": "j001", "type": "delete_event", "target_id": "e001",
+#    "status": "pending" | "running" | "completed" | "failed",
+#    "steps": [{"name": "registrations.event_id", "done": false,
+#               "processed": 0}, ...],
+#    "error": None, "created_at": ..., "updated_at": ...}
+#
+# Mỗi bước xử lý theo lô BATCH_SIZE _id (delete_many / update_many) và ghi
+# tiến độ sau mỗi lô. Mọi bước đều chạy lại được an toàn, nên job bị ngắt
+# (tắt server giữa chừng) được resume_jobs chạy tiếp từ bước chưa xong.
+#
+# Job đang chạy giữ một lease (lease_id, lease_until), gia hạn sau mỗi lô.
+# run_job chỉ nhận job pending / failed, hoặc job running đã hết lease (tiến
+# trình chạy nó đã dừng), nên một job không bao giờ chạy song song hai lần.
+
+JOB_COLLECTION = "jobs"
+BATCH_SIZE = 500
+LEASE_SECONDS = 60
+
+# Các bước theo loại job: (collection, field chứa target_id, thao tác)
+CASCADE_STEPS: Dict[str, List[tuple]] = {
+    "delete_event": [
+        (crud.USER_COLLECTION, "registered_events", "pull"),
+        (crud.REGISTRATION_COLLECTION, "event_id", "delete"),
+        (crud.FEEDBACK_COLLECTION, "event_id", "delete"),
+        (crud.PAPER_COLLECTION, "event_id", "delete"),
+        (crud.SESSION_COLLECTION, "event_id", "delete"),
+        (crud.RATING_STATS_COLLECTION, "event_id", "delete"),
+        (crud.EVENT_DAILY_STATS_COLLECTION, "event_id", "delete"),
+    ],
+    "delete_user": [
+        # Đăng ký của user chiếm chỗ trong sự kiện: xóa qua
+        # crud.delete_registration để trả chỗ và cấp cho hàng chờ
+        (crud.REGISTRATION_COLLECTION, "user_id", "release"),
+        (crud.FEEDBACK_COLLECTION, "user_id", "unrate"),
+        (crud.PAPER_COLLECTION, "author_ids", "pull"),
+    ],
+}
+
+Report = Callable[[int], Awaitable[None]]
+
+
+class LeaseLost(Exception):
+    """Lease hết hạn và job đã được tiến trình khác nhận lại."""
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _lease_until() -> datetime.datetime:
+    return _utcnow() + datetime.timedelta(seconds=LEASE_SECONDS)
+
+
+async def _next_batch(collection, query: Dict[str, Any]) -> List[str]:
+    docs = (
+        await collection.find(query, {"_id": 1})
+        .limit(BATCH_SIZE)
+        .to_list(length=BATCH_SIZE)
+    )
+    return [doc["_id"] for doc in docs]
+
+
+async def _delete(
+    db: AsyncIOMotorDatabase, collection: str, field: str, value: str, report: Report
+) -> None:
+    """Xóa mọi document có field == value."""
+    while ids := await _next_batch(db[collection], {field: value}):
+        result = await db[collection].delete_many({"_id": {"$in": ids}})
+        await report(result.deleted_count)
+
+
+async def _pull(
+    db: AsyncIOMotorDatabase, collection: str, field: str, value: str, report: Report
+) -> None:
+    """Bỏ value khỏi mảng field của mọi document đang chứa nó."""
+    while ids := await _next_batch(db[collection], {field: value}):
+        result = await db[collection].update_many(
+            {"_id": {"$in": ids}}, {"$pull": {field: value}}
+        )
+        await report(result.modified_count)
+
+
+async def _release(
+    db: AsyncIOMotorDatabase, collection: str, field: str, value: str, report: Report
+) -> None:
+    """Xóa từng đăng ký (trả chỗ cho sự kiện), rồi cấp chỗ trống cho hàng chờ."""
+    while ids := await _next_batch(db[collection], {field: value}):
+        deleted = [await crud.delete_registration(db, i) for i in ids]
+        freed = {
+            reg["event_id"]
+            for reg in deleted
+            if reg and reg.get("status") != crud.WAITLISTED
+        }
+        for event_id in freed:
+            await crud.promote_waitlist(db, event_id)
+        await report(sum(1 for reg in deleted if reg))
+
+
+async def _unrate(
+    db: AsyncIOMotorDatabase, collection: str, field: str, value: str, report: Report
+) -> None:
+    """Xóa feedback và trừ điểm của chúng khỏi rating_stats."""
+    projection = {"event_id": 1, "session_id": 1, "rating": 1}
+    while feedbacks := await (
+        db[collection]
+        .find({field: value}, projection)
+        .limit(BATCH_SIZE)
+        .to_list(length=BATCH_SIZE)
+    ):
+        ids = [feedback["_id"] for feedback in feedbacks]
+        result = await db[collection].delete_many({"_id": {"$in": ids}})
+        # Bị ngắt trước bước này thì rating_stats lệch tới lần rebuild sau
+        await crud.update_rating_stats(db, removed=feedbacks)
+        await report(result.deleted_count)
+
+
+_ACTIONS = {"delete": _delete, "pull": _pull, "release": _release, "unrate": _unrate}
+
+
+async def create_job(
+    db: AsyncIOMotorDatabase, job_type: str, target_id: str
+) -> Dict[str, Any]:
+    """Ghi một job mới (trạng thái pending); chạy bằng run_job."""
+    now = get_iso_now()
+    job = {
+        "_id": await crud.id_allocator.next_id(db, JOB_COLLECTION, "j"),
+        "type": job_type,
+        "target_id": target_id,
+        "status": "pending",
+        "steps": [
+            {"name": f"{collection}.{field}", "done": False, "processed": 0}
+            for collection, field, _ in CASCADE_STEPS[job_type]
+        ],
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await db[JOB_COLLECTION].insert_one(job)
+    return job
+
+
+async def get_job(db: AsyncIOMotorDatabase, job_id: str) -> Dict[str, Any] | None:
+    return await db[JOB_COLLECTION].find_one({"_id": job_id})
+
+
+async def run_job(db: AsyncIOMotorDatabase, job_id: str) -> Dict[str, Any] | None:
+    """
+    Chạy (hoặc chạy tiếp) các bước chưa xong của job. Job đang được tiến trình
+    khác chạy (còn lease) thì không làm gì, chỉ trả về trạng thái hiện tại.
+    """
+    jobs = db[JOB_COLLECTION]
+    lease_id = uuid.uuid4().hex
+    job = await jobs.find_one_and_update(
+        {
+            "_id": job_id,
+            "$or": [
+                {"status": {"$in": ["pending", "failed"]}},
+                # Hết lease (hoặc job cũ chưa có lease): tiến trình chạy nó đã dừng
+                {"status": "running", "lease_until": {"$not": {"$gte": _utcnow()}}},
+            ],
+        },
+        {
+            "$set": {
+                "status": "running",
+                "error": None,
+                "lease_id": lease_id,
+                "lease_until": _lease_until(),
+                "updated_at": get_iso_now(),
+            }
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if job is None:
+        return await get_job(db, job_id)
+
+    async def update(update: Dict[str, Any]) -> None:
+        # Ghi tiến độ và gia hạn lease; lease đã mất thì dừng ngay
+        update.setdefault("$set", {}).update(
+            {"lease_until": _lease_until(), "updated_at": get_iso_now()}
+        )
+        result = await jobs.update_one({"_id": job_id, "lease_id": lease_id}, update)
+        if result.matched_count == 0:
+            raise LeaseLost(job_id)
+
+    try:
+        for index, (collection, field, action) in enumerate(CASCADE_STEPS[job["type"]]):
+            if job["steps"][index]["done"]:
+                continue
+
+            async def report(count: int, index: int = index) -> None:
+                await update({"$inc": {f"steps.{index}.processed": count}})
+
+            await _ACTIONS[action](db, collection, field, job["target_id"], report)
+            await update({"$set": {f"steps.{index}.done": True}})
+        status = {"status": "completed"}
+    except LeaseLost:
+        print(f"⚠️ [Jobs] {job_id}: lease lost, another worker took over")
+        return await get_job(db, job_id)
+    except Exception as e:
+        print(f"❌ [Jobs] {job_id} failed: {e}")
+        status = {"status": "failed", "error": str(e)}
+
+    finished = await jobs.find_one_and_update(
+        {"_id": job_id, "lease_id": lease_id},
+        {
+            "$set": {**status, "updated_at": get_iso_now()},
+            "$unset": {"lease_id": "", "lease_until": ""},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    return finished or await get_job(db, job_id)
+
+
+async def resume_jobs(db: AsyncIOMotorDatabase) -> None:
+    """
+    Chạy tiếp các job bị ngắt (gọi khi server khởi động). Job running còn
+    lease (vd server vừa tắt chưa tới LEASE_SECONDS) được thử lại khi lease
+    hết hạn, tới khi nó được chạy xong ở đây hoặc ở tiến trình khác.
+    """
+    while True:
+        pending = (
+            await db[JOB_COLLECTION]
+            .find({"status": {"$in": ["pending", "running"]}}, {"_id": 1})
+            .to_list(length=None)
+        )
+        held = 0
+        for job in pending:
+            print(f"🔁 [Jobs] Resuming {job['_id']}")
+            result = await run_job(db, job["_id"])
+            if result is not None and result["status"] == "running":
+                held += 1
+        if not held:
+            return
+        await asyncio.sleep(LEASE_SECONDS)
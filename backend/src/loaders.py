@@ -0,0 +1,114 @@
+# src/loaders.py
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from strawberry.dataloader import DataLoader
+
+from . import crud
+from .cache import CacheBackend, MISSING
+
+# -----------------------
+# DataLoader theo từng request
+# -----------------------
+# Mỗi request GraphQL có một bộ loader riêng (tạo trong database.get_context).
+# Các key được gọi trong cùng một "tick" của event loop sẽ được gom lại và
+# giải quyết bằng đúng một truy vấn $in cho mỗi collection, thay vì một
+# truy vấn cho mỗi object cha (vấn đề N+1).
+
+
+def _index_by_id(
+    docs: List[Dict[str, Any]], keys: List[str]
+) -> List[Optional[Dict[str, Any]]]:
+    """Sắp xếp lại kết quả theo đúng thứ tự key (thiếu thì trả về None)."""
+    by_id = {doc["_id"]: doc for doc in docs}
+    return [by_id.get(key) for key in keys]
+
+
+def _group_by_field(
+    docs: List[Dict[str, Any]], keys: List[str], field: str
+) -> List[List[Dict[str, Any]]]:
+    """Chia kết quả thành từng nhóm theo `field`, đúng thứ tự key."""
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for doc in docs:
+        groups[doc.get(field)].append(doc)
+    return [groups.get(key, []) for key in keys]
+
+
+class Loaders:
+    """Tập hợp các DataLoader dùng trong một request."""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        batch: bool = True,
+        cache: Optional[CacheBackend] = None,
+        cache_db: Optional[AsyncIOMotorDatabase] = None,
+    ):
+        # Dữ liệu ghi vào response cache dùng chung phải đọc từ primary: bản
+        # cũ từ secondary sẽ bị phục vụ cho mọi request tới khi invalidate
+        cache_db = db if cache_db is None else cache_db
+        # batch=False: mỗi key một truy vấn, không cache (tương đương hành vi
+        # cũ, dùng để debug hoặc so sánh trong benchmark)
+        options = {} if batch else {"max_batch_size": 1, "cache": False}
+
+        async def load_users(keys: List[str]):
+            return _index_by_id(await crud.get_users_by_ids(db, keys), keys)
+
+        async def load_events(keys: List[str]):
+            return _index_by_id(await crud.get_events_by_ids(db, keys), keys)
+
+        async def load_rating_stats(keys: List[str]):
+            return _index_by_id(await crud.get_rating_stats_by_ids(db, keys), keys)
+
+        async def load_session_papers(keys: List[str]):
+            if cache is None:
+                papers = await crud.get_papers_by_sessions(db, keys)
+                return _group_by_field(papers, keys, "session_id")
+
+            # Phiên đã có trong response cache thì không cần truy vấn lại
+            found = {}
+            for key in keys:
+                value = await cache.get(("session_papers", key))
+                if value is not MISSING:
+                    found[key] = value
+            missing = [key for key in keys if key not in found]
+            if missing:
+                version = cache.version
+                papers = await crud.get_papers_by_sessions(cache_db, missing)
+                groups = _group_by_field(papers, missing, "session_id")
+                for key, group in zip(missing, groups):
+                    found[key] = group
+                    tags = [f"session_papers:{key}"] + [
+                        f"paper:{p['_id']}" for p in group
+                    ]
+                    await cache.set(("session_papers", key), group, tags, version)
+            return [found[key] for key in keys]
+
+        self.user_by_id: DataLoader[str, Optional[Dict[str, Any]]] = DataLoader(
+            load_fn=load_users, **options
+        )
+        self.event_by_id: DataLoader[str, Optional[Dict[str, Any]]] = DataLoader(
+            load_fn=load_events, **options
+        )
+        self.papers_by_session: DataLoader[str, List[Dict[str, Any]]] = DataLoader(
+            load_fn=load_session_papers, **options
+        )
+        # key: crud.rating_stats_id("event" | "session", id)
+        self.rating_stats: DataLoader[str, Optional[Dict[str, Any]]] = DataLoader(
+            load_fn=load_rating_stats, **options
+        )
+
+
+def create_loaders(
+    db: AsyncIOMotorDatabase,
+    batch: bool = True,
+    cache: Optional[CacheBackend] = None,
+    cache_db: Optional[AsyncIOMotorDatabase] = None,
+) -> Loaders:
+    """
+    Tạo bộ loader mới cho một request.
+    cache: response cache dùng chung (chỉ áp dụng cho SessionType.papers).
+    cache_db: db (primary) để đọc phần sẽ lưu vào cache, mặc định là db.
+    """
+    return Loaders(db, batch=batch, cache=cache, cache_db=cache_db)
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import shutil
 import json
 import datetime
@@ -8,7 +9,6 @@ from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from strawberry.fastapi import GraphQLRouter
 from bson import json_util
 from pydantic import BaseModel
 
@@ -17,7 +17,27 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from .schema import schema
-from .database import get_context, db
+from .database import (
+    get_context,
+    db,
+    response_cache,
+    write_buffer,
+    settings,
+    pool_metrics,
+)
+from .extensions import PersistedQueryRouter, graphql_cache_stats
+from .crud import (
+    id_allocator,
+    rebuild_rating_stats,
+    rebuild_event_daily_stats,
+    DATE_FIELDS,
+    SEARCH_FIELDS,
+    SEARCH_KEY_FIELDS,
+)
+from .utils import add_search_fields, parse_datetime_fields, search_keys
+from .indexes import sync_indexes_in_background
+from .jobs import get_job, resume_jobs, run_job
+from .reconcile import run_scheduled as reconcile_counters
 
 # --- CẤU HÌNH ---
 UPLOAD_DIR = "uploads"
@@ -28,7 +48,7 @@ for dir_path in [UPLOAD_DIR, BACKUP_DIR]:
     if not os.path.exists(dir_path):
         os.makedirs(dir_path)
 
-graphql_app = GraphQLRouter(schema, context_getter=get_context, graphiql=True)
+graphql_app = PersistedQueryRouter(schema, context_getter=get_context, graphiql=True)
 
 app = FastAPI()
 
@@ -70,6 +90,9 @@ def save_schedule_config(config: dict):
 # --- BACKUP LOGIC (Tách ra để dùng chung) ---
 async def perform_backup(auto=False):
     try:
+        # Backup phải chứa cả các feedback còn nằm trong buffer
+        if write_buffer is not None:
+            await write_buffer.flush()
         collections = await db.list_collection_names()
         backup_data = {}
         for col_name in collections:
@@ -114,12 +137,68 @@ def update_scheduler_job():
         print("🕒 Scheduled backup disabled")
 
 
+def add_reconcile_jobs():
+    if settings.reconcile_interval_minutes <= 0:
+        return
+    scheduler.add_job(
+        reconcile_counters,
+        "interval",
+        minutes=settings.reconcile_interval_minutes,
+        args=[db],
+        kwargs={"cache": response_cache},
+        id="reconcile_job",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        reconcile_counters,
+        CronTrigger(hour=settings.reconcile_full_hour),
+        args=[db],
+        kwargs={"full": True, "cache": response_cache},
+        id="reconcile_full_job",
+        replace_existing=True,
+    )
+
+
 @app.on_event("startup")
 async def start_scheduler():
     update_scheduler_job()
+    add_reconcile_jobs()
     scheduler.start()
 
 
+# Giữ tham chiếu để task không bị garbage collect khi đang chạy
+background_tasks = set()
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Tạo index trong nền để server nhận request ngay
+    task = asyncio.create_task(sync_indexes_in_background(db))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    # Job xóa dây chuyền bị ngắt lần trước được chạy tiếp trong nền
+    task = asyncio.create_task(resume_jobs(db))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+@app.on_event("startup")
+async def start_write_buffer():
+    if write_buffer is not None:
+        write_buffer.start()
+
+
+@app.on_event("shutdown")
+async def flush_write_buffer():
+    # Ghi nốt các document đã xác nhận với client trước khi tắt
+    if write_buffer is not None:
+        await write_buffer.stop()
+
+
 # --- API UPLOAD (Giữ nguyên) ---
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
@@ -195,16 +274,38 @@ async def restore_backup(filename: str):
             content = f.read()
             backup_data = json_util.loads(content)
 
+        # Không để feedback đang chờ ghi rơi vào dữ liệu sau khi restore
+        if write_buffer is not None:
+            await write_buffer.flush()
         collection_names = await db.list_collection_names()
         for col_name in collection_names:
             await db[col_name].delete_many({})
 
         for col_name, docs in backup_data.items():
             if docs:
+                # Backup cũ lưu ngày giờ dạng chuỗi (xem migrate_dates.py)
+                for doc in docs:
+                    parse_datetime_fields(doc, DATE_FIELDS.get(col_name, ()))
+                    # Backup cũ chưa có field "search" (tìm kiếm toàn văn)
+                    if col_name in SEARCH_FIELDS and "search" not in doc:
+                        add_search_fields(doc, SEARCH_FIELDS[col_name])
+                    if col_name in SEARCH_KEY_FIELDS and "search_keys" not in doc:
+                        doc["search_keys"] = search_keys(
+                            doc, SEARCH_KEY_FIELDS[col_name]
+                        )
                 await db[col_name].insert_many(docs)
+        # Khối ID đã xin trước có thể không còn khớp với counters vừa khôi phục
+        id_allocator.reset()
+        # Backup cũ có thể chưa có (hoặc có bản lệch) các bảng thống kê
+        await rebuild_rating_stats(db)
+        await rebuild_event_daily_stats(db)
         return {"message": f"Restored from {filename} successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+    finally:
+        # Dữ liệu đã bị thay (kể cả khi restore lỗi giữa chừng): bỏ mọi response
+        # cache thay vì chờ TTL
+        await response_cache.clear()
 
 
 @app.delete("/api/backups/{filename}")
@@ -239,6 +340,44 @@ async def upload_backup(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- JOBS ---
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str, tasks: BackgroundTasks):
+    # Chạy lại job bị lỗi; các bước đã xong được bỏ qua
+    job = await get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    tasks.add_task(run_job, db, job_id)
+    return {"message": "Job resumed", "id": job_id}
+
+
+# --- ANALYTICS ---
+@app.post("/api/analytics/rebuild")
+async def rebuild_analytics(tasks: BackgroundTasks):
+    # Backfill event_daily_stats từ registrations (lần đầu bật, hoặc khi lệch)
+    tasks.add_task(rebuild_event_daily_stats, db)
+    return {"message": "Rebuild started"}
+
+
+# --- METRICS ---
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "graphql": graphql_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "write_buffer": write_buffer.stats() if write_buffer is not None else None,
+        "mongo_pool": pool_metrics.stats(),
+    }
+
+
 @app.get("/")
 async def root():
     return {"message": "API Quản lý Hội thảo Khoa học", "docs": "/graphql"}
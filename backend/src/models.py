@@ -1,3 +1,4 @@
+import datetime
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import strawberry
@@ -25,8 +26,9 @@ class Event(BaseModel):
     title: str
     fee: int
     description: str
-    start_date: str
-    end_date: str
+    # Lưu dạng BSON date, trả ra GraphQL dưới dạng chuỗi ISO
+    start_date: datetime.datetime
+    end_date: datetime.datetime
     location: str
     organizer_id: str
     max_participants: int
@@ -43,8 +45,8 @@ class Session(BaseModel):
     title: str
     description: str
     speaker_id: str
-    start_time: str
-    end_time: str
+    start_time: datetime.datetime
+    end_time: datetime.datetime
     room: str
     topics: List[str]
     created_at: str
@@ -57,9 +59,11 @@ class Registration(BaseModel):
     event_id: str
     user_id: str
     registration_date: str
-    status: str
+    status: str  # pending / confirmed / cancelled / waitlisted
     payment_status: str
     payment_amount: int
+    # Thứ tự trong hàng chờ (chỉ có khi status = "waitlisted")
+    waitlist_seq: Optional[int] = None
     created_at: str
     updated_at: str
 
@@ -0,0 +1,110 @@
+# src/pool_metrics.py
+
+import threading
+from collections import deque
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+# -----------------------
+# Số liệu connection pool (CMAP)
+# -----------------------
+# PyMongo phát sự kiện CMAP mỗi lần mượn / trả connection. Listener đếm theo
+# từng server: connection đang mở, đang được dùng, thời gian chờ mượn
+# (checkout) và số lần mượn thất bại (vd quá MONGO_WAIT_QUEUE_TIMEOUT_MS).
+# Motor gọi listener từ thread pool của nó, nên mọi cập nhật đều qua lock.
+
+WAIT_SAMPLES = 1000  # số lần checkout gần nhất dùng để tính p50 / p95
+
+
+def _percentile(values: list, q: float) -> float:
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, samples: int = WAIT_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self._pools: Dict[str, Dict[str, Any]] = {}
+
+    def _pool(self, address: tuple) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open": 0,
+                "in_use": 0,
+                "max_in_use": 0,
+                "checkouts": 0,
+                "failed": {},  # lý do ("timeout", "connectionError", ...) -> số lần
+                "cleared": 0,
+                "waits_ms": deque(maxlen=self._samples),
+                "max_wait_ms": 0.0,
+            }
+        return pool
+
+    # --- Sự kiện của pool ---
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["cleared"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    # --- Sự kiện của connection ---
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event.address)["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            failed = self._pool(event.address)["failed"]
+            failed[event.reason] = failed.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        wait_ms = event.duration * 1000
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["in_use"] += 1
+            pool["max_in_use"] = max(pool["max_in_use"], pool["in_use"])
+            pool["checkouts"] += 1
+            pool["waits_ms"].append(wait_ms)
+            pool["max_wait_ms"] = max(pool["max_wait_ms"], wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address)["in_use"] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Số liệu theo server (dùng cho /api/metrics)."""
+        with self._lock:
+            pools = {
+                key: {**pool, "failed": dict(pool["failed"])}
+                for key, pool in self._pools.items()
+            }
+            waits = {key: sorted(pool["waits_ms"]) for key, pool in pools.items()}
+        for key, pool in pools.items():
+            pool.pop("waits_ms")
+            pool["wait_ms"] = {
+                "p50": round(_percentile(waits[key], 0.5), 2),
+                "p95": round(_percentile(waits[key], 0.95), 2),
+                "max": round(pool.pop("max_wait_ms"), 2),
+            }
+        return pools
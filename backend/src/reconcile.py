@@ -0,0 +1,232 @@
+# src/reconcile.py
+
+import asyncio
+import sys
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from . import crud
+from .cache import CacheBackend
+from .jobs import JOB_COLLECTION
+from .utils import get_iso_now
+
+# -----------------------
+# Đối soát các field phi chuẩn hóa với registrations
+# -----------------------
+# events.current_participants và users.registered_events được cập nhật tay
+# ($inc / $addToSet / $pull) trong create_registration, delete_registration
+# và promote_waitlist, nên có thể lệch khi một bước bị lỗi hoặc registration
+# bị sửa trực tiếp. Giá trị đúng: các registration không ở hàng chờ.
+#
+# Mỗi collection một aggregation ($lookup sang registrations theo index
+# event_user / user_created_at_id), chỉ trả về document đang lệch; sửa bằng
+# một bulk_write. Filter của mỗi UpdateOne kèm giá trị vừa đọc, nên document
+# bị thay đổi trong lúc đối soát được bỏ qua và xử lý ở lần chạy sau.
+#
+# current_participants lệch tạm thời trong lúc đăng ký đang diễn ra
+# (create_registration $inc chỗ trước khi insert registration). Sửa ngay sẽ
+# mở lại chỗ và gây bán vượt, nên event lệch chỉ được sửa khi lần chạy sau
+# thấy đúng độ lệch đó (cùng current_participants và số thực tế); lần đầu chỉ
+# được ghi vào `suspect_events` và luôn được xét lại ở lần chạy kế tiếp.
+#
+# Chạy tăng dần: chỉ xét event / user có registration (hoặc chính nó) có
+# updated_at sau mốc của lần chạy trước. Registration bị xóa không để lại
+# updated_at, nên cần thêm lượt chạy toàn bộ định kỳ (full=True). Lượt toàn
+# bộ cũng tính lại rating_stats và event_daily_stats. Chạy tay từ thư mục
+# backend:
+#
+#     python -m src.reconcile         # tăng dần từ mốc lần trước
+#     python -m src.reconcile full    # toàn bộ + rebuild các bảng thống kê
+#
+# (event lệch chỉ được sửa ở lần chạy thứ hai, xem suspect_events ở trên)
+
+STATE_ID = "reconcile_counters"  # document lưu mốc trong collection jobs
+
+
+def _admitted(pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pipeline con của $lookup: registration đang chiếm chỗ."""
+    return [{"$match": {"status": {"$ne": crud.WAITLISTED}}}, *pipeline]
+
+
+async def _changed_ids(
+    db: AsyncIOMotorDatabase, since: str
+) -> tuple[List[str], List[str]]:
+    """Event / user cần đối soát kể từ mốc `since`."""
+    changed = {"updated_at": {"$gt": since}}
+    registrations = db[crud.REGISTRATION_COLLECTION]
+    event_ids = set(await registrations.distinct("event_id", changed))
+    user_ids = set(await registrations.distinct("user_id", changed))
+    event_ids.update(await db[crud.EVENT_COLLECTION].distinct("_id", changed))
+    user_ids.update(await db[crud.USER_COLLECTION].distinct("_id", changed))
+    return list(event_ids), list(user_ids)
+
+
+async def _repair_events(
+    db: AsyncIOMotorDatabase,
+    ids: List[str] | None,
+    suspects: List[Dict[str, Any]],
+) -> tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Sửa các event lệch giống hệt lần chạy trước (`suspects`). Trả về id các
+    event đã sửa và danh sách event lệch mới cần xác nhận ở lần sau.
+    """
+    seen = {
+        doc["_id"]: (doc["current_participants"], doc["actual"]) for doc in suspects
+    }
+    if ids is not None:
+        ids = list(set(ids) | set(seen))
+    pipeline = [
+        {
+            "$lookup": {
+                "from": crud.REGISTRATION_COLLECTION,
+                "localField": "_id",
+                "foreignField": "event_id",
+                "pipeline": _admitted([{"$count": "n"}]),
+                "as": "admitted",
+            }
+        },
+        {
+            "$project": {
+                "current_participants": 1,
+                "actual": {"$ifNull": [{"$first": "$admitted.n"}, 0]},
+            }
+        },
+        {"$match": {"$expr": {"$ne": ["$current_participants", "$actual"]}}},
+    ]
+    if ids is not None:
+        pipeline.insert(0, {"$match": {"_id": {"$in": ids}}})
+    drifted = await db[crud.EVENT_COLLECTION].aggregate(pipeline).to_list(length=None)
+    confirmed, pending = [], []
+    for doc in drifted:
+        drift = (doc.get("current_participants"), doc["actual"])
+        (confirmed if seen.get(doc["_id"]) == drift else pending).append(
+            {"_id": doc["_id"], "current_participants": drift[0], "actual": drift[1]}
+        )
+    operations = [
+        UpdateOne(
+            {
+                "_id": doc["_id"],
+                "current_participants": doc["current_participants"],
+            },
+            {"$set": {"current_participants": doc["actual"]}},
+        )
+        for doc in confirmed
+    ]
+    if operations:
+        await db[crud.EVENT_COLLECTION].bulk_write(operations, ordered=False)
+    return [doc["_id"] for doc in confirmed], pending
+
+
+async def _repair_users(db: AsyncIOMotorDatabase, ids: List[str] | None) -> int:
+    pipeline = [
+        {
+            "$lookup": {
+                "from": crud.REGISTRATION_COLLECTION,
+                "localField": "_id",
+                "foreignField": "user_id",
+                "pipeline": _admitted(
+                    [{"$group": {"_id": None, "events": {"$addToSet": "$event_id"}}}]
+                ),
+                "as": "admitted",
+            }
+        },
+        {
+            "$project": {
+                "registered_events": {"$ifNull": ["$registered_events", []]},
+                "actual": {"$ifNull": [{"$first": "$admitted.events"}, []]},
+            }
+        },
+        {
+            "$match": {
+                "$expr": {"$not": {"$setEquals": ["$registered_events", "$actual"]}}
+            }
+        },
+    ]
+    if ids is not None:
+        pipeline.insert(0, {"$match": {"_id": {"$in": ids}}})
+    drifted = await db[crud.USER_COLLECTION].aggregate(pipeline).to_list(length=None)
+    operations = [
+        UpdateOne(
+            {"_id": doc["_id"], "registered_events": doc["registered_events"]},
+            {"$set": {"registered_events": sorted(doc["actual"])}},
+        )
+        for doc in drifted
+    ]
+    if not operations:
+        return 0
+    result = await db[crud.USER_COLLECTION].bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+async def reconcile_counters(
+    db: AsyncIOMotorDatabase, full: bool = False, cache: CacheBackend | None = None
+) -> Dict[str, Any]:
+    """
+    Đối soát và sửa các document lệch; trả về số document đã sửa.
+    cache: response cache của server, invalidate các event đã sửa.
+    """
+    started_at = get_iso_now()
+    state = await db[JOB_COLLECTION].find_one({"_id": STATE_ID}) or {}
+    since = None if full else state.get("watermark")
+
+    event_ids = user_ids = None  # None: xét toàn bộ collection
+    if since is not None:
+        event_ids, user_ids = await _changed_ids(db, since)
+
+    repaired, suspects = await _repair_events(
+        db, event_ids, state.get("suspect_events", [])
+    )
+    if repaired and cache is not None:
+        await cache.invalidate("events", *(f"event:{i}" for i in repaired))
+    result = {
+        "full": since is None,
+        "events_checked": "all" if event_ids is None else len(event_ids),
+        "users_checked": "all" if user_ids is None else len(user_ids),
+        "events_repaired": len(repaired),
+        "events_suspect": len(suspects),
+        "users_repaired": await _repair_users(db, user_ids),
+    }
+    if since is None:
+        # Lượt toàn bộ cũng tính lại các bảng thống kê từ dữ liệu gốc
+        result["rating_stats_removed"] = await crud.rebuild_rating_stats(db)
+        result["daily_stats_removed"] = await crud.rebuild_event_daily_stats(db)
+    result["finished_at"] = get_iso_now()
+    # Thay đổi xảy ra trong lúc chạy (sau started_at) được xét lại lần sau
+    await db[JOB_COLLECTION].update_one(
+        {"_id": STATE_ID},
+        {
+            "$set": {
+                "type": "reconcile",
+                "watermark": started_at,
+                "suspect_events": suspects,
+                "last_run": result,
+            }
+        },
+        upsert=True,
+    )
+    return result
+
+
+async def run_scheduled(
+    db: AsyncIOMotorDatabase, full: bool = False, cache: CacheBackend | None = None
+) -> None:
+    """Dùng cho APScheduler: lỗi chỉ được log."""
+    try:
+        result = await reconcile_counters(db, full=full, cache=cache)
+    except Exception as e:
+        print(f"❌ [Reconcile] Failed: {e}")
+        return
+    if result["events_repaired"] or result["users_repaired"]:
+        print(f"🧮 [Reconcile] Repaired: {result}")
+
+
+async def main(full: bool) -> None:
+    from .database import db
+
+    print(await reconcile_counters(db, full=full))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(len(sys.argv) > 1 and sys.argv[1] == "full"))
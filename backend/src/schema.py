@@ -1,10 +1,17 @@
 # src/schema.py
 
+import asyncio
+import dataclasses
+import datetime
 import math
+import functools
+from enum import Enum
 import strawberry
 from strawberry.types import Info
-from typing import List, Optional, Callable, Tuple, Any, Type
-from .utils import get_pagination
+from strawberry.types.nodes import SelectedField, Selection
+from strawberry.utils.str_converters import to_camel_case
+from typing import Annotated, List, Optional, Callable, Tuple, Any, Type, Dict, Union
+from .utils import get_pagination, encode_cursor, decode_cursor, format_datetime
 
 # Import Pydantic models & CRUD
 from .models import (
@@ -27,32 +34,191 @@ from .models import (
     CreatePaperInput,
     UpdatePaperInput,
 )
-from . import crud
-from .database import AsyncIOMotorDatabase
+from . import crud, jobs
+from .database import AsyncIOMotorDatabase, settings, response_cache
+from .cache import MISSING
+from .loaders import Loaders
+from .extensions import (
+    parser_cache,
+    validation_cache,
+    query_depth_limiter,
+    QueryCostLimiter,
+    PrimaryForMutations,
+)
 
 # Context type for resolvers (Info[Root, Context])
 Context = Info[None, dict[str, AsyncIOMotorDatabase]]
 
+# Tham số lọc khoảng thời gian [from, to) theo chuỗi ISO 8601
+DateFrom = Annotated[
+    Optional[str], strawberry.argument(name="from", description="Từ (ISO 8601)")
+]
+DateTo = Annotated[
+    Optional[str], strawberry.argument(name="to", description="Đến trước (ISO 8601)")
+]
+# updatedAt client đã đọc; update bị từ chối nếu document đã bị sửa sau đó
+ExpectedUpdatedAt = Annotated[
+    Optional[str],
+    strawberry.argument(description="updatedAt đã đọc (chống ghi đè mất dữ liệu)"),
+]
+
 # -----------------------
 # Helper functions
 # -----------------------
 
 
-def _to_type(pydantic_cls: Type[Any], data: dict, type_cls: Type[Any]) -> Any:
-    # 1. Validate và convert dữ liệu bằng Pydantic
-    pydantic_obj = pydantic_cls(**data)
+def _to_type(
+    pydantic_cls: Type[Any], data: dict, type_cls: Type[Any], partial: bool = False
+) -> Any:
+    """
+    Chuyển document MongoDB thành object GraphQL bằng mapper đã biên dịch sẵn.
+    - partial=True: document đã bị projection, không chạy validate Pydantic.
+    """
+    return _get_mapper(pydantic_cls, type_cls)(data, partial)
+
+
+_MISSING = object()
+
+
+def _format_datetime(value: Any) -> Any:
+    """BSON date -> chuỗi ISO; giữ nguyên chuỗi cũ (dữ liệu chưa migrate)."""
+    if isinstance(value, datetime.datetime):
+        return format_datetime(value)
+    return value
 
-    # 2. Chuyển dữ liệu thành dictionary
-    data_dict = pydantic_obj.model_dump()
 
-    # 3. --- BƯỚC QUAN TRỌNG: LỌC DỮ LIỆU ---
-    # Chỉ lấy những field nào thực sự tồn tại trong GraphQL Type (type_cls)
-    # Điều này sẽ tự động loại bỏ 'password' hoặc các field thừa khác
-    valid_fields = type_cls.__annotations__.keys()
-    clean_data = {k: v for k, v in data_dict.items() if k in valid_fields}
+@functools.lru_cache(maxsize=None)
+def _get_mapper(
+    pydantic_cls: Type[Any], type_cls: Type[Any]
+) -> Callable[[dict, bool], Any]:
+    """
+    Biên dịch (một lần cho mỗi cặp Pydantic model / Strawberry type) hàm dựng
+    object GraphQL thẳng từ dict của Motor, không qua model_dump() và lọc lại.
+
+    - Chỉ đọc các field có trong GraphQL Type (tự loại bỏ 'password', ...).
+    - Field thiếu lấy default của Pydantic model, nếu không có default thì None
+      (chỉ xảy ra với document bị projection, field đó không được yêu cầu).
+    - Validate bằng Pydantic chỉ chạy khi bật STRICT_VALIDATION (debug).
+    """
+    model_fields = pydantic_cls.model_fields
+    plan = []  # (tên field GraphQL, key trong document, default, hàm chuyển đổi)
+    for name in [*_stored_fields(type_cls).values(), *_private_fields(type_cls)]:
+        field = model_fields.get(name)
+        source = field.alias if field is not None and field.alias else name
+        default = None
+        if field is not None and not field.is_required():
+            default = field.get_default(call_default_factory=True)
+        convert = None
+        if field is not None and field.annotation is datetime.datetime:
+            convert = _format_datetime
+        plan.append((name, source, default, convert))
+
+    new_object = object.__new__
+    strict = settings.strict_validation
+
+    def mapper(data: dict, partial: bool = False) -> Any:
+        if strict and not partial:
+            pydantic_cls.model_validate(data)
+        obj = new_object(type_cls)
+        values = obj.__dict__
+        for name, source, default, convert in plan:
+            value = data.get(source, _MISSING)
+            if value is _MISSING:
+                # Copy default dạng list để các object không dùng chung
+                value = list(default) if isinstance(default, list) else default
+            elif convert is not None:
+                value = convert(value)
+            values[name] = value
+        return obj
+
+    return mapper
+
+
+@functools.lru_cache(maxsize=None)
+def _stored_fields(type_cls: Type[Any]) -> Dict[str, str]:
+    """Map tên field GraphQL (camelCase) -> tên field lưu trong MongoDB."""
+    definition = type_cls.__strawberry_definition__
+    return {
+        to_camel_case(f.python_name): f.python_name
+        for f in definition.fields
+        if f.base_resolver is None
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _private_fields(type_cls: Type[Any]) -> List[str]:
+    """Field strawberry.Private: không có trong GraphQL nhưng resolver cần."""
+    public = {f.python_name for f in type_cls.__strawberry_definition__.fields}
+    return [f.name for f in dataclasses.fields(type_cls) if f.name not in public]
+
+
+def _flatten_selections(selections: List[Selection]) -> List[SelectedField]:
+    """Trải phẳng fragment / inline fragment thành danh sách field."""
+    fields = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            fields.append(selection)
+        else:
+            fields.extend(_flatten_selections(selection.selections))
+    return fields
+
+
+def _selected_children(info: Context, *path: str) -> List[SelectedField]:
+    """Các field con được chọn tại `path` (tính từ field đang resolve)."""
+    selected = _flatten_selections(info.selected_fields)
+    for name in path:
+        selected = [
+            child
+            for field in selected
+            for child in _flatten_selections(field.selections)
+            if child.name == name
+        ]
+    return [
+        child for field in selected for child in _flatten_selections(field.selections)
+    ]
+
+
+def _projection(info: Context, type_cls: Type[Any], *path: str) -> Dict[str, int]:
+    """
+    Chuyển các field GraphQL mà client yêu cầu thành projection của MongoDB.
+    - path: đường dẫn tới field chứa item bên trong kiểu trả về, vd "events"
+      trong EventPage, hoặc ("edges", "node") trong Connection. Để trống nếu
+      resolver trả về trực tiếp type_cls.
+    - Field quan hệ tự kéo theo khóa ngoại cần thiết (vd event -> event_id).
+    """
+    item_fields = _selected_children(info, *path)
+
+    stored = _stored_fields(type_cls)
+    relations = _RELATION_KEYS.get(type_cls, {})
+    projection = {"_id": 1}
+    for field in item_fields:
+        if field.name in stored:
+            projection[stored[field.name]] = 1
+        for key in relations.get(field.name, []):
+            projection[key] = 1
+    projection.pop("id", None)
+    return projection
+
+
+def _count_mode(info: Context, count_mode: Optional["CountMode"]) -> str:
+    """
+    Chọn cách đếm tổng cho crud:
+    - Client truyền countMode thì dùng đúng chế độ đó.
+    - Không chọn pageInfo.totalCount / totalPages thì bỏ qua việc đếm.
+    - Còn lại "auto": ước lượng nếu không có filter, đếm chính xác nếu có.
+    """
+    if count_mode is not None:
+        return count_mode.value
+    page_info_fields = {f.name for f in _selected_children(info, "pageInfo")}
+    if not page_info_fields & {"totalCount", "totalPages"}:
+        return "none"
+    return "auto"
+
 
-    # 4. Trả về object GraphQL với dữ liệu đã làm sạch
-    return type_cls(**clean_data)
+def _total_pages(total_count: Optional[int], limit: int) -> Optional[int]:
+    if total_count is None:
+        return None
+    return math.ceil(total_count / limit) if limit > 0 else 1
 
 
 async def _resolve_paginated(
@@ -62,19 +228,89 @@ async def _resolve_paginated(
     type_cls: Type[Any],
     page: int,
     limit: int,
-) -> Tuple[List[Any], int, int]:
+    projection: Optional[Dict[str, int]] = None,
+    count_mode: str = "exact",
+) -> Tuple[List[Any], Optional[int], Optional[int]]:
     """
     Generic pagination resolver:
-    - crud_fetch_fn: async function(db, skip, limit) -> (list_of_dicts, total_count)
+    - crud_fetch_fn: async function(db, skip, limit, projection, count_mode)
+      -> (list_of_dicts, total_count)
+    - projection: nếu có, document chỉ chứa các field được yêu cầu
     Returns: (list_of_converted_items, total_count, total_pages)
     """
     page, limit, skip = get_pagination(page, limit)
-    items_data, total_count = await crud_fetch_fn(db, skip=skip, limit=limit)
-    total_pages = math.ceil(total_count / limit) if limit > 0 else 1
-    items = [_to_type(pydantic_cls, d, type_cls) for d in items_data]
+    items_data, total_count = await crud_fetch_fn(
+        db, skip=skip, limit=limit, projection=projection, count_mode=count_mode
+    )
+    total_pages = _total_pages(total_count, limit)
+    items = _to_types(pydantic_cls, items_data, type_cls, projection)
     return items, total_count, total_pages
 
 
+def _to_types(
+    pydantic_cls: Type[Any],
+    items_data: List[dict],
+    type_cls: Type[Any],
+    projection: Optional[Dict[str, int]] = None,
+) -> List[Any]:
+    """Convert danh sách document, bỏ qua validate nếu có projection."""
+    mapper = _get_mapper(pydantic_cls, type_cls)
+    partial = projection is not None
+    return [mapper(d, partial) for d in items_data]
+
+
+async def _resolve_connection(
+    info: Context,
+    crud_fetch_fn: Callable[..., Any],
+    pydantic_cls: Type[Any],
+    type_cls: Type[Any],
+    edge_cls: Type[Any],
+    connection_cls: Type[Any],
+    first: int,
+    after: Optional[str],
+    **filters: Any,
+) -> Any:
+    """
+    Generic keyset (Relay connection) resolver:
+    - crud_fetch_fn: async function(db, first, after, projection, **filters)
+      -> list_of_dicts (tối đa first + 1 phần tử, sắp theo (created_at, _id))
+    - Cursor là (created_at, _id) của phần tử, được mã hóa thành chuỗi mờ.
+    """
+    if first < 1:
+        first = 1
+    after_key = None
+    if after:
+        after_key = tuple(decode_cursor(after))
+        if len(after_key) != 2:
+            raise ValueError("Cursor không hợp lệ")
+
+    projection = _projection(info, type_cls, "edges", "node")
+    items_data = await crud_fetch_fn(
+        get_read_db(info),
+        first=first,
+        after=after_key,
+        projection=projection,
+        **filters,
+    )
+    has_next_page = len(items_data) > first
+    items_data = items_data[:first]
+
+    mapper = _get_mapper(pydantic_cls, type_cls)
+    edges = [
+        edge_cls(
+            cursor=encode_cursor([d["created_at"], d["_id"]]), node=mapper(d, True)
+        )
+        for d in items_data
+    ]
+    page_info = CursorPageInfo(
+        has_next_page=has_next_page,
+        has_previous_page=after is not None,
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+    )
+    return connection_cls(edges=edges, page_info=page_info)
+
+
 async def _resolve_one(
     db,
     crud_get_fn: Callable[..., Any],
@@ -88,6 +324,58 @@ async def _resolve_one(
     return None
 
 
+def _bulk_results(
+    pydantic_cls: Type[Any],
+    type_cls: Type[Any],
+    result_cls: Type[Any],
+    results: crud.BulkResult,
+) -> List[Any]:
+    """Convert kết quả (id, document, lỗi) của crud.bulk_* sang kiểu GraphQL."""
+    mapper = _get_mapper(pydantic_cls, type_cls)
+    return [
+        result_cls(
+            id=id,
+            success=error is None,
+            error=error,
+            item=mapper(data, False) if data is not None else None,
+        )
+        for id, data, error in results
+    ]
+
+
+async def _promote_waitlist(db: AsyncIOMotorDatabase, event_id: str) -> None:
+    promoted = await crud.promote_waitlist(db, event_id)
+    if promoted:
+        await response_cache.invalidate(f"event:{event_id}")
+
+
+async def _run_cascade(db: AsyncIOMotorDatabase, job_id: str) -> None:
+    # Sự kiện bị đổi số chỗ (đăng ký của user bị xóa) hoặc chính sự kiện bị xóa
+    job = await jobs.get_job(db, job_id)
+    event_ids = []
+    if job is not None and job["type"] == "delete_user":
+        event_ids = await crud.get_registered_event_ids(db, job["target_id"])
+    elif job is not None:
+        event_ids = [job["target_id"]]
+    await jobs.run_job(db, job_id)
+    # Phiên / bài báo / đăng ký phụ thuộc vừa bị xóa
+    await response_cache.invalidate(
+        "events", "sessions", "paper_facets", *(f"event:{i}" for i in event_ids)
+    )
+
+
+async def _run_in_background(info: Context, fn: Callable[..., Any], *args: Any):
+    """
+    Chạy fn sau khi response đã gửi (BackgroundTasks của FastAPI). Ngoài
+    FastAPI (script, benchmark) không có background_tasks thì chạy luôn.
+    """
+    background_tasks = info.context.get("background_tasks")
+    if background_tasks is not None:
+        background_tasks.add_task(fn, *args)
+    else:
+        await fn(*args)
+
+
 def get_db(info: Context) -> AsyncIOMotorDatabase:
     """Utility to get DB from context - raises helpful error if missing."""
     try:
@@ -98,6 +386,55 @@ def get_db(info: Context) -> AsyncIOMotorDatabase:
         ) from e
 
 
+def get_read_db(info: Context) -> AsyncIOMotorDatabase:
+    """
+    DB cho resolver chỉ đọc: theo MONGO_READ_PREFERENCE (có thể là secondary).
+    Trong mutation, PrimaryForMutations đã trỏ read_db về primary.
+    """
+    read_db = info.context.get("read_db")
+    return read_db if read_db is not None else get_db(info)
+
+
+def get_loaders(info: Context) -> Loaders:
+    """Utility to get the per-request DataLoaders from context."""
+    try:
+        return info.context["loaders"]
+    except Exception as e:
+        raise Exception(
+            "Loaders not found in context. Make sure you add 'loaders' to context."
+        ) from e
+
+
+async def _cached(
+    info: Context,
+    key: Tuple[Any, ...],
+    tags: List[str],
+    fetch: Callable[[AsyncIOMotorDatabase], Any],
+    item_tags: Optional[Callable[[Any], List[str]]] = None,
+) -> Any:
+    """
+    Đọc qua response cache: trả về giá trị đã cache, hoặc gọi fetch(db) rồi
+    lưu lại với các tag. Kết quả None (không tìm thấy) không được cache.
+    fetch luôn đọc từ primary: cache dùng chung cho mọi request, bản cũ đọc
+    từ secondary sẽ được phục vụ tiếp tới khi bị invalidate.
+    item_tags(value): tag thêm theo nội dung (vd event:{id} của từng dòng).
+    """
+    value = await response_cache.get(key)
+    if value is not MISSING:
+        return value
+    version = response_cache.version
+    value = await fetch(get_db(info))
+    if value is not None:
+        if item_tags is not None:
+            tags = [*tags, *item_tags(value)]
+        await response_cache.set(key, value, tags, version)
+    return value
+
+
+def _projection_key(projection: Optional[Dict[str, int]]) -> Optional[tuple]:
+    return tuple(sorted(projection)) if projection is not None else None
+
+
 # -----------------------
 # Strawberry GraphQL Types
 # -----------------------
@@ -125,15 +462,40 @@ class UserType:
         if not self.registered_events:
             return []
 
-        db = get_db(info)
-
-        # Tìm tất cả Event có _id nằm trong danh sách registered_events
-        cursor = db["events"].find({"_id": {"$in": self.registered_events}})
-        events_data = await cursor.to_list(length=None)
+        # Gom ID qua DataLoader: cả trang user chỉ tốn một truy vấn $in
+        events_data = await get_loaders(info).event_by_id.load_many(
+            self.registered_events
+        )
 
-        # Convert sang EventType
+        # Convert sang EventType (bỏ qua ID không còn tồn tại)
         # Lưu ý: Event phải được import từ models
-        return [_to_type(Event, e, EventType) for e in events_data]
+        return [_to_type(Event, e, EventType) for e in events_data if e]
+
+
+@strawberry.type
+class RatingBucket:
+    rating: int
+    count: int
+
+
+async def _rating_stats(info: Context, kind: str, target_id: str) -> Dict[str, Any]:
+    """Thống kê điểm của phiên / sự kiện (cả trang gom thành một truy vấn $in)."""
+    stats = await get_loaders(info).rating_stats.load(
+        crud.rating_stats_id(kind, target_id)
+    )
+    return stats or {}
+
+
+def _average_rating(stats: Dict[str, Any]) -> Optional[float]:
+    count = stats.get("count", 0)
+    return round(stats["sum"] / count, 2) if count > 0 else None
+
+
+def _rating_histogram(stats: Dict[str, Any]) -> List[RatingBucket]:
+    """Đủ các mức 1-5 (mức chưa có đánh giá thì count = 0)."""
+    histogram = {int(k): v for k, v in stats.get("histogram", {}).items()}
+    ratings = sorted(set(range(1, 6)) | set(histogram))
+    return [RatingBucket(rating=r, count=histogram.get(r, 0)) for r in ratings]
 
 
 @strawberry.type
@@ -152,6 +514,18 @@ class EventType:
     created_at: str
     updated_at: str
 
+    @strawberry.field
+    async def average_rating(self, info: Context) -> Optional[float]:
+        return _average_rating(await _rating_stats(info, "event", self.id))
+
+    @strawberry.field
+    async def rating_count(self, info: Context) -> int:
+        return (await _rating_stats(info, "event", self.id)).get("count", 0)
+
+    @strawberry.field
+    async def rating_histogram(self, info: Context) -> List[RatingBucket]:
+        return _rating_histogram(await _rating_stats(info, "event", self.id))
+
 
 @strawberry.type
 class SessionType:
@@ -170,10 +544,21 @@ class SessionType:
     @strawberry.field
     async def papers(self, info: Context) -> List["PaperType"]:
         """Lấy danh sách bài báo/tham luận trong phiên này"""
-        db = get_db(info)
-        papers_data = await crud.get_papers_by_session(db, session_id=self.id)
+        papers_data = await get_loaders(info).papers_by_session.load(self.id)
         return [_to_type(Paper, p, PaperType) for p in papers_data]
 
+    @strawberry.field
+    async def average_rating(self, info: Context) -> Optional[float]:
+        return _average_rating(await _rating_stats(info, "session", self.id))
+
+    @strawberry.field
+    async def rating_count(self, info: Context) -> int:
+        return (await _rating_stats(info, "session", self.id)).get("count", 0)
+
+    @strawberry.field
+    async def rating_histogram(self, info: Context) -> List[RatingBucket]:
+        return _rating_histogram(await _rating_stats(info, "session", self.id))
+
 
 @strawberry.type
 class RegistrationType:
@@ -186,6 +571,16 @@ class RegistrationType:
     payment_amount: int
     created_at: str
     updated_at: str
+    waitlist_seq: strawberry.Private[Optional[int]] = None
+
+    @strawberry.field
+    async def waitlist_position(self, info: Context) -> Optional[int]:
+        """Vị trí trong hàng chờ (từ 1), null nếu không ở trạng thái waitlisted."""
+        if self.status != crud.WAITLISTED or self.waitlist_seq is None:
+            return None
+        return await crud.get_waitlist_position(
+            get_read_db(info), self.event_id, self.waitlist_seq
+        )
 
     @strawberry.field
     async def event(self, info: Context) -> Optional[EventType]:
@@ -193,9 +588,8 @@ class RegistrationType:
         Hàm này lấy thông tin chi tiết Event dựa trên event_id
         đang có trong Registration.
         """
-        db = get_db(info)
-        # Gọi hàm crud để tìm event theo ID
-        event_data = await crud.get_event_by_id(db, self.event_id)
+        # Gọi DataLoader để gom các event_id của cả trang thành một truy vấn
+        event_data = await get_loaders(info).event_by_id.load(self.event_id)
 
         if event_data:
             # Chuyển đổi dict/pydantic model sang Strawberry Type
@@ -205,8 +599,7 @@ class RegistrationType:
     @strawberry.field
     async def user(self, info: Context) -> Optional[UserType]:
         """Giúp query ngược lại User từ Registration"""
-        db = get_db(info)
-        user_data = await crud.get_user_by_id(db, self.user_id)
+        user_data = await get_loaders(info).user_by_id.load(self.user_id)
         if user_data:
             return _to_type(User, user_data, UserType)
         return None
@@ -225,9 +618,8 @@ class FeedbackType:
     @strawberry.field
     async def user(self, info: Context) -> Optional[UserType]:
         """Lấy thông tin chi tiết người dùng đã viết feedback"""
-        db = get_db(info)
-        # Gọi hàm crud lấy user theo ID (đã có sẵn trong crud.py)
-        user_data = await crud.get_user_by_id(db, self.user_id)
+        # Lấy user qua DataLoader (gom chung với các feedback khác trong trang)
+        user_data = await get_loaders(info).user_by_id.load(self.user_id)
 
         if user_data:
             return _to_type(User, user_data, UserType)
@@ -252,8 +644,7 @@ class PaperType:
     @strawberry.field
     async def event(self, info: Context) -> Optional[EventType]:
         """Lấy thông tin chi tiết sự kiện chứa bài báo này"""
-        db = get_db(info)
-        event_data = await crud.get_event_by_id(db, self.event_id)
+        event_data = await get_loaders(info).event_by_id.load(self.event_id)
         if event_data:
             return _to_type(Event, event_data, EventType)
         return None
@@ -264,13 +655,24 @@ class PaperType:
         if not self.author_ids:
             return []
 
-        db = get_db(info)
-        # Tìm tất cả user có _id nằm trong danh sách author_ids
-        # Bạn cần dùng t oán tử $in của MongoDB
-        cursor = db["users"].find({"_id": {"$in": self.author_ids}})
-        users_data = await cursor.to_list(length=None)
+        # Tất cả author_ids của cả trang được gom thành một truy vấn $in
+        users_data = await get_loaders(info).user_by_id.load_many(self.author_ids)
+
+        return [_to_type(User, u, UserType) for u in users_data if u]
+
 
-        return [_to_type(User, u, UserType) for u in users_data]
+# Khóa ngoại mà mỗi field quan hệ cần đọc từ document cha (dùng cho projection)
+_RELATION_KEYS: Dict[Type[Any], Dict[str, List[str]]] = {
+    UserType: {"events": ["registered_events"]},
+    SessionType: {"papers": []},
+    RegistrationType: {
+        "event": ["event_id"],
+        "user": ["user_id"],
+        "waitlistPosition": ["event_id", "status", "waitlist_seq"],
+    },
+    FeedbackType: {"user": ["user_id"]},
+    PaperType: {"event": ["event_id"], "authors": ["author_ids"]},
+}
 
 
 # -----------------------
@@ -278,10 +680,18 @@ class PaperType:
 # -----------------------
 
 
+@strawberry.enum
+class CountMode(Enum):
+    EXACT = "exact"  # count_documents (filter nóng được cache vài giây)
+    ESTIMATED = "estimated"  # đọc metadata collection, chỉ chính xác khi không lọc
+    NONE = "none"  # không đếm, totalCount / totalPages trả về null
+
+
 @strawberry.type
 class PageInfo:
-    total_count: int
-    total_pages: int
+    # null khi không đếm (countMode: NONE hoặc client không yêu cầu)
+    total_count: Optional[int]
+    total_pages: Optional[int]
     current_page: int
     limit: int
 
@@ -322,6 +732,242 @@ class PaperPage:
     page_info: PageInfo
 
 
+@strawberry.type
+class FacetCount:
+    value: Optional[str]  # null: bài báo chưa gán phiên
+    count: int
+
+
+@strawberry.type
+class PaperFacets:
+    total: int
+    keywords: List[FacetCount]
+    statuses: List[FacetCount]
+    sessions: List[FacetCount]
+    events: List[FacetCount]
+
+
+@strawberry.type
+class PaymentSummary:
+    payment_status: str
+    count: int
+    amount: int
+
+
+@strawberry.type
+class DailyRegistrations:
+    date: str  # YYYY-MM-DD (UTC)
+    registrations: int
+    confirmed: int
+    revenue: int
+
+
+@strawberry.type
+class EventAnalytics:
+    event_id: str
+    registrations: int
+    statuses: List[FacetCount]
+    payments: List[PaymentSummary]
+    revenue: int  # tổng payment_amount của đăng ký đã thanh toán
+    confirmation_rate: Optional[float]  # confirmed / registrations
+    fill_ratio: Optional[float]  # current_participants / max_participants
+    current_participants: int
+    max_participants: int
+    daily: List[DailyRegistrations]
+
+
+def _event_analytics(
+    event: Dict[str, Any], days: List[Dict[str, Any]]
+) -> EventAnalytics:
+    """Cộng dồn các document event_daily_stats trong khoảng thời gian."""
+    statuses: Dict[str, int] = {}
+    payments: Dict[str, Dict[str, int]] = {}
+    daily = []
+    for day in days:
+        for status, count in day.get("status", {}).items():
+            statuses[status] = statuses.get(status, 0) + count
+        for status, payment in day.get("payment", {}).items():
+            total = payments.setdefault(status, {"count": 0, "amount": 0})
+            total["count"] += payment.get("count", 0)
+            total["amount"] += payment.get("amount", 0)
+        daily.append(
+            DailyRegistrations(
+                date=day["date"],
+                registrations=day.get("count", 0),
+                confirmed=day.get("status", {}).get("confirmed", 0),
+                revenue=day.get("payment", {}).get(crud.PAID, {}).get("amount", 0),
+            )
+        )
+    registrations = sum(d.registrations for d in daily)
+    current = event.get("current_participants", 0)
+    capacity = event.get("max_participants", 0)
+    return EventAnalytics(
+        event_id=event["_id"],
+        registrations=registrations,
+        statuses=[
+            FacetCount(value=status, count=count)
+            for status, count in sorted(statuses.items())
+            if count
+        ],
+        payments=[
+            PaymentSummary(payment_status=status, **total)
+            for status, total in sorted(payments.items())
+            if total["count"]
+        ],
+        revenue=payments.get(crud.PAID, {}).get("amount", 0),
+        confirmation_rate=(
+            statuses.get("confirmed", 0) / registrations if registrations else None
+        ),
+        fill_ratio=current / capacity if capacity else None,
+        current_participants=current,
+        max_participants=capacity,
+        daily=[d for d in daily if d.registrations],
+    )
+
+
+# -----------------------
+# Cursor (Relay) Connection Types
+# -----------------------
+# Phân trang keyset theo (created_at, _id), đặt song song với các kiểu *Page
+# để frontend chuyển dần từng danh sách sang first/after.
+
+
+@strawberry.type
+class CursorPageInfo:
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str]
+    end_cursor: Optional[str]
+
+
+@strawberry.type
+class UserEdge:
+    cursor: str
+    node: UserType
+
+
+@strawberry.type
+class UserConnection:
+    edges: List[UserEdge]
+    page_info: CursorPageInfo
+
+
+@strawberry.type
+class EventEdge:
+    cursor: str
+    node: EventType
+
+
+@strawberry.type
+class EventConnection:
+    edges: List[EventEdge]
+    page_info: CursorPageInfo
+
+
+@strawberry.type
+class SessionEdge:
+    cursor: str
+    node: SessionType
+
+
+@strawberry.type
+class SessionConnection:
+    edges: List[SessionEdge]
+    page_info: CursorPageInfo
+
+
+@strawberry.type
+class RegistrationEdge:
+    cursor: str
+    node: RegistrationType
+
+
+@strawberry.type
+class RegistrationConnection:
+    edges: List[RegistrationEdge]
+    page_info: CursorPageInfo
+
+
+@strawberry.type
+class FeedbackEdge:
+    cursor: str
+    node: FeedbackType
+
+
+@strawberry.type
+class FeedbackConnection:
+    edges: List[FeedbackEdge]
+    page_info: CursorPageInfo
+
+
+@strawberry.type
+class PaperEdge:
+    cursor: str
+    node: PaperType
+
+
+@strawberry.type
+class PaperConnection:
+    edges: List[PaperEdge]
+    page_info: CursorPageInfo
+
+
+# -----------------------
+# Tìm kiếm toàn văn (Query.search)
+# -----------------------
+
+
+@strawberry.enum
+class SearchKind(Enum):
+    EVENT = "event"
+    PAPER = "paper"
+
+
+SearchResult = Annotated[Union[EventType, PaperType], strawberry.union("SearchResult")]
+
+
+@strawberry.type
+class SearchEdge:
+    cursor: str
+    score: float
+    node: SearchResult
+
+
+@strawberry.type
+class SearchConnection:
+    edges: List[SearchEdge]
+    page_info: CursorPageInfo
+
+
+# -----------------------
+# Kết quả mutation hàng loạt (theo từng phần tử)
+# -----------------------
+
+
+@strawberry.type
+class BulkRegistrationResult:
+    id: str
+    success: bool
+    error: Optional[str]
+    item: Optional[RegistrationType]
+
+
+@strawberry.type
+class BulkPaperResult:
+    id: str
+    success: bool
+    error: Optional[str]
+    item: Optional[PaperType]
+
+
+@strawberry.type
+class BulkSessionResult:
+    id: str
+    success: bool
+    error: Optional[str]
+    item: Optional[SessionType]
+
+
 # -----------------------
 # Query Root
 # -----------------------
@@ -332,10 +978,23 @@ class Query:
 
     # --- Users ---
     @strawberry.field
-    async def users(self, info: Context, page: int = 1, limit: int = 10) -> UserPage:
-        db = get_db(info)
+    async def users(
+        self,
+        info: Context,
+        page: int = 1,
+        limit: int = 10,
+        count_mode: Optional[CountMode] = None,
+    ) -> UserPage:
+        db = get_read_db(info)
         items, total_count, total_pages = await _resolve_paginated(
-            db, crud.get_users, User, UserType, page, limit
+            db,
+            crud.get_users,
+            User,
+            UserType,
+            page,
+            limit,
+            projection=_projection(info, UserType, "users"),
+            count_mode=_count_mode(info, count_mode),
         )
         page_info = PageInfo(
             total_count=total_count,
@@ -345,9 +1004,46 @@ class Query:
         )
         return UserPage(users=items, page_info=page_info)
 
+    @strawberry.field
+    async def users_connection(
+        self, info: Context, first: int = 10, after: Optional[str] = None
+    ) -> UserConnection:
+        return await _resolve_connection(
+            info,
+            crud.get_users_after,
+            User,
+            UserType,
+            UserEdge,
+            UserConnection,
+            first,
+            after,
+        )
+
+    @strawberry.field
+    async def search_users(
+        self,
+        info: Context,
+        prefix: str,
+        role: Optional[str] = None,
+        first: int = 10,
+    ) -> List[UserType]:
+        """Gợi ý user theo tiền tố tên / email / đơn vị (ô chọn diễn giả, tác giả)."""
+        first = min(max(first, 1), 50)
+        users = await crud.search_users(
+            get_read_db(info),
+            prefix,
+            role,
+            first,
+            projection=_projection(info, UserType),
+        )
+        mapper = _get_mapper(User, UserType)
+        return [mapper(u, True) for u in users]
+
     @strawberry.field
     async def user(self, info: Context, id: str) -> Optional[UserType]:
-        return await _resolve_one(get_db(info), crud.get_user_by_id, User, UserType, id)
+        return await _resolve_one(
+            get_read_db(info), crud.get_user_by_id, User, UserType, id
+        )
 
     # --- Events ---
     @strawberry.field
@@ -358,19 +1054,49 @@ class Query:
         limit: int = 10,
         status: Optional[str] = None,
         date: Optional[str] = None,
+        count_mode: Optional[CountMode] = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
     ) -> EventPage:
-        db = get_db(info)
         # 2. Tự tính toán phân trang (dùng hàm utils có sẵn)
         page_num, limit_num, skip = get_pagination(page, limit)
 
         # 3. Gọi hàm CRUD (cần sửa hàm này ở bước sau để nhận filter)
-        items_data, total_count = await crud.get_events(
-            db, skip=skip, limit=limit_num, status=status, date=date
+        # Chỉ đọc các field mà client thực sự yêu cầu
+        projection = _projection(info, EventType, "events")
+        mode = _count_mode(info, count_mode)
+        items_data, total_count = await _cached(
+            info,
+            (
+                "events",
+                skip,
+                limit_num,
+                status,
+                date,
+                date_from,
+                date_to,
+                _projection_key(projection),
+                mode,
+            ),
+            ["events"],
+            lambda db: crud.get_events(
+                db,
+                skip=skip,
+                limit=limit_num,
+                status=status,
+                date=date,
+                date_from=date_from,
+                date_to=date_to,
+                projection=projection,
+                count_mode=mode,
+            ),
+            # Đăng ký / hủy chỉ bỏ các trang chứa sự kiện đó (current_participants)
+            item_tags=lambda value: [f"event:{e['_id']}" for e in value[0]],
         )
 
         # 4. Tính toán PageInfo
-        total_pages = math.ceil(total_count / limit_num) if limit_num > 0 else 1
-        items = [_to_type(Event, d, EventType) for d in items_data]
+        total_pages = _total_pages(total_count, limit_num)
+        items = _to_types(Event, items_data, EventType, projection)
         page_info = PageInfo(
             total_count=total_count,
             total_pages=total_pages,
@@ -379,11 +1105,59 @@ class Query:
         )
         return EventPage(events=items, page_info=page_info)
 
+    @strawberry.field
+    async def events_connection(
+        self,
+        info: Context,
+        first: int = 10,
+        after: Optional[str] = None,
+        status: Optional[str] = None,
+        date: Optional[str] = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+    ) -> EventConnection:
+        return await _resolve_connection(
+            info,
+            crud.get_events_after,
+            Event,
+            EventType,
+            EventEdge,
+            EventConnection,
+            first,
+            after,
+            status=status,
+            date=date,
+            date_from=date_from,
+            date_to=date_to,
+        )
+
     @strawberry.field
     async def event(self, info: Context, id: str) -> Optional[EventType]:
-        return await _resolve_one(
-            get_db(info), crud.get_event_by_id, Event, EventType, id
+        data = await _cached(
+            info,
+            ("event", id),
+            [f"event:{id}"],
+            lambda db: crud.get_event_by_id(db, id),
         )
+        return _to_type(Event, data, EventType) if data else None
+
+    @strawberry.field
+    async def event_analytics(
+        self,
+        info: Context,
+        event_id: str,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+    ) -> Optional[EventAnalytics]:
+        """Đăng ký theo ngày, doanh thu, tỉ lệ xác nhận / lấp đầy của sự kiện."""
+        db = get_read_db(info)
+        event, days = await asyncio.gather(
+            get_loaders(info).event_by_id.load(event_id),
+            crud.get_event_daily_stats(db, event_id, date_from, date_to),
+        )
+        if event is None:
+            return None
+        return _event_analytics(event, days)
 
     # --- Sessions ---
     @strawberry.field
@@ -393,19 +1167,44 @@ class Query:
         page: int = 1,
         limit: int = 10,
         event_id: Optional[str] = None,
+        count_mode: Optional[CountMode] = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
     ) -> SessionPage:
-        db = get_db(info)
         page_num, limit_num, skip = get_pagination(page, limit)
 
         # 2. Gọi hàm CRUD (Lưu ý: bạn cần cập nhật crud.get_sessions bên file crud.py để nhận event_id)
         # Thay vì dùng _resolve_paginated, ta gọi trực tiếp để truyền thêm tham số
-        items_data, total_count = await crud.get_sessions(
-            db, skip=skip, limit=limit_num, event_id=event_id
+        projection = _projection(info, SessionType, "sessions")
+        mode = _count_mode(info, count_mode)
+        items_data, total_count = await _cached(
+            info,
+            (
+                "sessions",
+                skip,
+                limit_num,
+                event_id,
+                date_from,
+                date_to,
+                _projection_key(projection),
+                mode,
+            ),
+            ["sessions"],
+            lambda db: crud.get_sessions(
+                db,
+                skip=skip,
+                limit=limit_num,
+                event_id=event_id,
+                date_from=date_from,
+                date_to=date_to,
+                projection=projection,
+                count_mode=mode,
+            ),
         )
 
         # 3. Tính toán page info
-        total_pages = math.ceil(total_count / limit_num) if limit_num > 0 else 1
-        items = [_to_type(Session, d, SessionType) for d in items_data]
+        total_pages = _total_pages(total_count, limit_num)
+        items = _to_types(Session, items_data, SessionType, projection)
 
         page_info = PageInfo(
             total_count=total_count,
@@ -415,10 +1214,34 @@ class Query:
         )
         return SessionPage(sessions=items, page_info=page_info)
 
+    @strawberry.field
+    async def sessions_connection(
+        self,
+        info: Context,
+        first: int = 10,
+        after: Optional[str] = None,
+        event_id: Optional[str] = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+    ) -> SessionConnection:
+        return await _resolve_connection(
+            info,
+            crud.get_sessions_after,
+            Session,
+            SessionType,
+            SessionEdge,
+            SessionConnection,
+            first,
+            after,
+            event_id=event_id,
+            date_from=date_from,
+            date_to=date_to,
+        )
+
     @strawberry.field
     async def session(self, info: Context, id: str) -> Optional[SessionType]:
         return await _resolve_one(
-            get_db(info), crud.get_session_by_id, Session, SessionType, id
+            get_read_db(info), crud.get_session_by_id, Session, SessionType, id
         )
 
     # --- Registrations ---
@@ -430,19 +1253,27 @@ class Query:
         limit: int = 10,
         event_id: Optional[str] = None,  # <--- Thêm dòng này
         user_id: Optional[str] = None,  # <--- Thêm dòng này
+        count_mode: Optional[CountMode] = None,
     ) -> RegistrationPage:
-        db = get_db(info)
+        db = get_read_db(info)
 
         # Tính toán phân trang (giữ nguyên logic cũ, chỉ cần gọi hàm crud mới)
         page_num, limit_num, skip = get_pagination(page, limit)
 
         # Gọi hàm crud đã sửa ở Bước 1
+        projection = _projection(info, RegistrationType, "registrations")
         items_data, total_count = await crud.get_registrations(
-            db, skip=skip, limit=limit_num, event_id=event_id, user_id=user_id
+            db,
+            skip=skip,
+            limit=limit_num,
+            event_id=event_id,
+            user_id=user_id,
+            projection=projection,
+            count_mode=_count_mode(info, count_mode),
         )
 
-        total_pages = math.ceil(total_count / limit_num) if limit_num > 0 else 1
-        items = [_to_type(Registration, d, RegistrationType) for d in items_data]
+        total_pages = _total_pages(total_count, limit_num)
+        items = _to_types(Registration, items_data, RegistrationType, projection)
 
         page_info = PageInfo(
             total_count=total_count,
@@ -452,10 +1283,32 @@ class Query:
         )
         return RegistrationPage(registrations=items, page_info=page_info)
 
+    @strawberry.field
+    async def registrations_connection(
+        self,
+        info: Context,
+        first: int = 10,
+        after: Optional[str] = None,
+        event_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> RegistrationConnection:
+        return await _resolve_connection(
+            info,
+            crud.get_registrations_after,
+            Registration,
+            RegistrationType,
+            RegistrationEdge,
+            RegistrationConnection,
+            first,
+            after,
+            event_id=event_id,
+            user_id=user_id,
+        )
+
     @strawberry.field
     async def registration(self, info: Context, id: str) -> Optional[RegistrationType]:
         return await _resolve_one(
-            get_db(info),
+            get_read_db(info),
             crud.get_registration_by_id,
             Registration,
             RegistrationType,
@@ -470,18 +1323,25 @@ class Query:
         page: int = 1,
         limit: int = 10,
         event_id: Optional[str] = None,  # <--- THÊM THAM SỐ NÀY
+        count_mode: Optional[CountMode] = None,
     ) -> FeedbackPage:
-        db = get_db(info)
+        db = get_read_db(info)
 
         page_num, limit_num, skip = get_pagination(page, limit)
 
         # Gọi hàm CRUD (Cần cập nhật crud.get_feedbacks bên file crud.py)
+        projection = _projection(info, FeedbackType, "feedbacks")
         items_data, total_count = await crud.get_feedbacks(
-            db, skip=skip, limit=limit_num, event_id=event_id
+            db,
+            skip=skip,
+            limit=limit_num,
+            event_id=event_id,
+            projection=projection,
+            count_mode=_count_mode(info, count_mode),
         )
 
-        total_pages = math.ceil(total_count / limit_num) if limit_num > 0 else 1
-        items = [_to_type(Feedback, d, FeedbackType) for d in items_data]
+        total_pages = _total_pages(total_count, limit_num)
+        items = _to_types(Feedback, items_data, FeedbackType, projection)
 
         page_info = PageInfo(
             total_count=total_count,
@@ -491,18 +1351,51 @@ class Query:
         )
         return FeedbackPage(feedbacks=items, page_info=page_info)
 
+    @strawberry.field
+    async def feedbacks_connection(
+        self,
+        info: Context,
+        first: int = 10,
+        after: Optional[str] = None,
+        event_id: Optional[str] = None,
+    ) -> FeedbackConnection:
+        return await _resolve_connection(
+            info,
+            crud.get_feedbacks_after,
+            Feedback,
+            FeedbackType,
+            FeedbackEdge,
+            FeedbackConnection,
+            first,
+            after,
+            event_id=event_id,
+        )
+
     @strawberry.field
     async def feedback(self, info: Context, id: str) -> Optional[FeedbackType]:
         return await _resolve_one(
-            get_db(info), crud.get_feedback_by_id, Feedback, FeedbackType, id
+            get_read_db(info), crud.get_feedback_by_id, Feedback, FeedbackType, id
         )
 
     # --- Papers ---
     @strawberry.field
-    async def papers(self, info: Context, page: int = 1, limit: int = 10) -> PaperPage:
-        db = get_db(info)
+    async def papers(
+        self,
+        info: Context,
+        page: int = 1,
+        limit: int = 10,
+        count_mode: Optional[CountMode] = None,
+    ) -> PaperPage:
+        db = get_read_db(info)
         items, total_count, total_pages = await _resolve_paginated(
-            db, crud.get_papers, Paper, PaperType, page, limit
+            db,
+            crud.get_papers,
+            Paper,
+            PaperType,
+            page,
+            limit,
+            projection=_projection(info, PaperType, "papers"),
+            count_mode=_count_mode(info, count_mode),
         )
         page_info = PageInfo(
             total_count=total_count,
@@ -512,12 +1405,94 @@ class Query:
         )
         return PaperPage(papers=items, page_info=page_info)
 
+    @strawberry.field
+    async def papers_connection(
+        self, info: Context, first: int = 10, after: Optional[str] = None
+    ) -> PaperConnection:
+        return await _resolve_connection(
+            info,
+            crud.get_papers_after,
+            Paper,
+            PaperType,
+            PaperEdge,
+            PaperConnection,
+            first,
+            after,
+        )
+
     @strawberry.field
     async def paper(self, info: Context, id: str) -> Optional[PaperType]:
         return await _resolve_one(
-            get_db(info), crud.get_paper_by_id, Paper, PaperType, id
+            get_read_db(info), crud.get_paper_by_id, Paper, PaperType, id
+        )
+
+    @strawberry.field
+    async def paper_facets(
+        self,
+        info: Context,
+        event_id: Optional[str] = None,
+        status: Optional[str] = None,
+        keyword_limit: int = 50,
+    ) -> PaperFacets:
+        """Số bài báo theo từ khóa / trạng thái / phiên / sự kiện (dashboard)."""
+        keyword_limit = min(max(keyword_limit, 1), 500)
+        data = await _cached(
+            info,
+            ("paper_facets", event_id, status, keyword_limit),
+            ["paper_facets"],
+            lambda db: crud.get_paper_facets(db, event_id, status, keyword_limit),
+        )
+        return PaperFacets(
+            total=data["total"],
+            **{
+                name: [FacetCount(value=b["_id"], count=b["count"]) for b in data[name]]
+                for name in ["keywords", "statuses", "sessions", "events"]
+            },
         )
 
+    # --- Search ---
+    @strawberry.field
+    async def search(
+        self,
+        info: Context,
+        query: str,
+        types: Optional[List[SearchKind]] = None,
+        first: int = 10,
+        after: Optional[str] = None,
+    ) -> SearchConnection:
+        """Tìm event / paper theo từ khóa (không phân biệt dấu), xếp theo độ khớp."""
+        first = max(first, 1)
+        after_key = None
+        if after:
+            after_key = tuple(decode_cursor(after))
+            if len(after_key) != 2:
+                raise ValueError("Cursor không hợp lệ")
+        kinds = [kind.value for kind in types or SearchKind]
+
+        results = await crud.search(get_read_db(info), query, kinds, first, after_key)
+        has_next_page = len(results) > first
+        results = results[:first]
+
+        mappers = {
+            "event": _get_mapper(Event, EventType),
+            "paper": _get_mapper(Paper, PaperType),
+        }
+        edges = [
+            SearchEdge(
+                cursor=encode_cursor([score, f"{kind}:{doc['_id']}"]),
+                score=score,
+                node=mappers[kind](doc, True),
+            )
+            for kind, score, doc in results
+        ]
+        page_info = CursorPageInfo(
+            has_next_page=has_next_page,
+            has_previous_page=after is not None,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        )
+        return SearchConnection(edges=edges, page_info=page_info)
+
 
 # -----------------------
 # Mutation Root
@@ -544,17 +1519,27 @@ class Mutation:
 
     @strawberry.mutation
     async def update_user(
-        self, info: Context, id: str, input: UpdateUserInput
+        self,
+        info: Context,
+        id: str,
+        input: UpdateUserInput,
+        expected_updated_at: ExpectedUpdatedAt = None,
     ) -> Optional[UserType]:
         db = get_db(info)
-        updated = await crud.update_user(db, id, input)
+        updated = await crud.update_user(db, id, input, expected_updated_at)
         if updated:
             return _to_type(User, updated, UserType)
         return None
 
     @strawberry.mutation
     async def delete_user(self, info: Context, id: str) -> bool:
-        return await crud.delete_user(get_db(info), id)
+        db = get_db(info)
+        deleted = await crud.delete_user(db, id)
+        if deleted:
+            # Đăng ký, feedback, author_ids của user được dọn bởi job nền
+            job = await jobs.create_job(db, "delete_user", id)
+            await _run_in_background(info, _run_cascade, db, job["_id"])
+        return deleted
 
     # --- Event Mutations ---
     @strawberry.mutation
@@ -562,21 +1547,41 @@ class Mutation:
         db = get_db(info)
         user_id = info.context.get("user_id")
         data = await crud.create_event(db, input, user_id=user_id)
+        await response_cache.invalidate("events")
         return _to_type(Event, data, EventType)
 
     @strawberry.mutation
     async def update_event(
-        self, info: Context, id: str, input: UpdateEventInput
+        self,
+        info: Context,
+        id: str,
+        input: UpdateEventInput,
+        expected_updated_at: ExpectedUpdatedAt = None,
     ) -> Optional[EventType]:
         db = get_db(info)
-        data = await crud.update_event(db, id, input)
+        data = await crud.update_event(db, id, input, expected_updated_at)
+        await response_cache.invalidate("events", f"event:{id}")
+        if (
+            data
+            and input.max_participants
+            and data.get("current_participants", 0) < data["max_participants"]
+        ):
+            # Tăng sức chứa: cấp chỗ mới cho hàng chờ
+            await _run_in_background(info, _promote_waitlist, db, id)
         if data:
             return _to_type(Event, data, EventType)
         return None
 
     @strawberry.mutation
     async def delete_event(self, info: Context, id: str) -> bool:
-        return await crud.delete_event(get_db(info), id)
+        db = get_db(info)
+        deleted = await crud.delete_event(db, id)
+        await response_cache.invalidate("events", f"event:{id}")
+        if deleted:
+            # Phiên, đăng ký, feedback, bài báo của sự kiện được dọn bởi job nền
+            job = await jobs.create_job(db, "delete_event", id)
+            await _run_in_background(info, _run_cascade, db, job["_id"])
+        return deleted
 
     # --- Session Mutations ---
     @strawberry.mutation
@@ -585,21 +1590,37 @@ class Mutation:
     ) -> SessionType:
         db = get_db(info)
         data = await crud.create_session(db, input)
+        await response_cache.invalidate("sessions")
         return _to_type(Session, data, SessionType)
 
     @strawberry.mutation
     async def update_session(
-        self, info: Context, id: str, input: UpdateSessionInput
+        self,
+        info: Context,
+        id: str,
+        input: UpdateSessionInput,
+        expected_updated_at: ExpectedUpdatedAt = None,
     ) -> Optional[SessionType]:
         db = get_db(info)
-        data = await crud.update_session(db, id, input)
+        data = await crud.update_session(db, id, input, expected_updated_at)
+        await response_cache.invalidate("sessions")
         if data:
             return _to_type(Session, data, SessionType)
         return None
 
+    @strawberry.mutation
+    async def bulk_create_sessions(
+        self, info: Context, inputs: List[CreateSessionInput]
+    ) -> List[BulkSessionResult]:
+        results = await crud.bulk_create_sessions(get_db(info), inputs)
+        await response_cache.invalidate("sessions")
+        return _bulk_results(Session, SessionType, BulkSessionResult, results)
+
     @strawberry.mutation
     async def delete_session(self, info: Context, id: str) -> bool:
-        return await crud.delete_session(get_db(info), id)
+        deleted = await crud.delete_session(get_db(info), id)
+        await response_cache.invalidate("sessions", f"session_papers:{id}")
+        return deleted
 
     # --- Registration Mutations ---
     @strawberry.mutation
@@ -616,21 +1637,50 @@ class Mutation:
             user_id = "u000"
 
         data = await crud.create_registration(db, input, user_id=user_id)
+        if data["status"] == crud.WAITLISTED:
+            # Chỗ có thể vừa được trả lại trước khi vào hàng chờ
+            await _run_in_background(info, _promote_waitlist, db, data["event_id"])
+        else:
+            # current_participants của sự kiện đã thay đổi: chỉ bỏ các entry
+            # chứa sự kiện này (danh sách events được gắn tag event:{id})
+            await response_cache.invalidate(f"event:{data['event_id']}")
         return _to_type(Registration, data, RegistrationType)
 
     @strawberry.mutation
     async def update_registration(
-        self, info: Context, id: str, input: UpdateRegistrationInput
+        self,
+        info: Context,
+        id: str,
+        input: UpdateRegistrationInput,
+        expected_updated_at: ExpectedUpdatedAt = None,
     ) -> Optional[RegistrationType]:
         db = get_db(info)
-        data = await crud.update_registration(db, id, input)
+        data = await crud.update_registration(db, id, input, expected_updated_at)
         if data:
             return _to_type(Registration, data, RegistrationType)
         return None
 
+    @strawberry.mutation
+    async def bulk_update_registrations(
+        self, info: Context, ids: List[str], input: UpdateRegistrationInput
+    ) -> List[BulkRegistrationResult]:
+        results = await crud.bulk_update_registrations(get_db(info), ids, input)
+        return _bulk_results(
+            Registration, RegistrationType, BulkRegistrationResult, results
+        )
+
     @strawberry.mutation
     async def delete_registration(self, info: Context, id: str) -> bool:
-        return await crud.delete_registration(get_db(info), id)
+        db = get_db(info)
+        deleted = await crud.delete_registration(db, id)
+        if deleted is None:
+            return False
+        if deleted.get("status") != crud.WAITLISTED:
+            await response_cache.invalidate(f"event:{deleted['event_id']}")
+            # Chỗ vừa trống đã chuyển cho người đầu hàng chờ; lượt promote sau
+            # response chỉ để bắt trường hợp có người vào hàng chờ cùng lúc
+            await _run_in_background(info, _promote_waitlist, db, deleted["event_id"])
+        return True
 
     # --- Feedback Mutations ---
     # src/schema.py
@@ -649,41 +1699,26 @@ class Mutation:
         if not input.session_id:
             raise ValueError("Bạn phải chọn phiên (session) để đánh giá.")
 
-        # 2. Kiểm tra xem User đã đánh giá Session này chưa (Tránh spam)
-        existing_feedback = await db["feedbacks"].find_one(
-            {"user_id": user_id, "session_id": input.session_id}
+        # 1. Kiểm tra sự kiện và vé đã xác nhận cùng lúc (hai truy vấn độc lập)
+        event_data, confirmed = await asyncio.gather(
+            crud.get_event_by_id(db, input.event_id),
+            crud.get_confirmed_registration(db, user_id, input.event_id),
         )
-
-        if existing_feedback:
-            raise ValueError("Bạn đã đánh giá phiên này rồi, không thể gửi thêm.")
-
-        # 1. Kiểm tra trạng thái sự kiện
-        event_data = await crud.get_event_by_id(db, input.event_id)
         if not event_data:
             raise ValueError("Sự kiện không tồn tại.")
 
         if event_data.get("status") != "completed":
             raise ValueError("Sự kiện chưa kết thúc, bạn chưa thể gửi đánh giá.")
 
-        # 2. Kiểm tra user đã đăng ký và trạng thái là 'confirmed'
-        # Gọi hàm get_registrations với bộ lọc user_id và event_id
-        regs, _ = await crud.get_registrations(
-            db, user_id=user_id, event_id=input.event_id
-        )
-
-        is_confirmed = False
-        for reg in regs:
-            if reg.get("status") == "confirmed":
-                is_confirmed = True
-                break
-
-        if not is_confirmed:
+        if not confirmed:
             raise ValueError(
                 "Bạn chưa tham gia hoặc vé chưa được xác nhận tham dự sự kiện này."
             )
 
-        # 3. Tạo feedback
-        data = await crud.create_feedback(db, input, user_id=user_id)
+        # 2. Tạo feedback (đánh giá trùng user + session bị unique index chặn)
+        data = await crud.create_feedback(
+            db, input, user_id=user_id, write_buffer=info.context.get("write_buffer")
+        )
         return _to_type(Feedback, data, FeedbackType)
 
     @strawberry.mutation
@@ -732,25 +1767,63 @@ class Mutation:
             input.author_ids = [user_id]
 
         data = await crud.create_paper(db, input)
+        await response_cache.invalidate(
+            f"session_papers:{data.get('session_id')}", "paper_facets"
+        )
         return _to_type(Paper, data, PaperType)
 
     @strawberry.mutation
     async def update_paper(
-        self, info: Context, id: str, input: UpdatePaperInput
+        self,
+        info: Context,
+        id: str,
+        input: UpdatePaperInput,
+        expected_updated_at: ExpectedUpdatedAt = None,
     ) -> Optional[PaperType]:
         db = get_db(info)
-        data = await crud.update_paper(db, id, input)
+        data = await crud.update_paper(db, id, input, expected_updated_at)
+        # Tag paper:{id} phủ phiên cũ, session_papers:{...} phủ phiên mới
+        tags = [f"paper:{id}", "paper_facets"]
+        if data:
+            tags.append(f"session_papers:{data.get('session_id')}")
+        await response_cache.invalidate(*tags)
         if data:
             return _to_type(Paper, data, PaperType)
         return None
 
+    @strawberry.mutation
+    async def bulk_assign_papers_to_session(
+        self, info: Context, paper_ids: List[str], session_id: str
+    ) -> List[BulkPaperResult]:
+        results = await crud.bulk_assign_papers_to_session(
+            get_db(info), paper_ids, session_id
+        )
+        await response_cache.invalidate(
+            f"session_papers:{session_id}",
+            "paper_facets",
+            *[f"paper:{id}" for id in paper_ids],
+        )
+        return _bulk_results(Paper, PaperType, BulkPaperResult, results)
+
     @strawberry.mutation
     async def delete_paper(self, info: Context, id: str) -> bool:
-        return await crud.delete_paper(get_db(info), id)
+        deleted = await crud.delete_paper(get_db(info), id)
+        await response_cache.invalidate(f"paper:{id}", "paper_facets")
+        return deleted
 
 
 # -----------------------
 # Schema initialization
 # -----------------------
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=[
+        query_depth_limiter,
+        parser_cache,
+        validation_cache,
+        QueryCostLimiter,
+        PrimaryForMutations,
+    ],
+)
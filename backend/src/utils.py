@@ -1,5 +1,8 @@
 from bcrypt import hashpw, gensalt, checkpw
+import base64
+import json
 import datetime
+import unicodedata
 def hash_password(password: str) -> str:
 
     # Mã hóa password thô (str) sang bytes
@@ -22,6 +25,83 @@ def get_iso_now() -> str:
     return datetime.datetime.now(datetime.timezone.utc).isoformat()
 
 
+def parse_datetime(value: str | datetime.datetime) -> datetime.datetime:
+    """
+    Chuyển chuỗi ISO 8601 ("2025-12-01", "2025-12-01T08:00:00Z", ...) thành
+    datetime UTC để lưu dạng BSON date. Chuỗi không có múi giờ coi là UTC.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError as e:
+            raise ValueError(f"Ngày giờ không hợp lệ: {value}") from e
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def format_datetime(value: datetime.datetime) -> str:
+    """
+    Định dạng datetime (Motor trả về naive UTC) thành chuỗi ISO kết thúc bằng
+    "Z", giống định dạng đã lưu trước đây ("2025-12-01T08:00:00Z").
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    timespec = "milliseconds" if value.microsecond else "seconds"
+    return value.isoformat(timespec=timespec) + "Z"
+
+
+def parse_datetime_fields(data: dict, fields: tuple) -> dict:
+    """Chuyển các field ngày giờ (nếu có) trong data sang datetime, tại chỗ."""
+    for field in fields:
+        if data.get(field) is not None:
+            data[field] = parse_datetime(data[field])
+    return data
+
+
+def normalize_search(value: str | list | None) -> str:
+    """
+    Chuẩn hóa chuỗi để tìm kiếm không phân biệt dấu / hoa thường:
+    "Hội thảo Đà Nẵng" -> "hoi thao da nang". List (keywords) được nối lại.
+    """
+    if not value:
+        return ""
+    if isinstance(value, list):
+        value = " ".join(v for v in value if v)
+    # "đ" là chữ cái riêng, NFD không tách được thành "d" + dấu
+    value = value.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def add_search_fields(data: dict, fields: tuple) -> dict:
+    """Ghi bản đã chuẩn hóa của các field vào data["search"] (cho text index)."""
+    data["search"] = {field: normalize_search(data.get(field)) for field in fields}
+    return data
+
+
+def search_field_updates(data: dict, fields: tuple) -> dict:
+    """$set cho phần data["search"] ứng với các field có trong một update."""
+    return {
+        f"search.{field}": normalize_search(data[field])
+        for field in fields
+        if field in data
+    }
+
+
+def search_keys(data: dict, fields: tuple) -> list:
+    """
+    Khóa cho tìm kiếm theo tiền tố (autocomplete): với mỗi field, bản chuẩn
+    hóa đầy đủ và mọi hậu tố theo từ, để "an", "van an" hay "nguyen van an"
+    đều khớp "Nguyễn Văn An" bằng regex neo đầu chuỗi.
+    """
+    keys = set()
+    for field in fields:
+        words = normalize_search(data.get(field)).split()
+        keys.update(" ".join(words[i:]) for i in range(len(words)))
+    return sorted(keys)
+
+
 def get_pagination(page: int, limit: int) -> tuple[int, int, int]:
     """Hàm tiện ích xử lý logic phân trang."""
     if page < 1:
@@ -29,4 +109,21 @@ def get_pagination(page: int, limit: int) -> tuple[int, int, int]:
     if limit < 1:
         limit = 1
     skip = (page - 1) * limit
-    return page, limit, skip
\ No newline at end of file
+    return page, limit, skip
+
+
+def encode_cursor(values: list) -> str:
+    """Mã hóa khóa sắp xếp (vd [created_at, _id]) thành cursor dạng chuỗi mờ."""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Giải mã cursor do encode_cursor tạo ra."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Cursor không hợp lệ") from e
+    if not isinstance(values, list):
+        raise ValueError("Cursor không hợp lệ")
+    return values
@@ -0,0 +1,189 @@
+# src/write_buffer.py
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+
+# -----------------------
+# Write-behind cho các lệnh insert số lượng lớn (feedback cuối phiên, ...)
+# -----------------------
+# Document đã validate được đưa vào hàng đợi có giới hạn. Request được trả
+# về ngay. Một task nền gom document thành lô và ghi bằng insert_many khi lô
+# đủ `batch_size` hoặc sau `flush_interval` giây kể từ document đầu tiên.
+# Khi hàng đợi đầy, put() chờ tới khi có chỗ (backpressure) thay vì tăng bộ
+# nhớ vô hạn.
+#
+# Lỗi ghi xảy ra sau khi client đã nhận phản hồi: document lỗi (vd trùng
+# unique index) chỉ được log và đếm trong stats()["failed"]. Việc phụ thuộc
+# vào document đã ghi (vd cộng rating_stats) đi qua hook `on_written` của
+# put(), chỉ được gọi sau flush với các document insert thành công.
+
+# on_written(collection, documents): documents là phần đã insert thành công
+OnWritten = Callable[[AsyncIOMotorCollection, List[Dict[str, Any]]], Awaitable[None]]
+QueueItem = Tuple[AsyncIOMotorCollection, Dict[str, Any], Optional[OnWritten]]
+
+
+class WriteBuffer:
+    """Hàng đợi insert gom lô, flush theo kích thước hoặc thời gian."""
+
+    def __init__(
+        self, maxsize: int = 10000, batch_size: int = 500, flush_interval: float = 0.5
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[QueueItem]" = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._flush_lock = asyncio.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "hook_errors": 0,
+            "blocked": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "flush_ms_total": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    async def put(
+        self,
+        collection: AsyncIOMotorCollection,
+        document: Dict[str, Any],
+        on_written: Optional[OnWritten] = None,
+    ) -> None:
+        """
+        Đưa document vào hàng đợi; chờ nếu hàng đợi đang đầy. `on_written`
+        được gọi sau khi flush, một lần cho mỗi lô, chỉ với các document đã
+        insert thành công.
+        """
+        if self._queue.full():
+            self._stats["blocked"] += 1
+        await self._queue.put((collection, document, on_written))
+        self._stats["enqueued"] += 1
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Dừng task nền và ghi nốt mọi document còn trong hàng đợi."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None:
+            await self._inflight
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Ghi ngay toàn bộ hàng đợi (dùng trước backup / khi tắt server)."""
+        while not self._queue.empty():
+            await self._write(self._drain([]))
+
+    async def _run(self) -> None:
+        batch: List[tuple] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                # Lô đang ghi không bị hủy giữa chừng khi stop()
+                self._inflight = asyncio.ensure_future(self._write(self._drain(batch)))
+                batch = []
+                await asyncio.shield(self._inflight)
+        finally:
+            # Bị hủy khi đang gom lô: ghi nốt phần đã lấy khỏi hàng đợi
+            if batch:
+                await self._write(batch)
+
+    def _drain(self, batch: List[tuple]) -> List[tuple]:
+        """Lấy thêm phần đã có sẵn trong hàng đợi, tối đa batch_size."""
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+        # Gom theo collection, mỗi collection một lệnh insert_many
+        groups: Dict[str, list] = defaultdict(list)
+        hooks: Dict[str, list] = defaultdict(list)
+        collections: Dict[str, AsyncIOMotorCollection] = {}
+        for collection, document, on_written in batch:
+            collections[collection.full_name] = collection
+            groups[collection.full_name].append(document)
+            hooks[collection.full_name].append(on_written)
+
+        async with self._flush_lock:
+            start = time.perf_counter()
+            for name, documents in groups.items():
+                failed = set()
+                try:
+                    await collections[name].insert_many(documents, ordered=False)
+                    self._stats["written"] += len(documents)
+                except BulkWriteError as e:
+                    errors = e.details.get("writeErrors", [])
+                    failed = {error["index"] for error in errors}
+                    self._stats["written"] += e.details.get("nInserted", 0)
+                    self._stats["failed"] += len(errors)
+                    print(f"❌ [WriteBuffer] {name}: {len(errors)} document lỗi")
+                except Exception as e:
+                    # Không biết document nào đã ghi: không gọi hook cho lô này
+                    self._stats["failed"] += len(documents)
+                    print(f"❌ [WriteBuffer] {name}: flush failed: {e}")
+                    continue
+                await self._run_hooks(collections[name], documents, hooks[name], failed)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        self._stats["batches"] += 1
+        self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+        self._stats["flush_ms_total"] += elapsed
+        self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed)
+
+    async def _run_hooks(
+        self,
+        collection: AsyncIOMotorCollection,
+        documents: List[Dict[str, Any]],
+        hooks: List[Optional[OnWritten]],
+        failed: set,
+    ) -> None:
+        """Gọi mỗi hook một lần với các document của nó đã insert thành công."""
+        written: Dict[OnWritten, list] = {}
+        for index, (document, on_written) in enumerate(zip(documents, hooks)):
+            if on_written is not None and index not in failed:
+                written.setdefault(on_written, []).append(document)
+        for on_written, docs in written.items():
+            try:
+                await on_written(collection, docs)
+            except Exception as e:
+                self._stats["hook_errors"] += 1
+                print(f"❌ [WriteBuffer] {collection.full_name}: hook failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        flush_ms_total = stats.pop("flush_ms_total")
+        stats["queued"] = self._queue.qsize()
+        stats["maxsize"] = self._queue.maxsize
+        stats["avg_batch_size"] = (
+            round((stats["written"] + stats["failed"]) / batches, 1) if batches else 0
+        )
+        stats["avg_flush_ms"] = round(flush_ms_total / batches, 2) if batches else 0
+        stats["max_flush_ms"] = round(stats["max_flush_ms"], 2)
+        return stats
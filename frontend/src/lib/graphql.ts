@@ -2,7 +2,54 @@ import { GraphQLClient } from "graphql-request";
 
 const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000/graphql";
 
+// Automatic Persisted Queries: chỉ gửi sha256 của query,
+// server chưa biết hash thì mới gửi lại kèm full query.
+const sha256 = async (text: string) => {
+  const digest = await crypto.subtle.digest(
+    "SHA-256",
+    new TextEncoder().encode(text)
+  );
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+};
+
+const persistedQueryFetch: typeof fetch = async (input, init) => {
+  if (!init || typeof init.body !== "string" || !crypto.subtle) {
+    return fetch(input, init);
+  }
+  const body = JSON.parse(init.body);
+  if (Array.isArray(body) || !body.query) {
+    return fetch(input, init);
+  }
+
+  const { query, ...rest } = body;
+  const extensions = {
+    ...rest.extensions,
+    persistedQuery: { version: 1, sha256Hash: await sha256(query) },
+  };
+
+  const response = await fetch(input, {
+    ...init,
+    body: JSON.stringify({ ...rest, extensions }),
+  });
+  const payload = await response
+    .clone()
+    .json()
+    .catch(() => null);
+  const notFound = payload?.errors?.some(
+    (e: any) => e.extensions?.code === "PERSISTED_QUERY_NOT_FOUND"
+  );
+  if (!notFound) return response;
+
+  return fetch(input, {
+    ...init,
+    body: JSON.stringify({ ...rest, query, extensions }),
+  });
+};
+
 export const client = new GraphQLClient(API_URL, {
+  fetch: persistedQueryFetch,
   headers: () => {
     const userId = localStorage.getItem("currentUserId");
     return userId ? { "X-User-ID": userId } : {};
@@ -47,11 +47,12 @@ export const CREATE_EVENT = `
 `;
 
 export const UPDATE_EVENT = `
-  mutation UpdateEvent($id: String!, $input: UpdateEventInput!) {
-    updateEvent(id: $id, input: $input) {
+  mutation UpdateEvent($id: String!, $input: UpdateEventInput!, $expectedUpdatedAt: String) {
+    updateEvent(id: $id, input: $input, expectedUpdatedAt: $expectedUpdatedAt) {
       id
       title
       status
+      updatedAt
     }
   }
 `;
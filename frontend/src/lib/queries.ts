@@ -13,6 +13,7 @@ export const GET_EVENTS = `
         maxParticipants 
         organizerId
         fee
+        updatedAt
       }
       pageInfo { 
         totalCount 
@@ -134,6 +135,47 @@ export const GET_USERS = `
   }
 `;
 
+export const SEARCH_USERS = `
+  query SearchUsers($prefix: String!, $role: String, $first: Int) {
+    searchUsers(prefix: $prefix, role: $role, first: $first) {
+      id
+      name
+      email
+      role
+      organization
+    }
+  }
+`;
+
+export const GET_EVENT_ANALYTICS = `
+  query GetEventAnalytics($eventId: String!, $from: String, $to: String) {
+    eventAnalytics(eventId: $eventId, from: $from, to: $to) {
+      eventId
+      registrations
+      statuses {
+        value
+        count
+      }
+      payments {
+        paymentStatus
+        count
+        amount
+      }
+      revenue
+      confirmationRate
+      fillRatio
+      currentParticipants
+      maxParticipants
+      daily {
+        date
+        registrations
+        confirmed
+        revenue
+      }
+    }
+  }
+`;
+
 export const GET_PAPERS = `
   query GetPapers($page: Int!, $limit: Int!) {
     papers(page: $page, limit: $limit) {
@@ -13,6 +13,7 @@ export interface Event {
   currentParticipants: number;
   status: "upcoming" | "ongoing" | "completed";
   fee: number;
+  updatedAt?: string;
 }
 
 export interface CreateEventInput {
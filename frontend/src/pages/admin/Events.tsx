@@ -109,13 +109,18 @@ export default function AdminEvents() {
   // 🆕 Hàm xử lý cập nhật từ Modal
   const handleUpdateEvent = async (eventId: string, data: any) => {
     try {
-      await client.request(UPDATE_EVENT, { id: eventId, input: data });
+      // Gửi kèm updatedAt lúc mở modal: server từ chối nếu sự kiện đã bị sửa
+      await client.request(UPDATE_EVENT, {
+        id: eventId,
+        input: data,
+        expectedUpdatedAt: editEventModal?.updatedAt,
+      });
       toast.success("Cập nhật thành công!");
       setEditEventModal(null); // Đóng modal sau khi thành công
       fetchEvents(); // Refresh danh sách
-    } catch (err) {
+    } catch (err: any) {
       console.error(err);
-      toast.error("Cập nhật thất bại!");
+      toast.error(err?.response?.errors?.[0]?.message ?? "Cập nhật thất bại!");
     }
   };
 